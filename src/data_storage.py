@@ -1,3 +1,8 @@
 # We use this class for global variables
 class DS:
     waku_nodes = []
+    node_pool = None
+    startup_timings = []
+    metrics_sampler = None
+    message_timeline = None
+    image_digests = {}
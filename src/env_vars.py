@@ -1,4 +1,6 @@
 import os
+import tempfile
+from uuid import uuid4
 from dotenv import load_dotenv
 
 load_dotenv()  # This will load environment variables from a .env file if it exists
@@ -25,11 +27,53 @@ NETWORK_NAME = get_env_var("NETWORK_NAME", "waku")
 SUBNET = get_env_var("SUBNET", "172.18.0.0/16")
 IP_RANGE = get_env_var("IP_RANGE", "172.18.0.0/24")
 GATEWAY = get_env_var("GATEWAY", "172.18.0.1")
+# host ports handed out to nodes, kept below the usual ephemeral port range so they don't clash with client sockets
+PORT_RANGE = get_env_var("PORT_RANGE", "20000-32000")
+# lease file shared by all test processes on the host for collision free ports and IPs
+ALLOCATOR_DIR = get_env_var("ALLOCATOR_DIR", os.path.join(tempfile.gettempdir(), "waku_interop_allocator"))
 RUNNING_IN_CI = get_env_var("CI")
 API_REQUEST_TIMEOUT = get_env_var("API_REQUEST_TIMEOUT", 20)
+# max keep-alive connections kept per node REST client (matters when a node is queried from several threads)
+REST_POOL_MAXSIZE = int(get_env_var("REST_POOL_MAXSIZE", 16))
 RLN_CREDENTIALS = get_env_var("RLN_CREDENTIALS")
 PG_USER = get_env_var("POSTGRES_USER", "postgres")
 PG_PASS = get_env_var("POSTGRES_PASSWORD", "test123")
+# node images are pulled in parallel before the first test, their digests are remembered in this file
+IMAGE_DIGEST_CACHE = get_env_var("IMAGE_DIGEST_CACHE", os.path.join(ALLOCATOR_DIR, "image_digests.json"))
+IMAGE_PULL_WORKERS = int(get_env_var("IMAGE_PULL_WORKERS", 4))
+# pre-seeded store databases (sqlite tarballs, postgres dumps) and their ledgers, keyed by seed spec and image
+STORE_SNAPSHOT_DIR = get_env_var("STORE_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "waku_store_snapshots"))
+# snapshots older than this (seconds) are rebuilt, their messages would soon fall out of the store retention window
+STORE_SNAPSHOT_MAX_AGE = int(get_env_var("STORE_SNAPSHOT_MAX_AGE", 24 * 3600))
+# "docker" runs the nodes in containers, "fake" serves their REST API from in-process fakes (no docker needed)
+NODE_BACKEND = get_env_var("NODE_BACKEND", "docker")
+# connections kept by the docker client shared by all nodes, nodes are started and stopped from several threads
+DOCKER_CLIENT_POOL_SIZE = int(get_env_var("DOCKER_CLIENT_POOL_SIZE", 32))
+# seconds a stopping node gets between SIGTERM and SIGKILL
+CONTAINER_STOP_TIMEOUT = int(get_env_var("CONTAINER_STOP_TIMEOUT", 2))
+# threads stopping and removing containers at test and session end
+REAPER_WORKERS = int(get_env_var("REAPER_WORKERS", 16))
+# label put on every container started by the run, xdist workers inherit it from the controller's environment
+TEST_SESSION_ID = get_env_var("TEST_SESSION_ID", uuid4().hex[:12])
+# number of idle nodes kept per image/start args combination, 0 disables the warm node pool
+WARM_POOL_SIZE = int(get_env_var("WARM_POOL_SIZE", 0))
+# message hashes kept in memory by the shared MessageHasher
+MESSAGE_HASH_CACHE_SIZE = int(get_env_var("MESSAGE_HASH_CACHE_SIZE", 200000))
+# batches with at least this many uncached messages are hashed in a process pool, 0 disables the process pool
+MESSAGE_HASH_PROCESS_THRESHOLD = int(get_env_var("MESSAGE_HASH_PROCESS_THRESHOLD", 50000))
+# node log files are written through a buffer flushed at this interval (seconds), and before every log search
+LOG_FLUSH_INTERVAL = float(get_env_var("LOG_FLUSH_INTERVAL", 0.5))
+# node log files are rotated at this size, 0 disables rotation
+LOG_ROTATE_BYTES = int(get_env_var("LOG_ROTATE_BYTES", 512 * 1024 * 1024))
+LOG_ROTATE_KEEP = int(get_env_var("LOG_ROTATE_KEEP", 3))
+# "gzip" compresses rotated node log files
+LOG_COMPRESSION = get_env_var("LOG_COMPRESSION", "")
+# parse the message lifecycle events out of the node logs during every test
+MESSAGE_TIMELINE_ENABLED = get_env_var("MESSAGE_TIMELINE_ENABLED", "true").lower() == "true"
+# seconds between two background metrics scrapes of every node, 0 samples only tests marked with sample_metrics
+METRICS_SAMPLING_INTERVAL = float(get_env_var("METRICS_SAMPLING_INTERVAL", 0))
+# regex on metric names kept by the sampler, empty keeps all
+METRICS_SAMPLING_FILTER = get_env_var("METRICS_SAMPLING_FILTER", "")
 
 # example for .env file
 # RLN_CREDENTIALS = {"rln-relay-cred-password": "password", "rln-relay-eth-client-address": "wss://sepolia.infura.io/ws/v3/api_key",  "rln-relay-eth-contract-address": "0xF471d71E9b1455bBF4b85d475afb9BB0954A29c4",  "rln-relay-eth-private-key-1": "1111111111111111111111111111111111111111111111111111111111111111",  "rln-relay-eth-private-key-2": "1111111111111111111111111111111111111111111111111111111111111111"}
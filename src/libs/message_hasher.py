@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from src.env_vars import MESSAGE_HASH_CACHE_SIZE, MESSAGE_HASH_PROCESS_THRESHOLD
+from src.libs.custom_logger import get_custom_logger
+
+logger = get_custom_logger(__name__)
+
+
+def message_identity(pubsub_topic, msg):
+    """Every field that goes into the deterministic message hash, usable as a dict key."""
+    return pubsub_topic, msg["payload"], msg["contentTopic"], msg.get("meta"), int(msg["timestamp"])
+
+
+def _digest(identity):
+    pubsub_topic, payload, content_topic, meta, timestamp = identity
+    ctx = hashlib.sha256()
+    ctx.update(pubsub_topic.encode("utf-8"))
+    ctx.update(base64.b64decode(payload))
+    ctx.update(content_topic.encode("utf-8"))
+    if meta is not None:
+        ctx.update(base64.b64decode(meta))
+    ctx.update(timestamp.to_bytes(8, byteorder="big", signed=True))
+    return ctx.digest()
+
+
+def format_digest(digest, hash_type="hex"):
+    if hash_type == "hex":
+        return "0x" + digest.hex()
+    if hash_type == "base64":
+        return base64.b64encode(digest).decode("utf-8")
+    if hash_type == "raw":
+        return digest
+    raise ValueError(f"Unknown hash type {hash_type}")
+
+
+class MessageHasher:
+    """
+    Computes deterministic message hashes for whole batches of messages. Raw digests are memoized by message identity
+    in a bounded LRU so re-checking the same messages (e.g. on store check retries) doesn't hash them again.
+    """
+
+    def __init__(self, cache_size=MESSAGE_HASH_CACHE_SIZE, process_threshold=MESSAGE_HASH_PROCESS_THRESHOLD):
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._process_threshold = process_threshold
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def hash(self, pubsub_topic, msg, hash_type="hex"):
+        return self.hash_batch(pubsub_topic, [msg], hash_type=hash_type)[0]
+
+    def hash_batch(self, pubsub_topic, messages, hash_type="hex"):
+        identities = [message_identity(pubsub_topic, msg) for msg in messages]
+        digests = self._lookup(identities)
+        missing = list(dict.fromkeys(identity for identity, digest in zip(identities, digests) if digest is None))
+        if missing:
+            computed = dict(zip(missing, self._compute(missing)))
+            self._store(computed)
+            digests = [computed[identity] if digest is None else digest for identity, digest in zip(identities, digests)]
+        return [format_digest(digest, hash_type) for digest in digests]
+
+    def _lookup(self, identities):
+        digests = []
+        with self._lock:
+            for identity in identities:
+                digest = self._cache.get(identity)
+                if digest is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self._cache.move_to_end(identity)
+                digests.append(digest)
+        return digests
+
+    def _store(self, computed):
+        with self._lock:
+            self._cache.update(computed)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+
+    def _compute(self, identities):
+        if self._process_threshold and len(identities) >= self._process_threshold:
+            workers = os.cpu_count() or 1
+            logger.debug(f"Hashing {len(identities)} messages in {workers} processes")
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(_digest, identities, chunksize=max(1, len(identities) // (workers * 4))))
+        return [_digest(identity) for identity in identities]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    @property
+    def stats(self):
+        return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+_hasher = None
+_hasher_lock = threading.Lock()
+
+
+def get_message_hasher():
+    global _hasher
+    with _hasher_lock:
+        if _hasher is None:
+            _hasher = MessageHasher()
+        return _hasher
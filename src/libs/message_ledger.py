@@ -0,0 +1,207 @@
+import base64
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+DIGEST_SIZE = 32
+
+
+def decode_message_hash(message_hash):
+    """Accepts the hex (0x prefixed) hashes of nwaku, the base64 hashes of go-waku or raw 32-byte digests."""
+    if isinstance(message_hash, (bytes, bytearray, memoryview)):
+        digest = bytes(message_hash)
+    elif message_hash.startswith("0x"):
+        digest = bytes.fromhex(message_hash[2:])
+    else:
+        digest = base64.b64decode(message_hash)
+    if len(digest) != DIGEST_SIZE:
+        raise ValueError(f"Message hash {message_hash} is not {DIGEST_SIZE} bytes long")
+    return digest
+
+
+@dataclass
+class LedgerReport:
+    expected_count: int
+    actual_count: int
+    # positions in the expected ledger that the actual one doesn't contain
+    missing: List[int] = field(default_factory=list)
+    # positions in the actual ledger that the expected one doesn't contain
+    extra: List[int] = field(default_factory=list)
+    # digests found more than once in the actual ledger, with their count
+    duplicated: List[tuple] = field(default_factory=list)
+    # first position in the actual ledger of a message that comes before an already seen one in the expected ledger
+    first_out_of_order: Optional[int] = None
+
+    @property
+    def ok(self):
+        return not (self.missing or self.extra or self.duplicated) and self.first_out_of_order is None
+
+    def __str__(self, limit=5):
+        return (
+            f"expected {self.expected_count} messages, got {self.actual_count}: {len(self.missing)} missing (first positions {self.missing[:limit]}), "
+            f"{len(self.extra)} extra (first positions {self.extra[:limit]}), "
+            f"{len(self.duplicated)} duplicated ({['0x' + digest.hex() for digest, _ in self.duplicated[:limit]]}), "
+            f"first out of order position {self.first_out_of_order}"
+        )
+
+
+class MessageLedger:
+    """
+    Ordered list of message hashes kept as packed 32-byte digests in one bytearray (about 48 bytes per message
+    with the index), so even million message runs can be verified against store in memory.
+    The sorted index (positions ordered by digest prefix) is built on first lookup and dropped whenever the ledger grows.
+    """
+
+    def __init__(self, message_hashes=()):
+        self._data = bytearray()
+        self._sorted = None
+        self._prefixes = None
+        self.extend(message_hashes)
+
+    def __len__(self):
+        return len(self._data) // DIGEST_SIZE
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError(f"Ledger position {position} out of range")
+        return bytes(self._data[position * DIGEST_SIZE : (position + 1) * DIGEST_SIZE])
+
+    def __iter__(self):
+        view = memoryview(self._data)
+        for offset in range(0, len(self._data), DIGEST_SIZE):
+            yield bytes(view[offset : offset + DIGEST_SIZE])
+
+    def __contains__(self, message_hash):
+        return self.position(message_hash) is not None
+
+    def __eq__(self, other):
+        return isinstance(other, MessageLedger) and self._data == other._data
+
+    def append(self, message_hash):
+        self._data += decode_message_hash(message_hash)
+        self._sorted = None
+
+    def extend(self, message_hashes):
+        for message_hash in message_hashes:
+            self._data += decode_message_hash(message_hash)
+        self._sorted = None
+
+    def to_bytes(self):
+        return bytes(self._data)
+
+    @classmethod
+    def from_bytes(cls, data):
+        if len(data) % DIGEST_SIZE:
+            raise ValueError(f"Ledger data of {len(data)} bytes is not a multiple of {DIGEST_SIZE}")
+        ledger = cls()
+        ledger._data = bytearray(data)
+        return ledger
+
+    def hex(self, position):
+        return "0x" + self[position].hex()
+
+    def _digest_at(self, position):
+        return bytes(self._data[position * DIGEST_SIZE : (position + 1) * DIGEST_SIZE])
+
+    def _index(self):
+        if self._sorted is None:
+            # the first 8 bytes of every digest, read straight out of the packed data; sha256 prefixes practically never
+            # collide, full digests are only compared when they do
+            self._prefixes = array("Q", bytes(self._data))[:: DIGEST_SIZE // 8]
+            self._sorted = array("L", sorted(range(len(self)), key=self._prefixes.__getitem__))
+        return self._sorted
+
+    def position(self, message_hash):
+        """Position of the first occurrence of the hash, None when the ledger doesn't contain it."""
+        digest = decode_message_hash(message_hash)
+        prefix = array("Q", digest[:8])[0]
+        index = self._index()
+        i = bisect_left(index, prefix, key=self._prefixes.__getitem__)
+        matches = []
+        while i < len(index) and self._prefixes[index[i]] == prefix:
+            if self._digest_at(index[i]) == digest:
+                matches.append(index[i])
+            i += 1
+        return min(matches) if matches else None
+
+    def _prefix_runs(self):
+        """Yields the positions sharing a digest prefix, one array per distinct prefix, in prefix order."""
+        index = self._index()
+        prefixes = self._prefixes
+        count = len(index)
+        i = 0
+        while i < count:
+            position = index[i]
+            prefix = prefixes[position]
+            j = i + 1
+            while j < count and prefixes[index[j]] == prefix:
+                j += 1
+            yield prefix, (position,) if j == i + 1 else index[i:j]
+            i = j
+
+    def _group_by_digest(self, positions):
+        group = {}
+        for position in sorted(positions):
+            group.setdefault(self._digest_at(position), []).append(position)
+        return group
+
+    def duplicates(self):
+        counts = {}
+        for _, positions in self._prefix_runs():
+            if len(positions) > 1:
+                counts.update((digest, len(same)) for digest, same in self._group_by_digest(positions).items() if len(same) > 1)
+        return list(counts.items())
+
+    def difference(self, other):
+        """Positions in this ledger whose hash is not in `other`."""
+        return self.compare(other, check_order=False).missing
+
+    def compare(self, actual, check_order=True):
+        """Treats this ledger as the expected one and reports how `actual` (e.g. built from store pages) differs."""
+        report = LedgerReport(expected_count=len(self), actual_count=len(actual))
+        # independent of the classification below, a duplicated message can also be an extra one
+        report.duplicated = actual.duplicates()
+        if self._data == actual._data:
+            return report
+        # expected position of every message of the actual ledger, -1 for the extra ones
+        expected_position_of = array("l", [-1]) * len(actual)
+        expected_runs, actual_runs = self._prefix_runs(), actual._prefix_runs()
+        expected_run, actual_run = next(expected_runs, None), next(actual_runs, None)
+        # merge walk over both prefix sorted indexes
+        while expected_run is not None or actual_run is not None:
+            if actual_run is None or (expected_run is not None and expected_run[0] < actual_run[0]):
+                report.missing.extend(expected_run[1])
+                expected_run = next(expected_runs, None)
+            elif expected_run is None or actual_run[0] < expected_run[0]:
+                report.extra.extend(actual_run[1])
+                actual_run = next(actual_runs, None)
+            elif len(expected_run[1]) == 1 and len(actual_run[1]) == 1 and self._digest_at(expected_run[1][0]) == actual._digest_at(actual_run[1][0]):
+                expected_position_of[actual_run[1][0]] = expected_run[1][0]
+                expected_run, actual_run = next(expected_runs, None), next(actual_runs, None)
+            else:
+                expected_digests, actual_digests = self._group_by_digest(expected_run[1]), actual._group_by_digest(actual_run[1])
+                for digest, positions in expected_digests.items():
+                    if digest not in actual_digests:
+                        report.missing.extend(positions)
+                for digest, positions in actual_digests.items():
+                    if digest not in expected_digests:
+                        report.extra.extend(positions)
+                        continue
+                    expected_position_of[positions[0]] = expected_digests[digest][0]
+                expected_run, actual_run = next(expected_runs, None), next(actual_runs, None)
+        report.missing.sort()
+        report.extra.sort()
+        if check_order:
+            # read in actual order, the expected positions of the common messages must keep increasing
+            previous_expected = -1
+            for actual_position, expected_position in enumerate(expected_position_of):
+                if expected_position == -1:
+                    continue
+                if expected_position < previous_expected:
+                    report.first_out_of_order = actual_position
+                    break
+                previous_expected = expected_position
+        return report
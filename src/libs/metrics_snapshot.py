@@ -0,0 +1,211 @@
+import math
+import re
+from time import time
+
+_NAME = re.compile(r"[a-zA-Z_:][a-zA-Z0-9_:]*")
+_LABEL = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*=\s*"((?:[^"\\]|\\.)*)"\s*(,?)')
+_UNESCAPE = re.compile(r"\\(.)")
+
+
+def _unescape(value):
+    return _UNESCAPE.sub(lambda match: "\n" if match.group(1) == "n" else match.group(1), value)
+
+
+def _parse_labels(text, start):
+    """Parses `{a="b",...}` starting right after the opening brace, returns the labels and the position after `}`."""
+    labels = {}
+    position = start
+    while True:
+        if text.startswith("}", position):
+            return labels, position + 1
+        match = _LABEL.match(text, position)
+        if match is None:
+            raise ValueError(f"Invalid label set in {text!r}")
+        labels[match.group(1)] = _unescape(match.group(2))
+        position = match.end()
+        if not match.group(3):
+            position = text.index("}", position) + 1
+            return labels, position
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def parse_series(text):
+    """Parses `name{label="value",...}` (labels optional) into (name, label key)."""
+    text = text.strip()
+    match = _NAME.match(text)
+    if match is None:
+        raise ValueError(f"Invalid metric name in {text!r}")
+    labels = {}
+    if text.startswith("{", match.end()):
+        labels, _ = _parse_labels(text, match.end() + 1)
+    return match.group(0), label_key(labels)
+
+
+def format_series(name, labels):
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+def histogram_quantile(quantile, buckets):
+    """
+    Same estimate as PromQL histogram_quantile: `buckets` are (upper bound, cumulative count) pairs and the
+    quantile is linearly interpolated inside the bucket it falls in. Returns NaN without observations, or when
+    quantile 0 falls in an empty first bucket.
+    """
+    if quantile < 0:
+        return -math.inf
+    if quantile > 1:
+        return math.inf
+    buckets = sorted(buckets)
+    if len(buckets) < 2 or buckets[-1][0] != math.inf:
+        return math.nan
+    # counters scraped while being updated can be slightly non monotonic, PromQL smooths that the same way
+    upper_bounds, counts = [], []
+    for upper_bound, count in buckets:
+        upper_bounds.append(upper_bound)
+        counts.append(max(count, counts[-1]) if counts else count)
+    observations = counts[-1]
+    if observations <= 0:
+        return math.nan
+    rank = quantile * observations
+    bucket = next(index for index, count in enumerate(counts) if count >= rank)
+    if bucket == len(buckets) - 1:
+        return upper_bounds[-2]
+    if bucket == 0 and upper_bounds[0] <= 0:
+        return upper_bounds[0]
+    bucket_start = 0.0
+    bucket_end = upper_bounds[bucket]
+    bucket_count = counts[bucket]
+    if bucket > 0:
+        bucket_start = upper_bounds[bucket - 1]
+        bucket_count -= counts[bucket - 1]
+        rank -= counts[bucket - 1]
+    if bucket_count == 0:
+        # only reachable with a zero rank landing in an empty first bucket, PromQL yields NaN (0/0) there too
+        return math.nan
+    return bucket_start + (bucket_end - bucket_start) * (rank / bucket_count)
+
+
+class MetricsSnapshot:
+    """
+    One scrape of a node's /metrics endpoint, parsed once and indexed by metric name and label set.
+    Series are looked up with the same `name{label="value"}` selectors as the ones in test_data; a selector matches
+    the series with exactly its labels, or else the first series (in exposition order) that has all of them.
+    """
+
+    def __init__(self, text, taken_at=None):
+        self.taken_at = time() if taken_at is None else taken_at
+        self.types = {}
+        self._series = {}
+        self._by_name = {}
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("#"):
+                parts = line.split(None, 3)
+                if len(parts) == 4 and parts[1] == "TYPE":
+                    self.types[parts[2]] = parts[3]
+                continue
+            match = _NAME.match(line)
+            if match is None:
+                continue
+            labels, position = {}, match.end()
+            if line.startswith("{", position):
+                labels, position = _parse_labels(line, position + 1)
+            value = line[position:].split()
+            if not value:
+                continue
+            key = (match.group(0), label_key(labels))
+            self._series[key] = float(value[0])
+            self._by_name.setdefault(key[0], {})[key[1]] = self._series[key]
+
+    @classmethod
+    def from_node(cls, node):
+        return cls(node.get_metrics())
+
+    def __len__(self):
+        return len(self._series)
+
+    def __contains__(self, selector):
+        return self._find(selector) is not None
+
+    def items(self):
+        """(name, label key) and value of every series, in exposition order."""
+        return self._series.items()
+
+    def names(self):
+        return self._by_name.keys()
+
+    def series(self, name):
+        """{label key: value} of every series of a metric."""
+        return self._by_name.get(name, {})
+
+    def _find(self, selector):
+        name, labels = parse_series(selector) if isinstance(selector, str) else selector
+        series = self._by_name.get(name)
+        if not series:
+            return None
+        if labels in series:
+            return name, labels
+        for series_labels in series:
+            if set(labels) <= set(series_labels):
+                return name, series_labels
+        return None
+
+    def get(self, selector, default=None):
+        key = self._find(selector)
+        return default if key is None else self._series[key]
+
+    def matching(self, selector):
+        """{label key: value} of every series that has all labels of the selector."""
+        name, labels = parse_series(selector) if isinstance(selector, str) else selector
+        return {series_labels: value for series_labels, value in self.series(name).items() if set(labels) <= set(series_labels)}
+
+    def sum(self, selector):
+        return sum(self.matching(selector).values())
+
+    def delta(self, previous, selector=None):
+        """
+        Change since an earlier snapshot of the same node. With a selector it returns the change of that series,
+        otherwise a {(name, label key): change} dict of all series present in both snapshots.
+        """
+        if selector is not None:
+            current_value, previous_value = self.get(selector), previous.get(selector)
+            if current_value is None or previous_value is None:
+                raise KeyError(f"Metric '{selector}' is missing from one of the snapshots")
+            return current_value - previous_value
+        return {key: value - previous._series[key] for key, value in self._series.items() if key in previous._series}
+
+    def rate(self, previous, selector):
+        """Per second change of a series since an earlier snapshot."""
+        elapsed = self.taken_at - previous.taken_at
+        if elapsed <= 0:
+            raise ValueError("Snapshots must be taken at different times to compute a rate")
+        return self.delta(previous, selector) / elapsed
+
+    def histogram_buckets(self, histogram, previous=None):
+        """
+        (upper bound, cumulative count) pairs of a histogram given as `name{labels}` without the _bucket suffix,
+        summed over the labels the selector doesn't pin (like `sum by (le)`). With a previous snapshot the counts
+        are the increase since then, so the quantiles describe only that interval.
+        """
+        name, labels = parse_series(histogram) if isinstance(histogram, str) else histogram
+        selector = (f"{name}_bucket", labels)
+        counts = {}
+        for series_labels, value in self.matching(selector).items():
+            upper_bound = float(dict(series_labels)["le"])
+            if previous is not None:
+                value -= previous.get((selector[0], series_labels), 0.0)
+            counts[upper_bound] = counts.get(upper_bound, 0.0) + value
+        return sorted(counts.items())
+
+    def histogram_quantile(self, quantile, histogram, previous=None):
+        return histogram_quantile(quantile, self.histogram_buckets(histogram, previous=previous))
+
+    def finite_items(self):
+        return ((key, value) for key, value in self._series.items() if math.isfinite(value))
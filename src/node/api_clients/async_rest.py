@@ -0,0 +1,123 @@
+import asyncio
+from src.env_vars import API_REQUEST_TIMEOUT
+from src.libs.custom_logger import get_custom_logger
+
+logger = get_custom_logger(__name__)
+
+
+async def run_blocking(func, *args, timeout=API_REQUEST_TIMEOUT, **kwargs):
+    # The blocking client keeps its keep-alive pool, curl logging and error handling; asyncio only schedules the calls
+    return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), timeout=timeout)
+
+
+class AsyncREST:
+    """Coroutine counterpart of REST, every endpoint of the wrapped client is awaitable."""
+
+    def __init__(self, rest, timeout=API_REQUEST_TIMEOUT):
+        self._rest = rest
+        self._timeout = timeout
+
+    async def _call(self, func, *args, **kwargs):
+        return await run_blocking(func, *args, timeout=self._timeout, **kwargs)
+
+    async def info(self):
+        return await self._call(self._rest.info)
+
+    async def health(self):
+        return await self._call(self._rest.health)
+
+    async def get_peers(self):
+        return await self._call(self._rest.get_peers)
+
+    async def add_peers(self, peers):
+        return await self._call(self._rest.add_peers, peers)
+
+    async def set_relay_subscriptions(self, pubsub_topics):
+        return await self._call(self._rest.set_relay_subscriptions, pubsub_topics)
+
+    async def set_relay_auto_subscriptions(self, content_topics):
+        return await self._call(self._rest.set_relay_auto_subscriptions, content_topics)
+
+    async def delete_relay_subscriptions(self, pubsub_topics):
+        return await self._call(self._rest.delete_relay_subscriptions, pubsub_topics)
+
+    async def delete_relay_auto_subscriptions(self, content_topics):
+        return await self._call(self._rest.delete_relay_auto_subscriptions, content_topics)
+
+    async def send_relay_message(self, message, pubsub_topic):
+        return await self._call(self._rest.send_relay_message, message, pubsub_topic)
+
+    async def send_relay_auto_message(self, message):
+        return await self._call(self._rest.send_relay_auto_message, message)
+
+    async def send_light_push_message(self, payload):
+        return await self._call(self._rest.send_light_push_message, payload)
+
+    async def get_relay_messages(self, pubsub_topic):
+        return await self._call(self._rest.get_relay_messages, pubsub_topic)
+
+    async def get_relay_auto_messages(self, content_topic):
+        return await self._call(self._rest.get_relay_auto_messages, content_topic)
+
+    async def set_filter_subscriptions(self, subscription):
+        return await self._call(self._rest.set_filter_subscriptions, subscription)
+
+    async def update_filter_subscriptions(self, subscription):
+        return await self._call(self._rest.update_filter_subscriptions, subscription)
+
+    async def delete_filter_subscriptions(self, subscription):
+        return await self._call(self._rest.delete_filter_subscriptions, subscription)
+
+    async def delete_all_filter_subscriptions(self, request_id):
+        return await self._call(self._rest.delete_all_filter_subscriptions, request_id)
+
+    async def ping_filter_subscriptions(self, request_id):
+        return await self._call(self._rest.ping_filter_subscriptions, request_id)
+
+    async def get_filter_messages(self, content_topic, pubsub_topic=None):
+        return await self._call(self._rest.get_filter_messages, content_topic, pubsub_topic)
+
+    async def get_store_messages(self, **kwargs):
+        return await self._call(self._rest.get_store_messages, **kwargs)
+
+    async def set_log_level(self, log_level):
+        return await self._call(self._rest.set_log_level, log_level)
+
+    async def get_service_peers(self):
+        return await self._call(self._rest.get_service_peers)
+
+    async def get_connected_peers(self):
+        return await self._call(self._rest.get_connected_peers)
+
+    async def get_connected_peers_on_shard(self, shard_id):
+        return await self._call(self._rest.get_connected_peers_on_shard, shard_id)
+
+    async def get_relay_peers(self):
+        return await self._call(self._rest.get_relay_peers)
+
+    async def get_relay_peers_on_shard(self, shard_id):
+        return await self._call(self._rest.get_relay_peers_on_shard, shard_id)
+
+    async def get_mesh_peers(self):
+        return await self._call(self._rest.get_mesh_peers)
+
+    async def get_mesh_peers_on_shard(self, shard_id):
+        return await self._call(self._rest.get_mesh_peers_on_shard, shard_id)
+
+    async def get_peer_stats(self):
+        return await self._call(self._rest.get_peer_stats)
+
+    async def get_filter_subscriptions(self):
+        return await self._call(self._rest.get_filter_subscriptions)
+
+    async def get_info(self):
+        return await self._call(self._rest.get_info)
+
+    async def get_version(self):
+        return await self._call(self._rest.get_version)
+
+    async def get_debug_version(self):
+        return await self._call(self._rest.get_debug_version)
+
+    async def get_peer(self, peer_id: str):
+        return await self._call(self._rest.get_peer, peer_id)
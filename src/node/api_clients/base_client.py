@@ -1,15 +1,57 @@
 import json
+import threading
 import requests
-from src.env_vars import API_REQUEST_TIMEOUT
+from requests.adapters import HTTPAdapter
+from src.env_vars import API_REQUEST_TIMEOUT, REST_POOL_MAXSIZE
 from src.libs.custom_logger import get_custom_logger
 
 logger = get_custom_logger(__name__)
 
 
 class BaseClient:
+    _session = None
+    _session_lock = threading.Lock()
+    _closed_stats = None
+
+    @property
+    def session(self):
+        # one keep-alive session per client, so polling and pagination loops reuse their TCP connections
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    # the nodes are always reached on localhost, looking up proxy settings in the environment on every
+                    # request only costs time
+                    session.trust_env = False
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=REST_POOL_MAXSIZE)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def connection_stats(self):
+        opened, requests_sent = self._closed_stats or (0, 0)
+        if self._session is not None:
+            for adapter in set(self._session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is not None:
+                        opened += pool.num_connections
+                        requests_sent += pool.num_requests
+        return {"opened": opened, "reused": requests_sent - opened}
+
+    def close(self):
+        if self._session is None:
+            return
+        stats = self.connection_stats()
+        self._closed_stats = (stats["opened"], stats["opened"] + stats["reused"])
+        self._session.close()
+        self._session = None
+
     def make_request(self, method, url, headers=None, data=None):
         self.log_request_as_curl(method, url, headers, data)
-        response = requests.request(method.upper(), url, headers=headers, data=data, timeout=API_REQUEST_TIMEOUT)
+        response = self.session.request(method.upper(), url, headers=headers, data=data, timeout=API_REQUEST_TIMEOUT)
         try:
             response.raise_for_status()
         except requests.HTTPError as http_err:
@@ -0,0 +1,95 @@
+import asyncio
+from src.env_vars import API_REQUEST_TIMEOUT
+from src.libs.custom_logger import get_custom_logger
+from src.node.api_clients.async_rest import AsyncREST, run_blocking
+
+logger = get_custom_logger(__name__)
+
+
+class AsyncWakuNode:
+    """
+    Awaitable facade over a started WakuNode. Calls go through the WakuNode methods so the node side bookkeeping
+    (e.g. tracked subscriptions) stays correct; `api` gives direct access to every REST endpoint as a coroutine.
+    """
+
+    def __init__(self, node, timeout=API_REQUEST_TIMEOUT):
+        self.node = node
+        self._timeout = timeout
+
+    @property
+    def api(self):
+        return AsyncREST(self.node._api, timeout=self._timeout)
+
+    async def _call(self, func, *args, **kwargs):
+        return await run_blocking(func, *args, timeout=self._timeout, **kwargs)
+
+    async def info(self):
+        return await self._call(self.node.info)
+
+    async def health(self):
+        return await self._call(self.node.health)
+
+    async def get_peers(self):
+        return await self._call(self.node.get_peers)
+
+    async def add_peers(self, peers):
+        return await self._call(self.node.add_peers, peers)
+
+    async def get_connected_peers(self):
+        return await self._call(self.node.get_connected_peers)
+
+    async def get_mesh_peers_on_shard(self, shard_id):
+        return await self._call(self.node.get_mesh_peers_on_shard, shard_id)
+
+    async def set_relay_subscriptions(self, pubsub_topics):
+        return await self._call(self.node.set_relay_subscriptions, pubsub_topics)
+
+    async def delete_relay_subscriptions(self, pubsub_topics):
+        return await self._call(self.node.delete_relay_subscriptions, pubsub_topics)
+
+    async def set_relay_auto_subscriptions(self, content_topics):
+        return await self._call(self.node.set_relay_auto_subscriptions, content_topics)
+
+    async def send_relay_message(self, message, pubsub_topic):
+        return await self._call(self.node.send_relay_message, message, pubsub_topic)
+
+    async def get_relay_messages(self, pubsub_topic):
+        return await self._call(self.node.get_relay_messages, pubsub_topic)
+
+    async def get_relay_auto_messages(self, content_topic):
+        return await self._call(self.node.get_relay_auto_messages, content_topic)
+
+    async def send_light_push_message(self, payload):
+        return await self._call(self.node.send_light_push_message, payload)
+
+    async def set_filter_subscriptions(self, subscription):
+        return await self._call(self.node.set_filter_subscriptions, subscription)
+
+    async def get_filter_messages(self, content_topic, pubsub_topic=None):
+        return await self._call(self.node.get_filter_messages, content_topic, pubsub_topic)
+
+    async def get_store_messages(self, **kwargs):
+        return await self._call(self.node.get_store_messages, **kwargs)
+
+    async def get_metrics(self):
+        return await self._call(self.node.get_metrics)
+
+
+def gather_on_nodes(nodes, operation, concurrency=8, timeout=API_REQUEST_TIMEOUT, return_exceptions=False):
+    """
+    Runs `operation(async_node)` for all nodes concurrently, at most `concurrency` at a time, and returns the
+    results in the order of `nodes`. With return_exceptions the failures are returned in place of the results.
+    """
+
+    async def run_all():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(node):
+            async with semaphore:
+                return await operation(AsyncWakuNode(node, timeout=timeout))
+
+        return await asyncio.gather(*(run_one(node) for node in nodes), return_exceptions=return_exceptions)
+
+    if not nodes:
+        return []
+    return asyncio.run(run_all())
@@ -0,0 +1,157 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from time import perf_counter, sleep, time
+from typing import Optional
+from src.libs.custom_logger import get_custom_logger
+from src.libs.message_ledger import MessageLedger
+
+logger = get_custom_logger(__name__)
+
+
+@dataclass
+class PublishRecord:
+    index: int
+    message: dict
+    sent_at: float
+    # open loop: measured from the scheduled send time, so a slow node can't hide its queueing delay
+    latency: Optional[float] = None
+    error: Optional[str] = None
+    message_hash: Optional[str] = None
+
+
+class PublishLedger:
+    """Outcome of a bulk publish, indexed by message index (which is also the message timestamp order)."""
+
+    def __init__(self, records, started_at, finished_at):
+        self.records = sorted(records, key=lambda record: record.index)
+        self.started_at = started_at
+        self.finished_at = finished_at
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    def compute_hashes(self, batch_hash_fn):
+        hashes = batch_hash_fn([record.message for record in self.records])
+        for record, message_hash in zip(self.records, hashes):
+            record.message_hash = message_hash
+        return self
+
+    def hashes(self, include_failed=False):
+        return [record.message_hash for record in self.records if include_failed or record.error is None]
+
+    def message_ledger(self, include_failed=False):
+        return MessageLedger(self.hashes(include_failed=include_failed))
+
+    def failures(self):
+        return [record for record in self.records if record.error is not None]
+
+    def summary(self):
+        latencies = sorted(record.latency for record in self.records if record.error is None)
+        duration = self.finished_at - self.started_at
+
+        def percentile(q):
+            return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))], 4) if latencies else None
+
+        return {
+            "sent": len(self.records),
+            "failed": len(self.failures()),
+            "duration_s": round(duration, 2),
+            "rate_msgs_per_s": round(len(self.records) / duration, 2) if duration else None,
+            "latency_p50_s": percentile(0.5),
+            "latency_p99_s": percentile(0.99),
+            "latency_max_s": round(latencies[-1], 4) if latencies else None,
+        }
+
+
+class BulkPublisher:
+    """
+    Publishes many messages through relay or lightpush from a worker pool at a target rate.
+    open mode sends on a fixed schedule (index / rate) no matter how fast the node answers, closed mode lets every
+    worker send its next message as soon as the previous one returned, capped at `rate` when it is set.
+    Messages are built by `message_factory(index)` right before they are sent so their timestamps stay fresh
+    and follow the index order.
+    """
+
+    def __init__(self, sender, pubsub_topic, via="relay", rate=None, workers=8, mode="closed"):
+        if mode not in ("open", "closed"):
+            raise ValueError(f"Unknown publish mode {mode}")
+        if mode == "open" and not rate:
+            raise ValueError("open mode needs a target rate")
+        self._sender = sender
+        self._pubsub_topic = pubsub_topic
+        self._via = via
+        self._rate = rate
+        self._workers = workers
+        self._mode = mode
+        self._lock = threading.Lock()
+
+    def _send(self, message):
+        if self._via == "relay":
+            self._sender.send_relay_message(message, self._pubsub_topic)
+        elif self._via == "lightpush":
+            self._sender.send_light_push_message({"pubsubTopic": self._pubsub_topic, "message": message})
+        else:
+            raise ValueError(f"Unknown publish channel {self._via}")
+
+    def _send_record(self, index, message, scheduled_at):
+        record = PublishRecord(index=index, message=message, sent_at=time())
+        try:
+            self._send(message)
+            record.latency = perf_counter() - scheduled_at
+        except Exception as ex:
+            record.error = str(ex)
+        return record
+
+    def publish(self, count, message_factory):
+        started_at = perf_counter()
+        if self._mode == "open":
+            records = self._publish_open_loop(count, message_factory, started_at)
+        else:
+            records = self._publish_closed_loop(count, message_factory, started_at)
+        ledger = PublishLedger(records, started_at, perf_counter())
+        logger.info(f"Bulk publish via {self._via} ({self._mode} loop): {ledger.summary()}")
+        return ledger
+
+    def _publish_open_loop(self, count, message_factory, started_at):
+        with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="publisher") as executor:
+            futures = []
+            for index in range(count):
+                scheduled_at = started_at + index / self._rate
+                wait = scheduled_at - perf_counter()
+                if wait > 0:
+                    sleep(wait)
+                futures.append(executor.submit(self._send_record, index, message_factory(index), scheduled_at))
+            return [future.result() for future in futures]
+
+    def _publish_closed_loop(self, count, message_factory, started_at):
+        indices = iter(range(count))
+        state = {"next_slot": started_at}
+
+        def take_next():
+            # index, message and send slot are handed out together so timestamps follow the index order
+            with self._lock:
+                index = next(indices, None)
+                if index is None:
+                    return None
+                slot = max(perf_counter(), state["next_slot"])
+                if self._rate:
+                    state["next_slot"] = slot + 1 / self._rate
+                return index, message_factory(index), slot
+
+        def worker():
+            records = []
+            while (item := take_next()) is not None:
+                index, message, slot = item
+                wait = slot - perf_counter()
+                if wait > 0:
+                    sleep(wait)
+                records.append(self._send_record(index, message, perf_counter()))
+            return records
+
+        with ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="publisher") as executor:
+            futures = [executor.submit(worker) for _ in range(self._workers)]
+            return [record for future in futures for record in future.result()]
@@ -0,0 +1,306 @@
+import hashlib
+import threading
+import docker
+from docker.errors import ImageNotFound, NotFound
+from docker.types import IPAMConfig, IPAMPool
+from src.env_vars import DOCKER_CLIENT_POOL_SIZE, GATEWAY, IP_RANGE, NETWORK_NAME, NODE_BACKEND, SUBNET
+from src.libs.custom_logger import get_custom_logger
+from src.node.fake_waku_server import FakeWakuNode
+from src.node.log_collector import get_log_collector, subscribe_logs, unsubscribe_logs
+
+logger = get_custom_logger(__name__)
+
+
+class ContainerBackend:
+    """Container operations DockerManager relies on; containers are opaque handles with `id` and `short_id`."""
+
+    def network(self, network_name=NETWORK_NAME):
+        raise NotImplementedError
+
+    def create(self, image, command, ports, volumes, remove=True, labels=None):
+        raise NotImplementedError
+
+    def start(self, container):
+        raise NotImplementedError
+
+    def connect(self, container, ip, network_name=NETWORK_NAME):
+        raise NotImplementedError
+
+    def events(self, container, since):
+        """Stream of the die/oom events of the container since `since`."""
+        raise NotImplementedError
+
+    def attach_logs(self, container, log_path, listeners=()):
+        raise NotImplementedError
+
+    def switch_logs(self, container, log_path, new_log_path):
+        """Leaves what was written so far in log_path and continues the container's log in a fresh new_log_path."""
+        raise NotImplementedError
+
+    def stats(self, container):
+        raise NotImplementedError
+
+    def pause(self, container):
+        raise NotImplementedError
+
+    def unpause(self, container):
+        raise NotImplementedError
+
+    def restart(self, container):
+        raise NotImplementedError
+
+    def stop(self, container, timeout=None):
+        raise NotImplementedError
+
+    def kill(self, container):
+        raise NotImplementedError
+
+    def remove(self, container, force=False):
+        raise NotImplementedError
+
+    def is_running(self, container):
+        raise NotImplementedError
+
+    def list_labeled(self, label):
+        """All containers, running or not, carrying the label."""
+        raise NotImplementedError
+
+    def image_digest(self, image):
+        """Digest of the local copy of the image, None when it isn't pulled yet."""
+        raise NotImplementedError
+
+    def pull(self, image):
+        raise NotImplementedError
+
+
+class DockerBackend(ContainerBackend):
+    """
+    One docker client for the whole process. Its connection pool is sized for the threads starting and querying
+    nodes concurrently, and the network handle is looked up once instead of on every node start.
+    """
+
+    def __init__(self, pool_size=DOCKER_CLIENT_POOL_SIZE):
+        self._pool_size = pool_size
+        self._client = None
+        self._networks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        # created on first use, so importing the backend doesn't need a docker daemon
+        with self._lock:
+            if self._client is None:
+                self._client = docker.from_env(max_pool_size=self._pool_size)
+                logger.debug(f"Docker client initialized with a pool of {self._pool_size} connections")
+            return self._client
+
+    def network(self, network_name=NETWORK_NAME):
+        client = self.client
+        with self._lock:
+            if network_name in self._networks:
+                return self._networks[network_name]
+            networks = client.networks.list(names=[network_name])
+            if networks:
+                logger.debug(f"Network {network_name} already exists")
+                network = networks[0]
+            else:
+                network = client.networks.create(
+                    network_name,
+                    driver="bridge",
+                    ipam=IPAMConfig(driver="default", pool_configs=[IPAMPool(subnet=SUBNET, iprange=IP_RANGE, gateway=GATEWAY)]),
+                )
+                logger.debug(f"Network {network_name} created")
+            self._networks[network_name] = network
+            return network
+
+    def create(self, image, command, ports, volumes, remove=True, labels=None):
+        port_bindings = {f"{port}/tcp": ("", port) for port in ports}
+        kwargs = dict(command=command, ports=port_bindings, detach=True, auto_remove=remove, volumes=volumes, labels=labels or {})
+        try:
+            return self.client.containers.create(image, **kwargs)
+        except ImageNotFound:
+            self.client.images.pull(image)
+            return self.client.containers.create(image, **kwargs)
+
+    def start(self, container):
+        container.start()
+
+    def connect(self, container, ip, network_name=NETWORK_NAME):
+        try:
+            self.network(network_name).connect(container, ipv4_address=ip)
+        except NotFound:
+            # the network was removed behind our back (e.g. by a docker prune), forget the cached handle
+            with self._lock:
+                self._networks.pop(network_name, None)
+            self.network(network_name).connect(container, ipv4_address=ip)
+
+    def events(self, container, since):
+        return self.client.events(decode=True, since=since, filters={"container": container.id, "event": ["die", "oom"]})
+
+    def attach_logs(self, container, log_path, listeners=()):
+        return get_log_collector(self.client).attach(container, log_path, listeners=listeners)
+
+    def switch_logs(self, container, log_path, new_log_path):
+        get_log_collector(self.client).switch(log_path, new_log_path)
+
+    def stats(self, container):
+        return container.stats(stream=False)
+
+    def pause(self, container):
+        container.pause()
+
+    def unpause(self, container):
+        container.unpause()
+
+    def restart(self, container):
+        container.restart()
+
+    def stop(self, container, timeout=None):
+        if timeout is None:
+            container.stop()
+        else:
+            container.stop(timeout=timeout)
+
+    def kill(self, container):
+        container.kill()
+
+    def remove(self, container, force=False):
+        container.remove(force=force)
+
+    def is_running(self, container):
+        try:
+            return self.client.containers.get(container.id).status == "running"
+        except NotFound:
+            logger.error(f"Container with ID {container.id} not found")
+            return False
+
+    def list_labeled(self, label):
+        return self.client.containers.list(all=True, filters={"label": label})
+
+    def image_digest(self, image):
+        try:
+            attrs = self.client.images.get(image).attrs
+        except ImageNotFound:
+            return None
+        # locally built images have no repo digest, their id is the best we have
+        return (attrs.get("RepoDigests") or [attrs["Id"]])[0].split("@")[-1]
+
+    def pull(self, image):
+        self.client.images.pull(image)
+
+
+class FakeContainer:
+    def __init__(self, node, labels=None):
+        self.node = node
+        self.labels = labels or {}
+        self.id = node.peer_id
+        self.short_id = node.peer_id[-12:]
+        self.status = "created"
+        self.attrs = {"State": {"Pid": 0}, "Config": {"Tty": False}}
+        self.log_token = None
+
+
+class FakeBackend(ContainerBackend):
+    """
+    Runs every "container" as an in-process FakeWakuNode serving the REST API on the ports it was given, so the
+    harness (port leases, readiness, log collection, fixtures) can be benchmarked without any docker call.
+    The fake node only starts once its log path is known, i.e. when its logs are attached.
+    """
+
+    def network(self, network_name=NETWORK_NAME):
+        return None
+
+    @staticmethod
+    def parse_command(command):
+        args = {}
+        for item in command:
+            key, _, value = item[2:].partition("=") if item.startswith("--") else (item, "", None)
+            if key in args:
+                previous = args[key] if isinstance(args[key], list) else [args[key]]
+                args[key] = previous + [value]
+            else:
+                args[key] = value
+        return args
+
+    def create(self, image, command, ports, volumes, remove=True, labels=None):
+        args = self.parse_command(command)
+        rest_ports = [args[flag] for flag in ("rest-port", "metrics-server-port") if args.get(flag)]
+        return FakeContainer(FakeWakuNode(args, log_path=None, ports=rest_ports or ports[:1], volumes=volumes), labels=labels)
+
+    def start(self, container):
+        container.status = "running"
+
+    def connect(self, container, ip, network_name=NETWORK_NAME):
+        pass
+
+    def events(self, container, since):
+        return iter(())
+
+    def attach_logs(self, container, log_path, listeners=()):
+        if listeners:
+
+            def forward(path, chunk):
+                for listener in listeners:
+                    listener(chunk)
+
+            container.log_token = subscribe_logs(forward, log_path)
+        container.node.log_path = log_path
+        container.node.start()
+
+    def switch_logs(self, container, log_path, new_log_path):
+        container.node.switch_log(new_log_path)
+
+    def stats(self, container):
+        return {"id": container.id, "name": container.short_id, "cpu_stats": {}, "memory_stats": {}, "networks": {}}
+
+    def pause(self, container):
+        container.node.pause()
+        container.status = "paused"
+
+    def unpause(self, container):
+        container.node.unpause()
+        container.status = "running"
+
+    def restart(self, container):
+        self.unpause(container)
+
+    def stop(self, container, timeout=None):
+        if container.log_token is not None:
+            unsubscribe_logs(container.log_token)
+            container.log_token = None
+        container.node.stop()
+        container.status = "exited"
+
+    def kill(self, container):
+        self.stop(container)
+
+    def remove(self, container, force=False):
+        if force and container.status != "exited":
+            self.stop(container)
+        container.status = "removed"
+
+    def is_running(self, container):
+        return container.status == "running"
+
+    def list_labeled(self, label):
+        # fake containers live and die with the test process, there are never orphans
+        return []
+
+    def image_digest(self, image):
+        return "fake:" + hashlib.sha256(image.encode()).hexdigest()[:12]
+
+    def pull(self, image):
+        pass
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_container_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = FakeBackend() if NODE_BACKEND == "fake" else DockerBackend()
+            logger.debug(f"Using the {type(_backend).__name__} container backend")
+        return _backend
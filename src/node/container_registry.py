@@ -0,0 +1,158 @@
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from time import time
+from src.env_vars import CONTAINER_STOP_TIMEOUT, REAPER_WORKERS, TEST_SESSION_ID
+from src.libs.custom_logger import get_custom_logger
+from src.node.container_backend import get_container_backend
+from src.node.resource_allocator import _pid_alive
+
+logger = get_custom_logger(__name__)
+
+SESSION_LABEL = "waku-interop.session"
+WORKER_LABEL = "waku-interop.worker"
+PID_LABEL = "waku-interop.pid"
+HOST_LABEL = "waku-interop.host"
+
+
+@dataclass
+class ReapReport:
+    count: int = 0
+    wall_time: float = 0.0
+    # what the same work took container after container, i.e. what a serial teardown would have cost
+    serial_time: float = 0.0
+    errors: dict = field(default_factory=dict)
+
+    @property
+    def saved(self):
+        return round(max(0.0, self.serial_time - self.wall_time), 3)
+
+
+def run_concurrently(items, action, workers=REAPER_WORKERS):
+    """Runs action(item) for every item on a thread pool, returns a ReapReport with {item: exception} as errors."""
+    items = list(items)
+    report = ReapReport(count=len(items))
+    if not items:
+        return report
+
+    def timed(item):
+        started_at = time()
+        try:
+            action(item)
+            return item, time() - started_at, None
+        except Exception as ex:
+            return item, time() - started_at, ex
+
+    started_at = time()
+    with ThreadPoolExecutor(max_workers=min(workers, len(items)), thread_name_prefix="reaper") as executor:
+        results = list(executor.map(timed, items))
+    report.wall_time = round(time() - started_at, 3)
+    report.serial_time = round(sum(duration for _, duration, _ in results), 3)
+    report.errors = {item: error for item, _, error in results if error is not None}
+    return report
+
+
+class ContainerRegistry:
+    """
+    Keeps the containers started by this process until they are stopped and labels them with the session, the
+    host, the xdist worker and the pid. Leftovers are stopped and removed concurrently with a short grace period at the end
+    of every test and of the session; at startup the labeled containers of crashed earlier runs are pruned.
+    """
+
+    def __init__(self, backend=None, session_id=TEST_SESSION_ID, stop_timeout=CONTAINER_STOP_TIMEOUT):
+        self._backend = backend or get_container_backend()
+        self._session_id = session_id
+        self._stop_timeout = stop_timeout
+        # strong references: a container whose start failed is only referenced from here once the exception is gone
+        self._live = {}
+        # containers of warm pool nodes, they outlive the test that started them
+        self._session_scoped = set()
+        self._lock = threading.Lock()
+        self.saved_time = 0.0
+
+    @property
+    def labels(self):
+        return {
+            SESSION_LABEL: self._session_id,
+            HOST_LABEL: socket.gethostname(),
+            WORKER_LABEL: os.environ.get("PYTEST_XDIST_WORKER", "main"),
+            PID_LABEL: str(os.getpid()),
+        }
+
+    def track(self, container, session_scoped=False):
+        with self._lock:
+            self._live[container.id] = container
+            if session_scoped:
+                self._session_scoped.add(container.id)
+
+    def untrack(self, container):
+        with self._lock:
+            self._live.pop(container.id, None)
+            self._session_scoped.discard(container.id)
+
+    def live(self, include_session_scoped=True):
+        with self._lock:
+            return [container for container_id, container in self._live.items() if include_session_scoped or container_id not in self._session_scoped]
+
+    def _dispose(self, container):
+        try:
+            self._backend.stop(container, timeout=self._stop_timeout)
+        finally:
+            self.untrack(container)
+            try:
+                self._backend.remove(container, force=True)
+            except Exception:
+                # auto removed containers are gone as soon as they stop
+                pass
+
+    def _account(self, report, what):
+        self.saved_time += report.saved
+        if report.count:
+            logger.debug(
+                f"{what}: {report.count} in {report.wall_time}s instead of {report.serial_time}s one by one, "
+                f"{len(report.errors)} errors {list(report.errors.values())}"
+            )
+        return report
+
+    def stop_nodes(self, nodes, stop):
+        """Calls stop(node) for all nodes concurrently, returns the ReapReport ({node: exception} as errors)."""
+        return self._account(run_concurrently(nodes, stop), "Stopped nodes")
+
+    def reap(self, include_session_scoped=False):
+        """Stops and removes the tracked containers nobody stopped, e.g. of nodes that failed before being registered."""
+        return self._account(run_concurrently(self.live(include_session_scoped), self._dispose), "Reaped leftover containers")
+
+    def prune_orphans(self):
+        """
+        Removes the labeled containers of earlier runs on this host whose test process is gone. Containers of other
+        hosts sharing the docker daemon (e.g. CI jobs in other pid namespaces) are left alone, their pids mean
+        nothing here.
+        """
+        orphans = []
+        hostname = socket.gethostname()
+        for container in self._backend.list_labeled(SESSION_LABEL):
+            labels = container.labels or {}
+            pid = labels.get(PID_LABEL, "")
+            if labels.get(HOST_LABEL) != hostname or labels.get(SESSION_LABEL) == self._session_id:
+                continue
+            if pid.isdigit() and _pid_alive(int(pid)):
+                continue
+            orphans.append(container)
+        report = run_concurrently(orphans, self._dispose)
+        if orphans:
+            logger.info(f"Pruned {len(orphans)} orphan containers of crashed runs in {report.wall_time}s")
+        return report
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_container_registry():
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ContainerRegistry()
+        return _registry
@@ -1,39 +1,31 @@
-import os
-import re
-import time
 from src.libs.custom_logger import get_custom_logger
-import random
-import threading
-import docker
-from src.env_vars import NETWORK_NAME, SUBNET, IP_RANGE, GATEWAY
-from docker.types import IPAMConfig, IPAMPool
-from docker.errors import NotFound, APIError
+from src.env_vars import CONTAINER_STOP_TIMEOUT, NETWORK_NAME
+from src.node.container_backend import get_container_backend
+from src.node.container_registry import get_container_registry
+from src.node.log_index import drop_log_index, get_log_index
+from src.node.resource_allocator import get_allocator
 
 logger = get_custom_logger(__name__)
 
 
 class DockerManager:
-    def __init__(self, image):
+    def __init__(self, image, backend=None):
         self._image = image
-        self._client = docker.from_env()
-        logger.debug(f"Docker client initialized with image {self._image}")
+        # shared by all nodes: one docker client and one network handle per process
+        self._backend = backend or get_container_backend()
+        self._registry = get_container_registry()
+
+    @property
+    def backend(self):
+        return self._backend
 
     def create_network(self, network_name=NETWORK_NAME):
         logger.debug(f"Attempting to create or retrieve network {network_name}")
-        networks = self._client.networks.list(names=[network_name])
-        if networks:
-            logger.debug(f"Network {network_name} already exists")
-            return networks[0]
-
-        network = self._client.networks.create(
-            network_name,
-            driver="bridge",
-            ipam=IPAMConfig(driver="default", pool_configs=[IPAMPool(subnet=SUBNET, iprange=IP_RANGE, gateway=GATEWAY)]),
-        )
-        logger.debug(f"Network {network_name} created")
-        return network
+        return self._backend.network(network_name)
 
-    def start_container(self, image_name, ports, args, log_path, container_ip, volumes, remove_container=True):
+    def start_container(
+        self, image_name, ports, args, log_path, container_ip, volumes, remove_container=True, readiness_waiter=None, session_scoped=False
+    ):
         cli_args = []
         for key, value in args.items():
             if isinstance(value, list):  # Check if value is a list
@@ -43,96 +35,89 @@ class DockerManager:
             else:
                 cli_args.append(f"--{key}={value}")  # Add a single command
 
-        port_bindings = {f"{port}/tcp": ("", port) for port in ports}
         port_bindings_for_log = " ".join(f"-p {port}:{port}" for port in ports)
         cli_args_str_for_log = " ".join(cli_args)
         logger.debug(f"docker run -i -t {port_bindings_for_log} {image_name} {cli_args_str_for_log}")
-        container = self._client.containers.run(
-            image_name, command=cli_args, ports=port_bindings, detach=True, remove=remove_container, auto_remove=remove_container, volumes=volumes
+        container = self._backend.create(
+            image_name, command=cli_args, ports=ports, volumes=volumes, remove=remove_container, labels=self._registry.labels
         )
+        # tracked before it starts, so the reaper also gets the containers of nodes failing to come up
+        self._registry.track(container, session_scoped=session_scoped)
+        self._backend.start(container)
+        if readiness_waiter:
+            readiness_waiter.mark("create")
+            # replaying from the start time means an early crash is not missed
+            readiness_waiter.watch_events(self._backend.events(container, since=int(readiness_waiter.started_at) - 1))
 
-        network = self._client.networks.get(NETWORK_NAME)
         logger.debug(f"docker network connect --ip {container_ip} {NETWORK_NAME} {container.id}")
-        network.connect(container, ipv4_address=container_ip)
+        self._backend.connect(container, container_ip)
+        if readiness_waiter:
+            readiness_waiter.mark("network_connect")
 
         logger.debug(f"Container started with ID {container.short_id}. Setting up logs at {log_path}")
-        log_thread = threading.Thread(target=self._log_container_output, args=(container, log_path))
-        log_thread.daemon = True
-        log_thread.start()
+        self._backend.attach_logs(container, log_path, listeners=[readiness_waiter.feed] if readiness_waiter else [])
 
         return container
 
-    def _log_container_output(self, container, log_path):
-        os.makedirs(os.path.dirname(log_path), exist_ok=True)
-        retry_count = 0
-        start_time = time.time()
-        try:
-            with open(log_path, "wb+") as log_file:
-                while True:
-                    if container.status in ["exited", "dead"]:
-                        logger.info(f"Container {container.short_id} has stopped. Exiting log stream.")
-                        return
-                    try:
-                        for chunk in container.logs(stream=True):
-                            if chunk:
-                                log_file.write(chunk)
-                                log_file.flush()
-                                start_time = time.time()
-                                retry_count = 0
-                            else:
-                                if time.time() - start_time > 5:
-                                    logger.warning(f"Log stream timeout for container {container.short_id}")
-                                    return
-                    except (APIError, IOError) as e:
-                        retry_count += 1
-                        if retry_count >= 5:
-                            logger.error(f"Max retries reached for container {container.short_id}. Exiting log stream.")
-                            return
-                        time.sleep(0.2)
-                    except Exception as e:
-                        return
-        except Exception as e:
-            logger.error(f"Failed to set up logging for container {container.short_id}: {e}")
-
     def generate_ports(self, base_port=None, count=5):
         if base_port is None:
-            base_port = random.randint(1024, 65535 - count)
-        ports = [str(base_port + i) for i in range(count)]
+            ports = get_allocator().lease_ports(count)
+        else:
+            ports = [str(base_port + i) for i in range(count)]
         logger.debug(f"Generated ports {ports}")
         return ports
 
     @staticmethod
     def generate_random_ext_ip():
-        base_ip_fragments = ["172", "18"]
-        ext_ip = ".".join(base_ip_fragments + [str(random.randint(0, 255)) for _ in range(2)])
+        ext_ip = get_allocator().lease_ip()
         logger.debug(f"Generated random external IP {ext_ip}")
         return ext_ip
 
+    @staticmethod
+    def release_ports_and_ip(ports, ext_ip):
+        get_allocator().release(ports=ports, ip=ext_ip)
+        logger.debug(f"Released ports {ports} and external IP {ext_ip}")
+
+    def switch_log(self, container, log_path, new_log_path):
+        self._backend.switch_logs(container, log_path, new_log_path)
+
     def is_container_running(self, container):
-        try:
-            refreshed_container = self._client.containers.get(container.id)
-            return refreshed_container.status == "running"
-        except NotFound:
-            logger.error(f"Container with ID {container.id} not found")
-            return False
+        return self._backend.is_running(container)
+
+    def container_stats(self, container):
+        return self._backend.stats(container)
+
+    def stop_container(self, container):
+        # nwaku shuts down in well under a second on SIGTERM, the default 10 seconds grace only slows down teardown
+        self._backend.stop(container, timeout=CONTAINER_STOP_TIMEOUT)
+        self._registry.untrack(container)
+
+    def kill_container(self, container):
+        self._backend.kill(container)
+        self._registry.untrack(container)
+
+    def remove_container(self, container):
+        self._backend.remove(container)
+
+    def restart_container(self, container):
+        self._backend.restart(container)
+
+    def pause_container(self, container):
+        self._backend.pause(container)
+
+    def unpause_container(self, container):
+        self._backend.unpause(container)
 
     @property
     def image(self):
         return self._image
 
-    def search_log_for_keywords(self, log_path, keywords, use_regex=False):
-        matches = {keyword: [] for keyword in keywords}
-
-        # Open the log file and search line by line
-        with open(log_path, "r") as log_file:
-            for line in log_file:
-                for keyword in keywords:
-                    if use_regex:
-                        if re.search(keyword, line, re.IGNORECASE):
-                            matches[keyword].append(line.strip())
-                    else:
-                        if keyword.lower() in line.lower():
-                            matches[keyword].append(line.strip())
+    @staticmethod
+    def close_log(log_path):
+        drop_log_index(log_path)
+
+    def search_log_for_keywords(self, log_path, keywords, use_regex=False, include_partial=False):
+        matches = get_log_index(log_path).search(keywords, use_regex, include_partial=include_partial)
 
         # Check if there were any matches
         if any(matches[keyword] for keyword in keywords):
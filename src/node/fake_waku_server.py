@@ -0,0 +1,886 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import random
+import re
+import secrets
+import sqlite3
+import string
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import time_ns
+from urllib.parse import parse_qs, unquote, urlsplit
+from src.libs.custom_logger import get_custom_logger
+from src.libs.message_hasher import get_message_hasher
+from src.libs.message_ledger import decode_message_hash
+from src.node.log_collector import publish_log
+from src.test_data import DEFAULT_CLUSTER_ID, METRICS_WITH_INITIAL_VALUE_ZERO
+
+logger = get_custom_logger(__name__)
+
+FAKE_VERSION = "v0.0.0-fake"
+# nwaku default number of shards used for autosharding
+AUTOSHARDING_SHARDS = 8
+# seconds a REST call to a paused node hangs before failing
+PAUSED_REQUEST_TIMEOUT = 60
+STORE_DEFAULT_PAGE_SIZE = 20
+STORE_MAX_PAGE_SIZE = 100
+# nwaku default max-msg-size
+FILTER_MAX_CONTENT_TOPICS = 100
+MAX_MESSAGE_SIZE = 150 * 1024
+PUBSUB_TOPIC_PATTERN = re.compile(r"^/waku/2/rs/\d+/\d+$")
+MESSAGE_FIELDS = {"payload", "contentTopic", "version", "timestamp", "meta", "ephemeral", "rateLimitProof", "proof"}
+PEER_PROTOCOLS = {
+    "relay": "/vac/waku/relay/2.0.0",
+    "store": "/vac/waku/store-query/3.0.0",
+    "filter": "/vac/waku/filter-subscribe/2.0.0-beta1",
+    "lightpush": "/vac/waku/lightpush/2.0.0-beta1",
+}
+
+
+class FakeRestError(Exception):
+    def __init__(self, status, body):
+        super().__init__(body)
+        self.status = status
+        self.body = body
+
+
+def autoshard(content_topic, cluster_id=DEFAULT_CLUSTER_ID):
+    """Pubsub topic nwaku's autosharding maps a `/app/version/name/encoding` content topic to."""
+    parts = content_topic.split("/")
+    if len(parts) < 5 or not parts[1] or not parts[2]:
+        raise FakeRestError(400, f"Invalid content topic: {content_topic}")
+    digest = hashlib.sha256((parts[1] + parts[2]).encode("utf-8")).digest()
+    return f"/waku/2/rs/{cluster_id}/{int.from_bytes(digest[24:], 'big') % AUTOSHARDING_SHARDS}"
+
+
+def check_pubsub_topic(pubsub_topic):
+    if not isinstance(pubsub_topic, str) or not PUBSUB_TOPIC_PATTERN.match(pubsub_topic):
+        raise FakeRestError(400, f"Invalid pubsub topic: {pubsub_topic}")
+    return pubsub_topic
+
+
+def parse_message_hash(message_hash):
+    """Parses a store hash or cursor the way nwaku does and fails with its error texts."""
+    value = message_hash[2:] if message_hash.startswith("0x") else message_hash
+    invalid = next((char for char in value if char not in string.hexdigits), None)
+    if invalid is not None:
+        try:
+            # go-waku style base64 hashes
+            return decode_message_hash(message_hash)
+        except (ValueError, binascii.Error):
+            raise FakeRestError(400, f"Exception converting hex string to bytes: {invalid} is not a hexadecimal character")
+    if len(value) != 64:
+        raise FakeRestError(400, "waku message hash parsing error: invalid hash length")
+    return bytes.fromhex(value)
+
+
+def shard_of(pubsub_topic):
+    try:
+        return int(pubsub_topic.split("/")[-1])
+    except ValueError:
+        return None
+
+
+def _random_peer_id():
+    alphabet = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+    return "16Uiu2HAm" + "".join(random.choice(alphabet) for _ in range(44))
+
+
+class FakeNetwork:
+    """Registry of the fake nodes of the test process; it connects them and fans relay messages out between them."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._nodes = {}
+
+    def register(self, node):
+        with self.lock:
+            self._nodes[node.peer_id] = node
+
+    def unregister(self, node):
+        with self.lock:
+            self._nodes.pop(node.peer_id, None)
+            for other in self._nodes.values():
+                other.peers.discard(node.peer_id)
+
+    def find(self, address):
+        """Node behind a multiaddr, an ENR or a peer id."""
+        if not address:
+            return None
+        address = address.strip()
+        if address.startswith("enr:-"):
+            address = address[len("enr:-") :]
+        with self.lock:
+            return self._nodes.get(address.split("/")[-1])
+
+    def get(self, peer_id):
+        with self.lock:
+            return self._nodes.get(peer_id)
+
+    def connect(self, node, address):
+        peer = self.find(address)
+        if peer is None or peer is node:
+            return False
+        with self.lock:
+            node.peers.add(peer.peer_id)
+            peer.peers.add(node.peer_id)
+        return True
+
+    def relay(self, origin, pubsub_topic, message, message_hash):
+        """Gossips a message from origin to every node reachable through relay peers subscribed to the topic."""
+        with self.lock:
+            visited = {origin.peer_id}
+            queue = deque([(origin, None)])
+            while queue:
+                node, from_peer_id = queue.popleft()
+                node.receive(pubsub_topic, message, message_hash, from_peer_id=from_peer_id)
+                for peer_id in node.peers:
+                    peer = self._nodes.get(peer_id)
+                    if peer is None or peer_id in visited or not peer.is_relaying(pubsub_topic):
+                        continue
+                    visited.add(peer_id)
+                    node._log("NTC", "sent relay message", msg_hash=message_hash, to_peer_id=peer_id, topic=pubsub_topic)
+                    queue.append((peer, node.peer_id))
+
+
+_network = None
+_network_lock = threading.Lock()
+
+
+def get_fake_network():
+    global _network
+    with _network_lock:
+        if _network is None:
+            _network = FakeNetwork()
+        return _network
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # keep-alive, the REST client reuses its connections
+    protocol_version = "HTTP/1.1"
+    # headers and body go out in separate writes, with Nagle every response would wait for the delayed ACK
+    disable_nagle_algorithm = True
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, content_type, payload = self.server.fake_node.handle(self.command, self.path, body)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeWakuNode:
+    """
+    In-process stand-in for an nwaku node: a ThreadingHTTPServer serving the REST endpoints used by
+    src/node/api_clients/rest.py (plus /metrics) from in-memory state. Relay messages are fanned out to the other
+    fake nodes of the process, filter and lightpush requests go through the node given as filternode/lightpushnode
+    and store v3 queries (cursor, time, topic and hash filters) are answered from an in-memory archive.
+    Message events are written to the log file in the nwaku format, so log searches and the message timeline work.
+    """
+
+    def __init__(self, start_args, log_path, network=None, ports=None, volumes=None):
+        self.start_args = dict(start_args)
+        self.log_path = log_path
+        self.network = network or get_fake_network()
+        self.peer_id = _random_peer_id()
+        nat = str(self.start_args.get("nat", ""))
+        self.ext_ip = nat[len("extip:") :] if nat.startswith("extip:") else "127.0.0.1"
+        # the REST API is served on every port, 0 picks a free one
+        self._bind_ports = [int(port) for port in ports or [0]]
+        # "host path:container path" mounts, a sqlite store-message-db-url inside one of them persists the archive
+        self._volumes = [volume.split(":")[:2] for volume in volumes or []]
+        self._db = None
+        self.cluster_id = str(self.start_args.get("cluster-id", DEFAULT_CLUSTER_ID))
+        self.relay_enabled = self._flag("relay", True)
+        self.store_enabled = self._flag("store", False) or self._flag("store-sync", False)
+        # cleared while paused: like a paused container, the node keeps its state but REST calls hang until unpause
+        self._running = threading.Event()
+        self._running.set()
+        self.peers = set()
+        self._cache_capacity = int(self.start_args.get("rest-relay-cache-capacity", 100))
+        self._relay_topics = set()
+        self._auto_topics = set()
+        self._relay_cache = {}
+        self._auto_cache = {}
+        # filter service side: client peer id -> {(pubsub topic, content topic)}; client side: cached pushes
+        self._filter_subscribers = {}
+        self._filter_cache = {}
+        self._seen = set()
+        # store archive: sorted (timestamp, digest) keys and digest -> (pubsub topic, message)
+        self._archive_keys = []
+        self._archive = {}
+        self._counters = {}
+        self._lock = threading.RLock()
+        self._log_lock = threading.Lock()
+        self._log_file = None
+        self._servers = []
+        self._routes = self._build_routes()
+
+    def _flag(self, name, default):
+        value = self.start_args.get(name)
+        return default if value is None else str(value).lower() == "true"
+
+    @property
+    def port(self):
+        return self._servers[0].server_address[1]
+
+    @property
+    def tcp_address(self):
+        return f"/ip4/{self.ext_ip}/tcp/{self.start_args.get('tcp-port', self.port)}/p2p/{self.peer_id}"
+
+    @property
+    def enr_uri(self):
+        return f"enr:-{self.peer_id}"
+
+    # ---- lifecycle
+
+    def start(self):
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        self._log_file = open(self.log_path, "ab")
+        for port in self._bind_ports:
+            server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+            server.daemon_threads = True
+            server.fake_node = self
+            threading.Thread(target=server.serve_forever, name=f"fake-nwaku-{server.server_address[1]}", daemon=True).start()
+            self._servers.append(server)
+        self.network.register(self)
+        if self.store_enabled:
+            self._open_db()
+        self._log("INF", "Starting REST HTTP server", url=f"http://127.0.0.1:{self.port}")
+        for flag in ("discv5-bootstrap-node", "staticnode", "storenode", "filternode", "lightpushnode"):
+            for address in self._as_list(self.start_args.get(flag)):
+                self.network.connect(self, address)
+        self._log("INF", "Node started successfully", peerId=self.peer_id)
+        return self
+
+    def stop(self):
+        self.network.unregister(self)
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+        if self._log_file is not None:
+            self._log("INF", "Node stopped")
+            with self._log_lock:
+                self._log_file.close()
+                self._log_file = None
+
+    def switch_log(self, log_path):
+        os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+        with self._log_lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = open(log_path, "ab")
+            else:
+                open(log_path, "ab").close()
+            self.log_path = log_path
+
+    def _db_path(self):
+        url = str(self.start_args.get("store-message-db-url", ""))
+        if not url.startswith("sqlite://"):
+            return None
+        path = url[len("sqlite://") :]
+        for host_path, container_path in self._volumes:
+            if path.startswith(container_path.rstrip("/") + "/"):
+                return os.path.join(host_path, path[len(container_path.rstrip("/")) + 1 :])
+        return None
+
+    def _open_db(self):
+        path = self._db_path()
+        if path is None:
+            return
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS messages (digest BLOB PRIMARY KEY, timestamp INTEGER, pubsub_topic TEXT, message TEXT)")
+        for digest, timestamp, pubsub_topic, message in self._db.execute("SELECT digest, timestamp, pubsub_topic, message FROM messages"):
+            self._archive[digest] = (pubsub_topic, json.loads(message))
+            self._seen.add("0x" + digest.hex())
+            insort(self._archive_keys, (timestamp, digest))
+        logger.debug(f"Fake node {self.peer_id} loaded {len(self._archive)} messages from {path}")
+
+    @staticmethod
+    def _as_list(value):
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+
+    def _log(self, level, text, **fields):
+        if self._log_file is None:
+            return
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3] + "+00:00"
+        line = f"{level} {now} {text:<40} " + " ".join(f"{key}={value}" for key, value in fields.items()) + "\n"
+        chunk = line.encode("utf-8")
+        with self._log_lock:
+            if self._log_file is not None:
+                self._log_file.write(chunk)
+                self._log_file.flush()
+        publish_log(self.log_path, chunk)
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    def pause(self):
+        self._running.clear()
+
+    def unpause(self):
+        self._running.set()
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    # ---- relay
+
+    def is_relaying(self, pubsub_topic):
+        return self.relay_enabled and pubsub_topic in self._relay_topics
+
+    def relays_to_others(self, pubsub_topic):
+        """True when at least one connected peer relays the topic, else a publish reaches nobody."""
+        return any(peer is not None and peer.is_relaying(pubsub_topic) for peer in map(self.network.get, self.peers))
+
+    def receive(self, pubsub_topic, message, message_hash, from_peer_id=None):
+        with self._lock:
+            if message_hash in self._seen:
+                return
+            self._seen.add(message_hash)
+            if pubsub_topic in self._relay_topics:
+                self._relay_cache.setdefault(pubsub_topic, deque(maxlen=self._cache_capacity)).append(message)
+            content_topic = message["contentTopic"]
+            if content_topic in self._auto_topics:
+                self._auto_cache.setdefault(content_topic, deque(maxlen=self._cache_capacity)).append(message)
+            if self.store_enabled and not message.get("ephemeral"):
+                digest = decode_message_hash(message_hash)
+                if digest not in self._archive:
+                    self._archive[digest] = (pubsub_topic, message)
+                    insort(self._archive_keys, (int(message["timestamp"]), digest))
+                    if self._db is not None:
+                        self._db.execute(
+                            "INSERT OR IGNORE INTO messages VALUES (?, ?, ?, ?)",
+                            (digest, int(message["timestamp"]), pubsub_topic, json.dumps(message)),
+                        )
+                        self._db.commit()
+                    self._log("TRC", "message archived", msg_hash=message_hash, pubsubTopic=pubsub_topic)
+            subscribers = [
+                peer_id
+                for peer_id, topics in self._filter_subscribers.items()
+                if (pubsub_topic, content_topic) in topics or (None, content_topic) in topics
+            ]
+        self._count('waku_node_messages_total{type="relay"}')
+        if from_peer_id is not None:
+            # like nwaku, only messages coming from a peer are logged as received, not the node's own publishes
+            self._log("NTC", "received relay message", msg_hash=message_hash, from_peer_id=from_peer_id, topic=pubsub_topic)
+        for peer_id in subscribers:
+            client = self.network.get(peer_id)
+            if client is not None:
+                self._log("TRC", "pushing message to subscribed peers", pubsubTopic=pubsub_topic, msg_hash=message_hash, peer=peer_id)
+                client.filter_push(pubsub_topic, message)
+
+    def publish(self, pubsub_topic, message):
+        message = self._validate_message(message)
+        message_hash = get_message_hasher().hash(pubsub_topic, message)
+        self._log("NTC", "start publish Waku message", msg_hash=message_hash, pubsubTopic=pubsub_topic)
+        self.network.relay(self, pubsub_topic, message, message_hash)
+        return message_hash
+
+    @staticmethod
+    def _decode_base64(value, field):
+        if not isinstance(value, str) or not value:
+            raise FakeRestError(400, f"Failed to decode message: {field} must be a non empty base64 string")
+        try:
+            return base64.b64decode(value, validate=True)
+        except (binascii.Error, ValueError):
+            raise FakeRestError(400, f"Failed to decode message: invalid base64 {field}")
+
+    @staticmethod
+    def _is_int(value):
+        return isinstance(value, int) and not isinstance(value, bool)
+
+    def _validate_message(self, message):
+        """Same checks as the nwaku REST decoder and relay validator, the messages failing them are rejected with 400."""
+        if not isinstance(message, dict):
+            raise FakeRestError(400, "Failed to decode message: not a JSON object")
+        unknown = set(message) - MESSAGE_FIELDS
+        if unknown:
+            raise FakeRestError(400, f"Failed to decode message: unrecognized fields {sorted(unknown)}")
+        payload = self._decode_base64(message.get("payload"), "payload")
+        if not isinstance(message.get("contentTopic"), str) or not message["contentTopic"]:
+            raise FakeRestError(400, "Failed to decode message: contentTopic must be a non empty string")
+        message = {"version": 0, **message}
+        if "timestamp" not in message:
+            message["timestamp"] = time_ns()
+        if not self._is_int(message["timestamp"]) or not -(2**63) <= message["timestamp"] < 2**63:
+            raise FakeRestError(400, "Failed to decode message: timestamp must be an int64")
+        if not self._is_int(message["version"]) or not 0 <= message["version"] < 2**32:
+            raise FakeRestError(400, "Failed to decode message: version must be an uint32")
+        meta = self._decode_base64(message["meta"], "meta") if message.get("meta") is not None else b""
+        if len(meta) > 64:
+            raise FakeRestError(400, "Failed to decode message: invalid length for Meta field")
+        if "ephemeral" in message and not isinstance(message["ephemeral"], bool):
+            raise FakeRestError(400, "Failed to decode message: ephemeral must be a bool")
+        # the limit applies to the encoded message, not only to its payload
+        if len(payload) + len(meta) + len(message["contentTopic"]) > MAX_MESSAGE_SIZE:
+            raise FakeRestError(400, f"Failed to publish: Message size exceeded maximum of {MAX_MESSAGE_SIZE} bytes")
+        return message
+
+    def filter_push(self, pubsub_topic, message):
+        with self._lock:
+            self._filter_cache.setdefault(message["contentTopic"], deque(maxlen=self._cache_capacity)).append((pubsub_topic, message))
+
+    # ---- http
+
+    def _build_routes(self):
+        routes = [
+            ("GET", "health", self._health),
+            ("GET", "debug/v1/info", self._info),
+            ("GET", "info", self._info),
+            ("GET", "version", self._version),
+            ("GET", "debug/v1/version", self._version),
+            ("GET", "metrics", self._metrics),
+            ("GET", "admin/v1/peers", self._peers),
+            ("POST", "admin/v1/peers", self._add_peers),
+            ("GET", "admin/v1/peers/service", self._peers),
+            ("GET", "admin/v1/peers/connected", self._peers),
+            ("GET", "admin/v1/peers/connected/on/*", self._peers_on_shard),
+            ("GET", "admin/v1/peers/relay", self._relay_peers),
+            ("GET", "admin/v1/peers/relay/on/*", self._peers_on_shard),
+            ("GET", "admin/v1/peers/mesh", self._relay_peers),
+            ("GET", "admin/v1/peers/mesh/on/*", self._peers_on_shard),
+            ("GET", "admin/v1/peers/stats", self._peer_stats),
+            ("GET", "admin/v1/peer/*", self._peer),
+            ("GET", "admin/v1/filter/subscriptions", self._filter_subscriptions),
+            ("POST", "admin/v1/log-level/*", self._ok),
+            ("POST", "relay/v1/subscriptions", self._relay_subscribe),
+            ("DELETE", "relay/v1/subscriptions", self._relay_unsubscribe),
+            ("POST", "relay/v1/auto/subscriptions", self._auto_subscribe),
+            ("DELETE", "relay/v1/auto/subscriptions", self._auto_unsubscribe),
+            ("POST", "relay/v1/auto/messages", self._auto_publish),
+            ("GET", "relay/v1/auto/messages/*", self._auto_messages),
+            ("POST", "relay/v1/messages/*", self._relay_publish),
+            ("GET", "relay/v1/messages/*", self._relay_messages),
+            ("POST", "filter/v2/subscriptions", self._filter_subscribe),
+            ("PUT", "filter/v2/subscriptions", self._filter_subscribe),
+            ("DELETE", "filter/v2/subscriptions/all", self._filter_unsubscribe_all),
+            ("DELETE", "filter/v2/subscriptions", self._filter_unsubscribe),
+            ("GET", "filter/v2/subscriptions/*", self._filter_ping),
+            ("GET", "filter/v2/subscriptions", self._filter_ping),
+            ("GET", "filter/v2/messages/*/*", self._filter_messages),
+            ("GET", "filter/v2/messages/*", self._filter_messages),
+            ("POST", "lightpush/v1/message", self._lightpush),
+            ("GET", "store/v3/messages", self._store),
+        ]
+        return [(method, pattern.split("/"), handler) for method, pattern, handler in routes]
+
+    def _route(self, method, path):
+        # the topics in the path are percent-encoded, so splitting before unquoting keeps them in one segment
+        segments = path.strip("/").split("/")
+        for route_method, pattern, handler in self._routes:
+            if route_method != method or len(pattern) != len(segments):
+                continue
+            if all(expected == "*" or expected == actual for expected, actual in zip(pattern, segments)):
+                return handler, [unquote(actual) for expected, actual in zip(pattern, segments) if expected == "*"]
+        return None, []
+
+    def handle(self, method, raw_path, body):
+        """Returns (status, content type, body) of a REST request."""
+        url = urlsplit(raw_path)
+        handler, path_args = self._route(method, url.path)
+        self._count("fake_rest_requests_total")
+        if handler is None:
+            return 404, "text/plain", f"Not found: {method} {url.path}".encode()
+        if not self._running.wait(PAUSED_REQUEST_TIMEOUT):
+            return 503, "text/plain", b"Node is paused"
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            return 400, "text/plain", b"Failed to decode request body"
+        try:
+            result = handler(*path_args, data=data, query={key: values[-1] for key, values in parse_qs(url.query).items()})
+        except FakeRestError as ex:
+            return ex.status, "text/plain", str(ex.body).encode()
+        except Exception as ex:
+            logger.error(f"Fake node {self.port} failed on {method} {raw_path}: {ex}")
+            return 500, "text/plain", str(ex).encode()
+        if isinstance(result, tuple):
+            status, result = result
+        else:
+            status = 200
+        if isinstance(result, str):
+            return status, "text/plain", result.encode()
+        return status, "application/json", json.dumps(result).encode()
+
+    # ---- handlers: node
+
+    def _ok(self, *args, data=None, query=None):
+        return "OK"
+
+    def _health(self, data=None, query=None):
+        return {"nodeHealth": "READY", "connectionStatus": "Connected" if self.peers else "NotConnected", "protocolsHealth": []}
+
+    def _info(self, data=None, query=None):
+        return {
+            "listenAddresses": [self.tcp_address, f"/ip4/{self.ext_ip}/tcp/{self.start_args.get('websocket-port', self.port)}/ws/p2p/{self.peer_id}"],
+            "enrUri": self.enr_uri,
+        }
+
+    def _version(self, data=None, query=None):
+        return FAKE_VERSION
+
+    def _metrics(self, data=None, query=None):
+        with self._lock:
+            counters = dict(self._counters)
+            archived = len(self._archive)
+        series = {name: 0.0 for name in METRICS_WITH_INITIAL_VALUE_ZERO}
+        series["libp2p_peers"] = float(len(self.peers))
+        series['waku_archive_messages{type="stored"}'] = float(archived)
+        # inserts are instant here, every archived message falls in every bucket of the insert histogram
+        for name in series:
+            if name.startswith("waku_archive_insert_duration_seconds_bucket") or name == "waku_archive_insert_duration_seconds_count":
+                series[name] = float(archived)
+        lines = [f"{name} {value}" for name, value in series.items()]
+        lines.extend(f"{name} {float(value)}" for name, value in counters.items())
+        return "\n".join(lines) + "\n"
+
+    # ---- handlers: admin
+
+    def _protocols(self):
+        protocols = [PEER_PROTOCOLS["relay"]] if self.relay_enabled else []
+        if self.store_enabled:
+            protocols.append(PEER_PROTOCOLS["store"])
+        if self._flag("filter", False):
+            protocols.append(PEER_PROTOCOLS["filter"])
+        if self._flag("lightpush", False):
+            protocols.append(PEER_PROTOCOLS["lightpush"])
+        return protocols
+
+    def _peer_info(self, peer):
+        return {
+            "multiaddr": peer.tcp_address,
+            "protocols": peer._protocols(),
+            "shards": sorted(shard for shard in (shard_of(topic) for topic in peer._relay_topics) if shard is not None),
+            "connected": "Connected",
+            "agent": f"nwaku-fake {FAKE_VERSION}",
+            "origin": "Static",
+        }
+
+    def _connected(self):
+        with self.network.lock:
+            return [peer for peer in (self.network.get(peer_id) for peer_id in sorted(self.peers)) if peer is not None]
+
+    def _peers(self, data=None, query=None):
+        return [self._peer_info(peer) for peer in self._connected()]
+
+    def _add_peers(self, data=None, query=None):
+        missing = [address for address in data or [] if not self.network.connect(self, address)]
+        if missing:
+            raise FakeRestError(400, f"Failed to connect to peers: {missing}")
+        return "OK"
+
+    def _relay_peers_on(self, shard):
+        topic = f"/waku/2/rs/{self.cluster_id}/{shard}"
+        return [peer for peer in self._connected() if peer.is_relaying(topic)]
+
+    def _peers_on_shard(self, shard, data=None, query=None):
+        return {"shard": int(shard), "peers": [self._peer_info(peer) for peer in self._relay_peers_on(shard)]}
+
+    def _relay_peers(self, data=None, query=None):
+        shards = sorted({shard_of(topic) for topic in self._relay_topics} - {None})
+        return [self._peers_on_shard(shard) for shard in shards]
+
+    def _peer_stats(self, data=None, query=None):
+        peers = self._connected()
+        relay_peers = [peer for peer in peers if peer.relay_enabled]
+        return {
+            "Sum": {"Total peers": len(peers)},
+            "Relay peers": {"Total relay peers": len(relay_peers)},
+            "Connected peers": {"Total connected peers": len(peers)},
+        }
+
+    def _peer(self, peer_id, data=None, query=None):
+        peer = self.network.get(peer_id)
+        if peer is None or peer_id not in self.peers:
+            raise FakeRestError(404, f"Peer {peer_id} not found")
+        return self._peer_info(peer)
+
+    def _filter_subscriptions(self, data=None, query=None):
+        with self._lock:
+            subscribers = {peer_id: sorted(topics, key=str) for peer_id, topics in self._filter_subscribers.items()}
+        return [
+            {"peerId": peer_id, "filterCriteria": [{"pubsubTopic": pubsub, "contentTopic": content} for pubsub, content in topics]}
+            for peer_id, topics in subscribers.items()
+        ]
+
+    # ---- handlers: relay
+
+    def _require_relay(self):
+        if not self.relay_enabled:
+            raise FakeRestError(400, "Relay is not mounted")
+
+    def _relay_subscribe(self, data=None, query=None):
+        self._require_relay()
+        topics = [check_pubsub_topic(topic) for topic in data or []]
+        with self._lock:
+            self._relay_topics.update(topics)
+        return "OK"
+
+    def _relay_unsubscribe(self, data=None, query=None):
+        self._require_relay()
+        topics = [check_pubsub_topic(topic) for topic in data or []]
+        with self._lock:
+            self._relay_topics.difference_update(topics)
+        return "OK"
+
+    def _auto_subscribe(self, data=None, query=None):
+        self._require_relay()
+        topics = {autoshard(content_topic, self.cluster_id) for content_topic in data or []}
+        with self._lock:
+            self._auto_topics.update(data or [])
+            self._relay_topics.update(topics)
+        return "OK"
+
+    def _auto_unsubscribe(self, data=None, query=None):
+        self._require_relay()
+        with self._lock:
+            self._auto_topics.difference_update(data or [])
+        return "OK"
+
+    def _relay_publish(self, pubsub_topic, data=None, query=None):
+        self._require_relay()
+        if pubsub_topic not in self._relay_topics:
+            raise FakeRestError(400, f"Failed to publish: Node not subscribed to topic: {pubsub_topic}")
+        self.publish(pubsub_topic, data)
+        return "OK"
+
+    def _auto_publish(self, data=None, query=None):
+        self._require_relay()
+        if not isinstance(data, dict) or not data.get("contentTopic"):
+            raise FakeRestError(400, "Failed to decode message: contentTopic is required")
+        pubsub_topic = autoshard(data["contentTopic"], self.cluster_id)
+        if pubsub_topic not in self._relay_topics:
+            raise FakeRestError(400, f"Failed to publish: Node not subscribed to topic: {pubsub_topic}")
+        self.publish(pubsub_topic, data)
+        return "OK"
+
+    @staticmethod
+    def _drain(cache, key):
+        messages = cache.get(key)
+        if not messages:
+            return []
+        drained = list(messages)
+        messages.clear()
+        return drained
+
+    def _relay_messages(self, pubsub_topic, data=None, query=None):
+        self._require_relay()
+        if pubsub_topic not in self._relay_topics:
+            raise FakeRestError(404, f"Not subscribed to topic: {pubsub_topic}")
+        with self._lock:
+            return self._drain(self._relay_cache, pubsub_topic)
+
+    def _auto_messages(self, content_topic, data=None, query=None):
+        self._require_relay()
+        if content_topic not in self._auto_topics:
+            raise FakeRestError(404, f"Not subscribed to content topic: {content_topic}")
+        with self._lock:
+            return self._drain(self._auto_cache, content_topic)
+
+    # ---- handlers: filter (client side, the subscriptions live on the filternode)
+
+    def _filter_peer(self, request_id):
+        address = self._as_list(self.start_args.get("filternode"))
+        peer = self.network.find(address[-1]) if address else None
+        if peer is None or not peer._flag("filter", False):
+            raise FakeRestError(503, json.dumps({"requestId": request_id, "statusDesc": "No suitable peers"}))
+        return peer
+
+    def _filter_request(self, data):
+        """Decodes a subscribe / unsubscribe body as strictly as nwaku, returns (request id, {(pubsub topic, content topic)})."""
+        if not isinstance(data, dict) or set(data) - {"requestId", "contentFilters", "pubsubTopic"}:
+            raise FakeRestError(400, "Failed to decode request: unrecognized fields")
+        request_id = data.get("requestId")
+        if not isinstance(request_id, str) or not request_id:
+            raise FakeRestError(400, "Failed to decode request: requestId must be a non empty string")
+        content_topics = data.get("contentFilters")
+        if not isinstance(content_topics, list) or not content_topics:
+            raise FakeRestError(400, json.dumps({"requestId": request_id, "statusDesc": "BAD_REQUEST: contentFilters must not be empty"}))
+        if not all(isinstance(content_topic, str) and content_topic for content_topic in content_topics):
+            raise FakeRestError(400, json.dumps({"requestId": request_id, "statusDesc": "BAD_REQUEST: invalid content topic"}))
+        if len(content_topics) > FILTER_MAX_CONTENT_TOPICS:
+            status_desc = f"BAD_REQUEST: exceeds maximum content topics: {FILTER_MAX_CONTENT_TOPICS}"
+            raise FakeRestError(400, json.dumps({"requestId": request_id, "statusDesc": status_desc}))
+        pubsub_topic = data.get("pubsubTopic")
+        if pubsub_topic is not None:
+            check_pubsub_topic(pubsub_topic)
+        return request_id, {(pubsub_topic or autoshard(content_topic, self.cluster_id), content_topic) for content_topic in content_topics}
+
+    def _filter_subscribe(self, data=None, query=None):
+        request_id, topics = self._filter_request(data)
+        peer = self._filter_peer(request_id)
+        with peer._lock:
+            subscribed = peer._filter_subscribers.setdefault(self.peer_id, set())
+            if len(subscribed | topics) > FILTER_MAX_CONTENT_TOPICS:
+                status_desc = f"BAD_REQUEST: exceeds maximum content topics: {FILTER_MAX_CONTENT_TOPICS}"
+                raise FakeRestError(400, json.dumps({"requestId": request_id, "statusDesc": status_desc}))
+            subscribed.update(topics)
+        return {"requestId": request_id, "statusDesc": "OK"}
+
+    def _filter_unsubscribe(self, data=None, query=None):
+        request_id, topics = self._filter_request(data)
+        peer = self._filter_peer(request_id)
+        with peer._lock:
+            subscribed = peer._filter_subscribers.get(self.peer_id, set())
+            if not subscribed & topics:
+                return 404, {"requestId": request_id, "statusDesc": "NOT_FOUND: peer has no subscriptions"}
+            subscribed.difference_update(topics)
+            if not subscribed:
+                peer._filter_subscribers.pop(self.peer_id, None)
+        return {"requestId": request_id, "statusDesc": "OK"}
+
+    def _filter_unsubscribe_all(self, data=None, query=None):
+        if not isinstance(data, dict) or set(data) != {"requestId"} or not isinstance(data["requestId"], str) or not data["requestId"]:
+            raise FakeRestError(400, "Failed to decode request: a requestId string is the only expected field")
+        request_id = data["requestId"]
+        peer = self._filter_peer(request_id)
+        with peer._lock:
+            if peer._filter_subscribers.pop(self.peer_id, None) is None:
+                return 404, {"requestId": request_id, "statusDesc": "NOT_FOUND: peer has no subscriptions"}
+        return {"requestId": request_id, "statusDesc": "OK"}
+
+    def _filter_ping(self, request_id="", data=None, query=None):
+        if not request_id:
+            raise FakeRestError(400, "bad request id")
+        peer = self._filter_peer(request_id)
+        with peer._lock:
+            if not peer._filter_subscribers.get(self.peer_id):
+                return 404, {"requestId": request_id, "statusDesc": "NOT_FOUND: peer has no subscriptions"}
+        return {"requestId": request_id, "statusDesc": "OK"}
+
+    def _filter_messages(self, *topics, data=None, query=None):
+        pubsub_topic, content_topic = topics if len(topics) == 2 else (None, topics[0])
+        with self._lock:
+            pushed = self._drain(self._filter_cache, content_topic)
+            if pubsub_topic is not None:
+                # the messages of other pubsub topics stay cached for their own query
+                kept = [item for item in pushed if item[0] != pubsub_topic]
+                if kept:
+                    self._filter_cache[content_topic].extend(kept)
+                pushed = [item for item in pushed if item[0] == pubsub_topic]
+        return [message for _, message in pushed]
+
+    # ---- handlers: lightpush
+
+    def _lightpush(self, data=None, query=None):
+        data = data or {}
+        message = self._validate_message(data.get("message"))
+        if data.get("pubsubTopic") is not None:
+            check_pubsub_topic(data["pubsubTopic"])
+        pubsub_topic = data.get("pubsubTopic") or autoshard(message["contentTopic"], self.cluster_id)
+        address = self._as_list(self.start_args.get("lightpushnode"))
+        if not address:
+            raise FakeRestError(503, "Failed to request a message push: No suitable peers")
+        peer = self.network.find(address[-1])
+        if peer is None or not peer._flag("lightpush", False) or not peer._running.is_set():
+            raise FakeRestError(503, "Failed to request a message push: dial_failure")
+        if not peer.is_relaying(pubsub_topic) or not peer.relays_to_others(pubsub_topic):
+            raise FakeRestError(503, "Failed to request a message push: not_published_to_any_peer")
+        message_hash = peer.publish(pubsub_topic, message)
+        peer._log("NTC", "handling lightpush request", peer_id=self.peer_id, msg_hash=message_hash)
+        return "OK"
+
+    # ---- handlers: store v3
+
+    def _store(self, data=None, query=None):
+        query = query or {}
+        if query.get("peerAddr"):
+            if not re.match(r"^/(ip4|ip6|dns4|dns6|dns)/[^/]+/", query["peerAddr"]):
+                raise FakeRestError(400, f"Invalid MultiAddress: {query['peerAddr']}")
+            if not re.match(r"^/[^/]+/[^/]+/tcp/\d+/p2p/\w+$", query["peerAddr"]):
+                raise FakeRestError(400, f"Failed parsing remote peer info: Unsupported protocol {query['peerAddr']}")
+            target = self.network.find(query["peerAddr"])
+            if target is None or not target.store_enabled:
+                raise FakeRestError(400, f"Failed parsing remote peer info: {query['peerAddr']}")
+        elif self.store_enabled:
+            target = self
+        elif self._as_list(self.start_args.get("storenode")):
+            target = self.network.find(self._as_list(self.start_args.get("storenode"))[-1])
+            if target is None or not target.store_enabled:
+                raise FakeRestError(503, "PEER_DIAL_FAILURE: failed to negotiate protocol: protocols not supported")
+        else:
+            raise FakeRestError(412, "No peer address and no local store")
+        return target.store_query(query)
+
+    def store_query(self, query):
+        request_id = secrets.token_hex(8)
+        pubsub_topic = query.get("pubsubTopic")
+        content_topics = [topic for topic in (query.get("contentTopics") or "").split(",") if topic]
+        try:
+            page_size = int(query.get("pageSize") or STORE_DEFAULT_PAGE_SIZE)
+            # like nwaku, zero or negative times mean the bound is not set
+            start_time = int(query["startTime"]) if query.get("startTime") else None
+            end_time = int(query["endTime"]) if query.get("endTime") else None
+            start_time = start_time if start_time and start_time > 0 else None
+            end_time = end_time if end_time and end_time > 0 else None
+        except ValueError as ex:
+            raise FakeRestError(400, f"BAD_REQUEST: {ex}")
+        page_size = STORE_DEFAULT_PAGE_SIZE if page_size <= 0 else min(page_size, STORE_MAX_PAGE_SIZE)
+        ascending = query.get("ascending", "true").lower() != "false"
+        include_data = query.get("includeData", "false").lower() == "true"
+        hashes = [parse_message_hash(item) for item in (query.get("hashes") or "").split(",") if item]
+        cursor = parse_message_hash(query["cursor"]) if query.get("cursor") else None
+
+        with self._lock:
+            if cursor is not None and cursor not in self._archive:
+                raise FakeRestError(500, "Error while querying store: cursor not found")
+            low = 0 if start_time is None else bisect_left(self._archive_keys, (start_time, b""))
+            high = len(self._archive_keys) if end_time is None else bisect_right(self._archive_keys, (end_time, b"\xff" * 33))
+            if cursor is not None:
+                position = bisect_left(self._archive_keys, (int(self._archive[cursor][1]["timestamp"]), cursor))
+                low, high = (max(low, position + 1), high) if ascending else (low, min(high, position))
+            wanted = set(hashes)
+
+            def matches(digest):
+                topic, message = self._archive[digest]
+                if wanted:
+                    return digest in wanted
+                return (pubsub_topic is None or topic == pubsub_topic) and (not content_topics or message["contentTopic"] in content_topics)
+
+            positions = range(low, high) if ascending else range(high - 1, low - 1, -1)
+            page, more = [], False
+            for position in positions:
+                digest = self._archive_keys[position][1]
+                if not matches(digest):
+                    continue
+                if len(page) == page_size:
+                    more = True
+                    break
+                page.append(digest)
+            if not ascending:
+                page.reverse()
+            messages = []
+            for digest in page:
+                topic, message = self._archive[digest]
+                entry = {"messageHash": "0x" + digest.hex(), "pubsubTopic": topic}
+                if include_data:
+                    entry["message"] = message
+                messages.append(entry)
+        response = {"requestId": request_id, "statusCode": 200, "statusDesc": "OK", "messages": messages}
+        if more:
+            response["paginationCursor"] = "0x" + (page[-1] if ascending else page[0]).hex()
+        return response
@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from filelock import FileLock
+from src.env_vars import ADDITIONAL_NODES, IMAGE_DIGEST_CACHE, IMAGE_PULL_WORKERS, NODE_1, NODE_2
+from src.libs.custom_logger import get_custom_logger
+from src.node.container_backend import get_container_backend
+
+logger = get_custom_logger(__name__)
+
+
+def configured_images():
+    images = [NODE_1, NODE_2] + [image for image in ADDITIONAL_NODES.split(",") if image]
+    return list(dict.fromkeys(image.strip() for image in images))
+
+
+class ImageCache:
+    """
+    Makes sure the node images are present before the first test starts a node, so no test pays for a pull.
+    Missing images are pulled in parallel, under a per image file lock so concurrent xdist workers pull each
+    image only once. The digests go to a JSON file shared by the runs on the host, which also tells when a
+    floating tag like `latest` moved since the last run.
+    """
+
+    def __init__(self, backend=None, cache_path=IMAGE_DIGEST_CACHE, workers=IMAGE_PULL_WORKERS):
+        self._backend = backend or get_container_backend()
+        self._cache_path = cache_path
+        self._workers = workers
+        self._digests = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+
+    @property
+    def digests(self):
+        with self._lock:
+            return dict(self._digests)
+
+    def digest(self, image):
+        with self._lock:
+            if image in self._digests:
+                return self._digests[image]
+        return self._resolve(image)[0]
+
+    def _lock_path(self, image):
+        return f"{self._cache_path}.{image.replace('/', '_').replace(':', '_')}.lock"
+
+    def _resolve(self, image):
+        """Returns (digest, seconds spent pulling)."""
+        pull_time = 0.0
+        with FileLock(self._lock_path(image)):
+            digest = self._backend.image_digest(image)
+            if digest is None:
+                logger.info(f"Pulling image {image}")
+                started_at = time()
+                self._backend.pull(image)
+                pull_time = round(time() - started_at, 3)
+                digest = self._backend.image_digest(image)
+                logger.info(f"Pulled image {image} ({digest}) in {pull_time}s")
+        with self._lock:
+            self._digests[image] = digest
+        return digest, pull_time
+
+    def prepare(self, images=None):
+        """Resolves and, when missing, pulls all images; returns {image: digest}."""
+        images = list(images or configured_images())
+        started_at = time()
+        with ThreadPoolExecutor(max_workers=max(1, min(self._workers, len(images))), thread_name_prefix="image_pull") as executor:
+            results = dict(zip(images, executor.map(self._resolve, images)))
+        pulled = {image: pull_time for image, (_, pull_time) in results.items() if pull_time}
+        logger.info(f"Resolved {len(images)} images in {round(time() - started_at, 3)}s, pulled {pulled or 'none'}")
+        self._record({image: digest for image, (digest, _) in results.items()})
+        return self.digests
+
+    def _record(self, digests):
+        with FileLock(self._cache_path + ".lock"):
+            try:
+                with open(self._cache_path, "r") as cache_file:
+                    cache = json.load(cache_file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                cache = {}
+            for image, digest in digests.items():
+                previous = cache.get(image, {}).get("digest")
+                if previous and previous != digest:
+                    logger.info(f"Image {image} changed since the last run: {previous} -> {digest}")
+                cache[image] = {"digest": digest, "resolved_at": int(time())}
+            with open(self._cache_path, "w") as cache_file:
+                json.dump(cache, cache_file, indent=2, sort_keys=True)
+
+
+_image_cache = None
+_image_cache_lock = threading.Lock()
+
+
+def get_image_cache():
+    global _image_cache
+    with _image_cache_lock:
+        if _image_cache is None:
+            _image_cache = ImageCache()
+        return _image_cache
@@ -0,0 +1,413 @@
+import gzip
+import itertools
+import os
+import selectors
+import shutil
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from src.env_vars import LOG_COMPRESSION, LOG_FLUSH_INTERVAL, LOG_ROTATE_BYTES, LOG_ROTATE_KEEP
+from src.libs.custom_logger import get_custom_logger
+
+logger = get_custom_logger(__name__)
+
+# how long a stream that ended is watched for the container coming back (restart) before its file is closed
+REATTACH_WINDOW = 10
+
+
+class _StreamDecoder:
+    """Decodes the HTTP response of GET /containers/{id}/logs: status line and headers, chunked body, docker frames."""
+
+    def __init__(self, multiplexed):
+        self._buffer = bytearray()
+        self._multiplexed = multiplexed
+        self._frames = bytearray()
+        self._headers_done = False
+        self._chunked = False
+        self._chunk_left = 0
+        self.finished = False
+        self.error = None
+
+    def feed(self, data):
+        """Returns the log payload contained in the data."""
+        self._buffer += data
+        if not self._headers_done:
+            end = self._buffer.find(b"\r\n\r\n")
+            if end == -1:
+                return b""
+            headers = bytes(self._buffer[:end]).decode("latin-1").split("\r\n")
+            del self._buffer[: end + 4]
+            self._headers_done = True
+            if headers[0].split(" ")[1] != "200":
+                self.error = headers[0]
+                self.finished = True
+                return b""
+            self._chunked = any(line.lower().replace(" ", "") == "transfer-encoding:chunked" for line in headers[1:])
+        body = self._dechunk() if self._chunked else self._take_all()
+        return self._deframe(body) if self._multiplexed else body
+
+    def _take_all(self):
+        body = bytes(self._buffer)
+        self._buffer.clear()
+        return body
+
+    def _dechunk(self):
+        body = bytearray()
+        while self._buffer and not self.finished:
+            if self._chunk_left == 0:
+                line_end = self._buffer.find(b"\r\n")
+                if line_end == -1:
+                    break
+                size_line = bytes(self._buffer[:line_end]).split(b";")[0].strip()
+                if not size_line:
+                    # CRLF closing the previous chunk
+                    del self._buffer[:2]
+                    continue
+                self._chunk_left = int(size_line, 16)
+                del self._buffer[: line_end + 2]
+                if self._chunk_left == 0:
+                    self.finished = True
+                    break
+            taken = self._buffer[: self._chunk_left]
+            body += taken
+            del self._buffer[: len(taken)]
+            self._chunk_left -= len(taken)
+        return bytes(body)
+
+    def _deframe(self, body):
+        # non tty containers prefix every write with [stream, 0, 0, 0, size (4 bytes big endian)]
+        self._frames += body
+        payload = bytearray()
+        while len(self._frames) >= 8:
+            size = int.from_bytes(self._frames[4:8], byteorder="big")
+            if len(self._frames) < 8 + size:
+                break
+            payload += self._frames[8 : 8 + size]
+            del self._frames[: 8 + size]
+        return bytes(payload)
+
+
+class _LogStream:
+    def __init__(self, container, log_path, listeners):
+        self.container = container
+        self.log_path = log_path
+        self.listeners = list(listeners)
+        self.lock = threading.Lock()
+        self.file = None
+        self.unflushed_since = None
+        self.socket = None
+        self.decoder = None
+        self.ended_at = None
+        self.last_data_at = None
+        # set while a worker asks docker what became of the container
+        self.checking = False
+
+
+class LogCollector:
+    """
+    Writes the output of all node containers to their log files from a single selector thread. Each container's
+    log stream is read straight from the docker unix socket; when docker is reached another way every container
+    gets a reader thread instead. Files are written through a buffer (flushed every LOG_FLUSH_INTERVAL seconds
+    or on flush()) and rotated at LOG_ROTATE_BYTES, optionally gzip compressed.
+    Other components can subscribe to the live output instead of rereading the files.
+    """
+
+    def __init__(self, docker_client):
+        self._client = docker_client
+        adapter = getattr(docker_client.api, "_custom_adapter", None)
+        self._socket_path = getattr(adapter, "socket_path", None)
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_read, self._wakeup_write = socket.socketpair()
+        self._wakeup_read.setblocking(False)
+        self._selector.register(self._wakeup_read, selectors.EVENT_READ)
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._streams = {}
+        self._streams_lock = threading.Lock()
+        # docker API calls about ended streams block, they must not hold up the selector thread
+        self._checker = ThreadPoolExecutor(max_workers=2, thread_name_prefix="log-collector-check")
+        self._thread = threading.Thread(target=self._run, name="log-collector", daemon=True)
+        self._thread.start()
+
+    # ---- pub/sub
+
+    def subscribe(self, callback, log_path=None):
+        return subscribe_logs(callback, log_path)
+
+    def unsubscribe(self, token):
+        unsubscribe_logs(token)
+
+    def _publish(self, stream, chunk):
+        for listener in stream.listeners:
+            self._call(listener, chunk)
+        publish_log(stream.log_path, chunk)
+
+    @staticmethod
+    def _call(callback, *args):
+        _call(callback, *args)
+
+    # ---- streams
+
+    def attach(self, container, log_path, listeners=()):
+        """Starts collecting the container output into log_path; `listeners` get every chunk, from the first one."""
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        stream = _LogStream(container, log_path, listeners)
+        stream.file = open(log_path, "wb")
+        with self._streams_lock:
+            previous = self._streams.get(log_path)
+            self._streams[log_path] = stream
+        if previous is not None:
+            with previous.lock:
+                if previous.file is not None:
+                    previous.file.close()
+                    previous.file = None
+            self._enqueue("close", previous)
+        if self._socket_path:
+            self._request(stream)
+        else:
+            threading.Thread(target=self._read_with_thread, args=(stream,), daemon=True).start()
+        return stream
+
+    def _logs_path(self, container, since=None):
+        url = urlparse(self._client.api._url("/containers/{0}/logs", container.id))
+        query = "follow=1&stdout=1&stderr=1" + (f"&since={since:.6f}" if since else "")
+        return f"{url.path}?{query}"
+
+    def _request(self, stream, since=None):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self._socket_path)
+        sock.sendall(f"GET {self._logs_path(stream.container, since)} HTTP/1.1\r\nHost: docker\r\nConnection: close\r\n\r\n".encode())
+        sock.setblocking(False)
+        tty = stream.container.attrs.get("Config", {}).get("Tty", False)
+        stream.socket, stream.decoder, stream.ended_at = sock, _StreamDecoder(multiplexed=not tty), None
+        self._enqueue("register", stream)
+
+    def _enqueue(self, action, stream):
+        # the selector is only touched from the collector thread
+        with self._pending_lock:
+            self._pending.append((action, stream))
+        self._wakeup_write.send(b"\0")
+
+    def _read_with_thread(self, stream):
+        try:
+            for chunk in stream.container.logs(stream=True, follow=True):
+                self._write(stream, chunk)
+        except Exception as ex:
+            logger.debug(f"Log stream of container {stream.container.short_id} ended: {ex}")
+        self._close(stream)
+
+    def _write(self, stream, chunk):
+        if not chunk:
+            return
+        with stream.lock:
+            if stream.file is None:
+                return
+            stream.file.write(chunk)
+            stream.last_data_at = time.time()
+            if stream.unflushed_since is None:
+                stream.unflushed_since = stream.last_data_at
+            if LOG_ROTATE_BYTES and stream.file.tell() >= LOG_ROTATE_BYTES:
+                self._rotate(stream)
+        self._publish(stream, chunk)
+
+    def _rotate(self, stream):
+        stream.file.close()
+        suffix = ".gz" if LOG_COMPRESSION == "gzip" else ""
+        for index in range(LOG_ROTATE_KEEP - 1, 0, -1):
+            older = f"{stream.log_path}.{index}{suffix}"
+            if os.path.exists(older):
+                os.replace(older, f"{stream.log_path}.{index + 1}{suffix}")
+        rotated = f"{stream.log_path}.1"
+        os.replace(stream.log_path, rotated)
+        if LOG_COMPRESSION == "gzip":
+            threading.Thread(target=self._compress, args=(rotated,), daemon=True).start()
+        stream.file = open(stream.log_path, "wb")
+        stream.unflushed_since = None
+        logger.debug(f"Rotated log file {stream.log_path}")
+
+    @staticmethod
+    def _compress(path):
+        with open(path, "rb") as source, gzip.open(f"{path}.gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(path)
+
+    def switch(self, log_path, new_log_path):
+        """Ends the log file that is being collected at log_path, the output from now on goes to a fresh file at new_log_path."""
+        with self._streams_lock:
+            stream = self._streams.pop(log_path, None)
+            if stream is not None:
+                self._streams[new_log_path] = stream
+        os.makedirs(os.path.dirname(new_log_path), exist_ok=True)
+        if stream is None:
+            # the stream already ended, the new lease still gets its (empty) file
+            open(new_log_path, "ab").close()
+            return
+        with stream.lock:
+            if stream.file is not None:
+                stream.file.close()
+            stream.file = open(new_log_path, "wb")
+            stream.unflushed_since = None
+            stream.log_path = new_log_path
+
+    def flush(self, log_path=None):
+        with self._streams_lock:
+            streams = [stream for path, stream in self._streams.items() if log_path is None or path == log_path]
+        for stream in streams:
+            with stream.lock:
+                if stream.file is not None and stream.unflushed_since is not None:
+                    stream.file.flush()
+                    stream.unflushed_since = None
+
+    def _close(self, stream):
+        # called from the collector thread, or from the reader thread of a stream that has no socket
+        with stream.lock:
+            if stream.file is not None:
+                stream.file.close()
+                stream.file = None
+        if stream.socket is not None:
+            try:
+                self._selector.unregister(stream.socket)
+            except (KeyError, ValueError):
+                pass
+            stream.socket.close()
+            stream.socket = None
+        with self._streams_lock:
+            if self._streams.get(stream.log_path) is stream:
+                del self._streams[stream.log_path]
+
+    # ---- selector loop
+
+    def _run(self):
+        while True:
+            for key, _ in self._selector.select(timeout=min(LOG_FLUSH_INTERVAL, 1)):
+                if key.fileobj is self._wakeup_read:
+                    self._drain_wakeup()
+                else:
+                    self._on_readable(key.data)
+            self._flush_due()
+            self._check_ended()
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_read.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        for action, stream in pending:
+            if action == "close":
+                self._close(stream)
+            elif stream.socket is not None:
+                self._selector.register(stream.socket, selectors.EVENT_READ, data=stream)
+
+    def _on_readable(self, stream):
+        try:
+            data = stream.socket.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if data:
+            self._write(stream, stream.decoder.feed(data))
+        if not data or stream.decoder.finished:
+            if stream.decoder.error:
+                logger.error(f"Docker refused the log stream of container {stream.container.short_id}: {stream.decoder.error}")
+            self._selector.unregister(stream.socket)
+            stream.socket.close()
+            stream.socket = None
+            stream.ended_at = time.time()
+
+    def _flush_due(self):
+        now = time.time()
+        with self._streams_lock:
+            streams = list(self._streams.values())
+        for stream in streams:
+            with stream.lock:
+                if stream.file is not None and stream.unflushed_since is not None and now - stream.unflushed_since >= LOG_FLUSH_INTERVAL:
+                    stream.file.flush()
+                    stream.unflushed_since = None
+
+    def _check_ended(self):
+        # a stream ends when the container stops; a restarted container is followed again from where it ended
+        now = time.time()
+        with self._streams_lock:
+            ended = [stream for stream in self._streams.values() if stream.ended_at is not None and stream.socket is None and not stream.checking]
+        for stream in ended:
+            if now - stream.ended_at < 1:
+                continue
+            stream.checking = True
+            self._checker.submit(self._recheck, stream)
+
+    def _recheck(self, stream):
+        # runs on a checker thread, the selector is only touched through _enqueue
+        try:
+            try:
+                stream.container.reload()
+                status = stream.container.status
+            except Exception:
+                # removed (nodes run with auto remove) or docker unreachable
+                status = "removed"
+            if status == "running":
+                logger.debug(f"Container {stream.container.short_id} is running again, following its logs")
+                self._request(stream, since=stream.last_data_at or stream.ended_at)
+            elif time.time() - stream.ended_at > REATTACH_WINDOW or status in ["removing", "removed", "dead"]:
+                logger.info(f"Container {stream.container.short_id} has stopped. Exiting log stream.")
+                self._enqueue("close", stream)
+        except Exception as ex:
+            logger.error(f"Checking the ended log stream of container {stream.container.short_id} failed: {ex}")
+        finally:
+            stream.checking = False
+
+
+_collector = None
+_collector_lock = threading.Lock()
+# kept outside the collector so components can subscribe before the first container (and the collector) starts
+_subscribers = {}
+_subscribers_lock = threading.Lock()
+_tokens = itertools.count(1)
+
+
+def subscribe_logs(callback, log_path=None):
+    """callback(log_path, chunk) is called from the collector for the output of one log file or of all of them."""
+    with _subscribers_lock:
+        token = next(_tokens)
+        _subscribers[token] = (log_path, callback)
+        return token
+
+
+def unsubscribe_logs(token):
+    with _subscribers_lock:
+        _subscribers.pop(token, None)
+
+
+def _call(callback, *args):
+    try:
+        callback(*args)
+    except Exception as ex:
+        logger.error(f"Log subscriber {callback} failed: {ex}")
+
+
+def publish_log(log_path, chunk):
+    """Hands output written to a log file to the subscribers, also for logs not collected from a container."""
+    with _subscribers_lock:
+        subscribers = list(_subscribers.values())
+    for subscribed_path, callback in subscribers:
+        if subscribed_path is None or subscribed_path == log_path:
+            _call(callback, log_path, chunk)
+
+
+def get_log_collector(docker_client):
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            _collector = LogCollector(docker_client)
+        return _collector
+
+
+def flush_logs(log_path=None):
+    """Writes out the buffered output of a log file (or of all), a no-op when nothing is collected."""
+    if _collector is not None:
+        _collector.flush(log_path)
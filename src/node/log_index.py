@@ -0,0 +1,132 @@
+import os
+import re
+import threading
+from src.libs.custom_logger import get_custom_logger
+from src.node.log_collector import flush_logs
+
+logger = get_custom_logger(__name__)
+
+
+class LogIndex:
+    """
+    Incremental keyword search over one node log file. The index remembers up to which byte it has scanned and
+    the matching lines of every keyword it was asked for, so repeated searches (e.g. from retry loops) only read
+    what was appended since. All keywords are first matched in one pass with a single combined regex, each keyword
+    is then only tested on the few lines that passed.
+    """
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._inode = None
+        # (keyword, use_regex) -> compiled case insensitive pattern and the lines it matched so far
+        self._patterns = {}
+        self._matches = {}
+
+    @staticmethod
+    def _pattern(keyword, use_regex):
+        return re.compile(keyword if use_regex else re.escape(keyword), re.IGNORECASE | re.MULTILINE)
+
+    def _read(self, start, end=None, partial=False):
+        with open(self.log_path, "rb") as log_file:
+            log_file.seek(start)
+            data = log_file.read() if end is None else log_file.read(end - start)
+        # only complete lines are scanned, a partial last line is picked up by the next search
+        complete = data.rfind(b"\n") + 1 if end is None and not partial else len(data)
+        return data[:complete].decode("utf-8", errors="replace"), start + complete
+
+    @staticmethod
+    def _combine(patterns, flags=0):
+        # the pattern also consumes the rest of the line, so every line with at least one match shows up once
+        return re.compile(r"(?:" + "|".join(f"(?:{pattern})" for pattern in patterns) + r")[^\n]*", flags | re.MULTILINE)
+
+    def _scan(self, text, keys, matches=None):
+        matches = self._matches if matches is None else matches
+        if not text or not keys:
+            return
+        literal_keys = [key for key in keys if not key[1]]
+        regex_keys = [key for key in keys if key[1]]
+        lowered = text.lower()
+        if literal_keys and len(lowered) == len(text):
+            # plain keywords: lower-case the chunk once and match them case sensitively, much faster than IGNORECASE
+            combined = self._combine([re.escape(keyword.lower()) for keyword, _ in literal_keys])
+            self._collect(text, combined.finditer(lowered), literal_keys, matches)
+        else:
+            regex_keys += literal_keys
+        if regex_keys:
+            combined = self._combine([self._patterns[key].pattern for key in regex_keys], re.IGNORECASE)
+            self._collect(text, combined.finditer(text), regex_keys, matches)
+
+    def _collect(self, text, line_matches, keys, matches):
+        for match in line_matches:
+            line_start = text.rfind("\n", 0, match.start()) + 1
+            line = text[line_start : match.end()]
+            for key in keys:
+                if self._patterns[key].search(line):
+                    matches[key].append(line.strip())
+
+    def _check_rotation(self):
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            return False
+        if self._inode is not None and stat.st_ino != self._inode:
+            # rotated: the lines matched so far did happen, only the new file is read from now on
+            logger.debug(f"Log file {self.log_path} was rotated, scanning the new file from the start")
+            self._offset = 0
+        elif stat.st_size < self._offset:
+            # truncated (e.g. the container was started again): the old content and its matches are gone
+            logger.debug(f"Log file {self.log_path} was truncated, scanning it again from the start")
+            self._offset = 0
+            self._matches = {key: [] for key in self._matches}
+        self._inode = stat.st_ino
+        return True
+
+    def search(self, keywords, use_regex=False, include_partial=False):
+        """
+        Returns {keyword: matching lines} for the whole log, reading only the bytes not scanned before. With
+        include_partial a last line without newline (e.g. the final words of a node that stopped) is matched too,
+        without being remembered, it is scanned for good once complete.
+        """
+        # buffered output of the log collector has to be on disk before scanning
+        flush_logs(self.log_path)
+        with self._lock:
+            if not self._check_rotation():
+                raise FileNotFoundError(f"Log file {self.log_path} does not exist")
+            new_keys = []
+            for keyword in keywords:
+                key = (keyword, use_regex)
+                if key not in self._patterns:
+                    self._patterns[key] = self._pattern(keyword, use_regex)
+                    self._matches[key] = []
+                    new_keys.append(key)
+            if new_keys and self._offset:
+                # keywords seen for the first time are caught up on the part that was already scanned
+                text, _ = self._read(0, self._offset)
+                self._scan(text, new_keys)
+            text, self._offset = self._read(self._offset)
+            self._scan(text, list(self._patterns))
+            tail_matches = {(keyword, use_regex): [] for keyword in keywords}
+            if include_partial:
+                tail, _ = self._read(self._offset, partial=True)
+                self._scan(tail, list(tail_matches), tail_matches)
+            return {keyword: self._matches[(keyword, use_regex)] + tail_matches[(keyword, use_regex)] for keyword in keywords}
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_log_index(log_path):
+    with _indexes_lock:
+        index = _indexes.get(log_path)
+        if index is None:
+            index = _indexes[log_path] = LogIndex(log_path)
+        return index
+
+
+def drop_log_index(log_path):
+    """Forgets the index of a log nothing is written to anymore, a later search starts over from the file."""
+    with _indexes_lock:
+        _indexes.pop(log_path, None)
@@ -0,0 +1,114 @@
+import os
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from time import time
+from src.libs.custom_logger import get_custom_logger
+from src.node.log_collector import subscribe_logs, unsubscribe_logs
+from src.test_data import LOG_TIMESTAMP_PATTERN, MESSAGE_HASH_LOG_PATTERN, MESSAGE_LIFECYCLE_EVENTS
+
+logger = get_custom_logger(__name__)
+
+
+@dataclass(frozen=True)
+class LifecycleEvent:
+    node: str
+    event: str
+    timestamp: float
+    line: str
+
+
+class MessageTimeline:
+    """
+    Streaming parser of the node logs that keeps, per message hash, the lifecycle events (published, received,
+    relayed, archived, ...) seen on every node, with the timestamps the nodes logged them at. Lines are fed live by
+    the log collector; only lines carrying a message hash go through the event regexes, so it is cheap enough to
+    run for every test.
+    """
+
+    def __init__(self, events=MESSAGE_LIFECYCLE_EVENTS, hash_pattern=MESSAGE_HASH_LOG_PATTERN, timestamp_pattern=LOG_TIMESTAMP_PATTERN):
+        self._events = re.compile("|".join(f"(?P<{name}>{pattern})" for name, pattern in events.items()), re.IGNORECASE)
+        self._hash = re.compile(hash_pattern)
+        self._timestamp = re.compile(timestamp_pattern)
+        self._partial_lines = {}
+        self._timelines = {}
+        self._lock = threading.Lock()
+        self._token = None
+
+    def start(self):
+        self._token = subscribe_logs(self.feed)
+        return self
+
+    def stop(self):
+        if self._token is not None:
+            unsubscribe_logs(self._token)
+            self._token = None
+
+    def feed(self, log_path, chunk):
+        node = os.path.splitext(os.path.basename(log_path))[0]
+        lines = (self._partial_lines.get(log_path, b"") + chunk).split(b"\n")
+        self._partial_lines[log_path] = lines.pop()
+        for line in lines:
+            # cheap byte level prefilter, most lines don't carry a message hash
+            if b"msg_hash=" in line:
+                self.feed_line(node, line.decode("utf-8", errors="replace"))
+
+    def feed_line(self, node, line):
+        hash_match = self._hash.search(line)
+        if hash_match is None:
+            return
+        event_match = self._events.search(line)
+        if event_match is None:
+            return
+        event = LifecycleEvent(node=node, event=event_match.lastgroup, timestamp=self._parse_timestamp(line), line=line.strip())
+        with self._lock:
+            self._timelines.setdefault(hash_match.group(1).lower(), []).append(event)
+
+    def _parse_timestamp(self, line):
+        match = self._timestamp.search(line)
+        if match is None:
+            return time()
+        try:
+            return datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S.%f%z").timestamp()
+        except ValueError:
+            return time()
+
+    def __len__(self):
+        return len(self._timelines)
+
+    def message_hashes(self):
+        with self._lock:
+            return list(self._timelines)
+
+    def events(self, message_hash, event=None, node=None):
+        """Events of a message ordered by time, optionally only one kind of event or one node."""
+        with self._lock:
+            events = list(self._timelines.get(message_hash.lower(), []))
+        return sorted(
+            (item for item in events if (event is None or item.event == event) and (node is None or item.node == node)),
+            key=lambda item: item.timestamp,
+        )
+
+    def first_seen(self, message_hash, event=None):
+        """{node: timestamp of its first event} for a message."""
+        first = {}
+        for item in self.events(message_hash, event=event):
+            first.setdefault(item.node, item.timestamp)
+        return first
+
+    def propagation(self, message_hash, event=None):
+        """{node: seconds after the first node saw the message}, in the order the nodes saw it."""
+        first = self.first_seen(message_hash, event=event)
+        if not first:
+            return {}
+        origin = min(first.values())
+        return {node: round(timestamp - origin, 6) for node, timestamp in sorted(first.items(), key=lambda item: item[1])}
+
+    def hop_latencies(self, message_hash, event=None):
+        """[(from node, to node, seconds)] between consecutive nodes in the order they saw the message."""
+        first = sorted(self.first_seen(message_hash, event=event).items(), key=lambda item: item[1])
+        return [(previous[0], current[0], round(current[1] - previous[1], 6)) for previous, current in zip(first, first[1:])]
+
+    def summary(self, message_hash):
+        return {node: [(item.event, item.timestamp) for item in self.events(message_hash, node=node)] for node in self.first_seen(message_hash)}
@@ -0,0 +1,130 @@
+import csv
+import math
+import os
+import re
+import threading
+from array import array
+from time import time
+from src.data_storage import DS
+from src.libs.custom_logger import get_custom_logger
+from src.libs.metrics_snapshot import MetricsSnapshot, format_series, parse_series
+
+logger = get_custom_logger(__name__)
+
+
+def node_label(node):
+    return os.path.splitext(os.path.basename(node._log_path))[0]
+
+
+class MetricsSampler:
+    """
+    Background thread that scrapes every node in DS.waku_nodes each `interval` seconds and keeps one pair of
+    columns (timestamps, values) per node and series, as double arrays. Nodes joining mid test are picked up on the
+    next round; scrapes of stopped or paused nodes are skipped.
+    """
+
+    def __init__(self, interval, series_filter=None, nodes=None):
+        self.interval = interval
+        self._series_filter = re.compile(series_filter) if series_filter else None
+        self._nodes = nodes
+        self._columns = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.rounds = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+        self._thread.start()
+        logger.debug(f"Metrics sampler started with a {self.interval}s interval")
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 30)
+        logger.debug(f"Metrics sampler stopped after {self.rounds} rounds, {len(self._columns)} series recorded")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            started_at = time()
+            self.sample_once()
+            self._stop_event.wait(max(0, self.interval - (time() - started_at)))
+
+    def sample_once(self):
+        for node in list(self._nodes if self._nodes is not None else DS.waku_nodes):
+            # a paused container accepts the connection but never answers, scraping it would stall the round
+            if node._container is None or node.is_paused:
+                continue
+            try:
+                snapshot = MetricsSnapshot.from_node(node)
+            except Exception as ex:
+                logger.debug(f"Skipping metrics sample of {node_label(node)}: {ex}")
+                continue
+            self.record(node_label(node), snapshot)
+        self.rounds += 1
+
+    def record(self, node_name, snapshot):
+        with self._lock:
+            for (name, labels), value in snapshot.finite_items():
+                if self._series_filter and not self._series_filter.search(name):
+                    continue
+                timestamps, values = self._columns.setdefault((node_name, name, labels), (array("d"), array("d")))
+                timestamps.append(snapshot.taken_at)
+                values.append(value)
+
+    def _node_name(self, node):
+        return node if isinstance(node, str) else node_label(node)
+
+    def series(self, node, selector):
+        """(timestamps, values) of a series; a selector without labels sums all series of the metric per round."""
+        name, labels = parse_series(selector)
+        node_name = self._node_name(node)
+        with self._lock:
+            exact = self._columns.get((node_name, name, labels))
+            if exact is not None:
+                return list(exact[0]), list(exact[1])
+            totals = {}
+            for (column_node, column_name, column_labels), (timestamps, values) in self._columns.items():
+                if column_node == node_name and column_name == name and set(labels) <= set(column_labels):
+                    for timestamp, value in zip(timestamps, values):
+                        totals[timestamp] = totals.get(timestamp, 0.0) + value
+        timestamps = sorted(totals)
+        return timestamps, [totals[timestamp] for timestamp in timestamps]
+
+    def growth(self, node, selector):
+        """Last minus first sampled value."""
+        _, values = self.series(node, selector)
+        if len(values) < 2:
+            raise ValueError(f"Not enough samples of {selector} for {self._node_name(node)}")
+        return values[-1] - values[0]
+
+    def rate(self, node, selector):
+        """Average per second increase of a counter over the whole run."""
+        timestamps, values = self.series(node, selector)
+        if len(values) < 2 or timestamps[-1] == timestamps[0]:
+            raise ValueError(f"Not enough samples of {selector} for {self._node_name(node)}")
+        return (values[-1] - values[0]) / (timestamps[-1] - timestamps[0])
+
+    def slope(self, node, selector):
+        """Least squares slope (units per second) of a gauge, e.g. memory growth over the run."""
+        timestamps, values = self.series(node, selector)
+        if len(values) < 2:
+            raise ValueError(f"Not enough samples of {selector} for {self._node_name(node)}")
+        mean_t = sum(timestamps) / len(timestamps)
+        mean_v = sum(values) / len(values)
+        variance = sum((t - mean_t) ** 2 for t in timestamps)
+        if math.isclose(variance, 0):
+            return 0.0
+        return sum((t - mean_t) * (v - mean_v) for t, v in zip(timestamps, values)) / variance
+
+    def write_csv(self, path):
+        """Long format, one row per sample: node, series, timestamp, value."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock, open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["node", "series", "timestamp", "value"])
+            for (node_name, name, labels), (timestamps, values) in sorted(self._columns.items()):
+                series_name = format_series(name, labels)
+                writer.writerows((node_name, series_name, f"{timestamp:.3f}", repr(value)) for timestamp, value in zip(timestamps, values))
+        return path
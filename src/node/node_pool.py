@@ -0,0 +1,192 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from src.libs.custom_logger import get_custom_logger
+from src.node.container_registry import get_container_registry
+from src.node.waku_node import WakuNode
+
+logger = get_custom_logger(__name__)
+
+# Nodes started with these flags point to other (short lived) nodes or carry per test state, they are never shared
+POOL_UNSHAREABLE_FLAGS = {
+    "discv5-bootstrap-node",
+    "storenode",
+    "filternode",
+    "lightpushnode",
+    "peer-exchange-node",
+    "staticnode",
+    "peer-persistence",
+    "rln-creds-id",
+    "rln-creds-source",
+    "rln-keystore-prefix",
+    "remove-container",
+    "store-message-db-url",
+    "volumes",
+}
+# Nodes with these flags enabled keep state that can't be wiped through REST, they are recycled after every lease
+POOL_RECYCLE_FLAGS = {"store", "store-sync"}
+# reset failure of nodes that got peers during their lease
+PEERED = "peer store is not empty"
+
+
+def pool_key(image, start_kwargs):
+    flags = {key.replace("_", "-"): str(value).lower() for key, value in start_kwargs.items()}
+    if POOL_UNSHAREABLE_FLAGS & set(flags):
+        return None
+    fingerprint = hashlib.sha1(json.dumps(flags, sort_keys=True).encode()).hexdigest()[:12]
+    return f"{image}|{fingerprint}"
+
+
+def needs_recycle(start_kwargs):
+    flags = {key.replace("_", "-"): str(value).lower() for key, value in start_kwargs.items()}
+    return any(flags.get(flag) == "true" for flag in POOL_RECYCLE_FLAGS)
+
+
+class NodePool:
+    """
+    Session scoped pool of already started nodes, keyed by image and a fingerprint of the start arguments.
+    WakuNode.start leases a READY node from here when one is available. On release the node's relay/filter
+    subscriptions are removed through REST and it goes back to the pool; nodes that can't be brought back to a
+    clean state are stopped in the background and replaced by a freshly started one.
+    The admin API can't disconnect or forget peers, so a configuration whose nodes come back with peers is only
+    served from the nodes already warm; no more are started for it.
+    """
+
+    def __init__(self, max_idle_per_key=2, workers=4):
+        self._max_idle = max_idle_per_key
+        self._idle = defaultdict(list)
+        self._warming = defaultdict(int)
+        self._peered_keys = set()
+        self._leased = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="node_pool")
+        self._counter = itertools.count(1)
+        self._closed = False
+        self.stats = {"hits": 0, "misses": 0, "reused": 0, "recycled": 0, "dead": 0}
+
+    def lease_into(self, node, start_kwargs):
+        """Hands the state of a warm node over to `node`. Returns False when `node` has to be started normally."""
+        key = pool_key(node.image, start_kwargs)
+        if key is None:
+            return False
+        warm_node = self._pop_running(key)
+        with self._lock:
+            self._leased[node] = (key, dict(start_kwargs))
+            self.stats["hits" if warm_node else "misses"] += 1
+        if warm_node is None:
+            # the next test asking for the same configuration will find a node ready
+            self._schedule_warm_up(node.image, key, start_kwargs)
+            return False
+        node.adopt(warm_node)
+        logger.debug(f"Leased warm node {node.container.short_id} for key {key}")
+        return True
+
+    def _pop_running(self, key):
+        # idle containers can die (crash, docker restart, OOM), those are dropped and replaced instead of handed out
+        while True:
+            with self._lock:
+                warm_node = self._idle[key].pop() if self._idle[key] else None
+            if warm_node is None or warm_node.is_running():
+                return warm_node
+            logger.debug(f"Dropping pooled node {warm_node.container.short_id} of key {key}, its container is not running")
+            with self._lock:
+                self.stats["dead"] += 1
+            # the miss that follows schedules the replacement
+            self._executor.submit(self._discard, warm_node)
+
+    def release(self, node):
+        key, start_kwargs = self._leased.pop(node, (None, None))
+        if key is None or not node.container:
+            node.stop()
+            return
+        if not node.is_running():
+            # crashed containers are reported by the caller, same as for unpooled nodes
+            node.stop()
+            return
+        reason = "store state" if needs_recycle(start_kwargs) else self._reset(node)
+        with self._lock:
+            if reason == PEERED:
+                # tests of this configuration connect nodes, a replacement would be recycled again after its lease
+                self._peered_keys.add(key)
+            if reason is None and not self._closed and len(self._idle[key]) < self._max_idle:
+                # the node outlives the test now, the reaper running at its end must leave the container alone
+                get_container_registry().track(node.container, session_scoped=True)
+                self._idle[key].append(node)
+                self.stats["reused"] += 1
+                logger.debug(f"Node {node.container.short_id} was reset and returned to the pool")
+                return
+            self.stats["recycled"] += 1
+        logger.debug(f"Recycling node {node.container.short_id} in the background: {reason or 'pool is full'}")
+        self._executor.submit(self._recycle, node, key, start_kwargs)
+
+    def idle_nodes(self):
+        with self._lock:
+            return [node for nodes in self._idle.values() for node in nodes]
+
+    def _reset(self, node):
+        if node.reset_blockers:
+            return ", ".join(sorted(node.reset_blockers))
+        try:
+            node.reset_subscriptions()
+            if node.start_args.get("filter") == "true" and node.get_filter_subscriptions():
+                return "filter service still has subscribers"
+            # the admin API can't forget peers, a node that has seen any is not clean anymore
+            if node.get_peers():
+                return PEERED
+            node.ensure_ready(timeout_duration=5)
+        except Exception as ex:
+            return f"reset failed: {ex}"
+        return None
+
+    @staticmethod
+    def _discard(node):
+        try:
+            node.stop()
+        except Exception as ex:
+            logger.error(f"Failed to stop recycled node: {ex}")
+
+    def _recycle(self, node, key, start_kwargs):
+        self._discard(node)
+        self._schedule_warm_up(node.image, key, start_kwargs)
+
+    def _schedule_warm_up(self, image, key, start_kwargs):
+        with self._lock:
+            if self._closed or key in self._peered_keys or len(self._idle[key]) + self._warming[key] >= self._max_idle:
+                return
+            self._warming[key] += 1
+        self._executor.submit(self._warm_up, image, key, dict(start_kwargs))
+
+    def _warm_up(self, image, key, start_kwargs):
+        node = WakuNode(image, f"pool{next(self._counter)}_{os.getpid()}")
+        node.set_pool_managed()
+        try:
+            node.start(**start_kwargs)
+        except Exception as ex:
+            logger.error(f"Failed to warm up a node for key {key}: {ex}")
+            node.stop()
+            return
+        finally:
+            with self._lock:
+                self._warming[key] -= 1
+        with self._lock:
+            if not self._closed:
+                self._idle[key].append(node)
+                return
+        node.stop()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._executor.shutdown(wait=True)
+        idle_nodes = [node for nodes in self._idle.values() for node in nodes]
+        self._idle.clear()
+        for node in idle_nodes:
+            try:
+                node.stop()
+            except Exception as ex:
+                logger.error(f"Failed to stop pooled node: {ex}")
+        logger.info(f"Node pool closed. Stats: {self.stats}, configurations not pooled because of peers: {len(self._peered_keys)}")
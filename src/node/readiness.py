@@ -0,0 +1,73 @@
+import re
+import threading
+from time import time
+from src.libs.custom_logger import get_custom_logger
+from src.test_data import NODE_READY_LOG_PATTERNS
+
+logger = get_custom_logger(__name__)
+
+
+class ReadinessWaiter:
+    """
+    Wakes up as soon as the node's log stream shows that every pattern in NODE_READY_LOG_PATTERNS was logged,
+    or as soon as Docker reports that the container died. It also keeps the startup phase timings of the node.
+    """
+
+    def __init__(self, patterns=NODE_READY_LOG_PATTERNS):
+        self._pending = [re.compile(pattern) for pattern in patterns]
+        self._partial_line = b""
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._events_stream = None
+        self.failure = None
+        self.started_at = time()
+        self.timings = {}
+
+    def mark(self, phase):
+        self.timings.setdefault(phase, round(time() - self.started_at, 3))
+
+    def feed(self, chunk):
+        """Called from the log thread for every chunk of container output."""
+        self.mark("first_log")
+        if self._event.is_set():
+            return
+        with self._lock:
+            lines = (self._partial_line + chunk).split(b"\n")
+            self._partial_line = lines.pop()
+            for line in lines:
+                text = line.decode("utf-8", errors="replace")
+                self._pending = [pattern for pattern in self._pending if not pattern.search(text)]
+            if not self._pending:
+                self.mark("ready_log")
+                self._event.set()
+
+    def watch_events(self, events_stream):
+        """Consumes a Docker events stream filtered on the container and fails fast when it dies."""
+        self._events_stream = events_stream
+
+        def consume():
+            try:
+                for event in events_stream:
+                    exit_code = event.get("Actor", {}).get("Attributes", {}).get("exitCode")
+                    self.fail(f"container {event.get('status')} (exit code {exit_code}) before becoming ready")
+                    return
+            except Exception:
+                # the stream is closed by close() once the node is ready
+                return
+
+        threading.Thread(target=consume, daemon=True).start()
+
+    def fail(self, reason):
+        self.failure = reason
+        self._event.set()
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
+    def close(self):
+        self._event.set()
+        if self._events_stream is not None:
+            try:
+                self._events_stream.close()
+            except Exception:
+                pass
@@ -0,0 +1,118 @@
+import errno
+import ipaddress
+import json
+import os
+import random
+import socket
+import threading
+from filelock import FileLock
+from src.env_vars import ALLOCATOR_DIR, IP_RANGE, PORT_RANGE, SUBNET, GATEWAY
+from src.libs.custom_logger import get_custom_logger
+
+logger = get_custom_logger(__name__)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as ex:
+        return ex.errno == errno.EPERM
+    return True
+
+
+def _host_port_free(port):
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(("0.0.0.0", port))
+        except OSError:
+            return False
+    return True
+
+
+class ResourceAllocator:
+    """
+    Hands out host port blocks and container IPs that are disjoint across all pytest processes on the host.
+    Leases live in a JSON file guarded by a file lock and are owned by a pid, so leases of crashed workers are
+    reclaimed the next time somebody allocates.
+    """
+
+    def __init__(self, state_dir=ALLOCATOR_DIR, port_range=PORT_RANGE):
+        os.makedirs(state_dir, exist_ok=True)
+        self._state_path = os.path.join(state_dir, "leases.json")
+        self._file_lock = FileLock(self._state_path + ".lock")
+        self._thread_lock = threading.Lock()
+        self._port_min, self._port_max = (int(port) for port in port_range.split("-"))
+        # static IPs are taken outside IP_RANGE, which docker uses for dynamically addressed containers (e.g. postgres)
+        self._network = ipaddress.ip_network(SUBNET)
+        self._dynamic_range = ipaddress.ip_network(IP_RANGE)
+        self._reserved_ips = {str(self._network.network_address), str(self._network.broadcast_address), GATEWAY}
+        self.avoided_collisions = 0
+
+    def _transaction(self, update):
+        with self._thread_lock, self._file_lock:
+            try:
+                with open(self._state_path, "r") as state_file:
+                    state = json.load(state_file)
+            except (FileNotFoundError, json.JSONDecodeError):
+                state = {"ports": {}, "ips": {}}
+            for kind in ("ports", "ips"):
+                state[kind] = {key: pid for key, pid in state[kind].items() if pid == os.getpid() or _pid_alive(pid)}
+            result = update(state)
+            tmp_path = f"{self._state_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as state_file:
+                json.dump(state, state_file)
+            os.replace(tmp_path, self._state_path)
+            return result
+
+    def lease_ports(self, count=5, max_attempts=1000):
+        def update(state):
+            for _ in range(max_attempts):
+                # blocks are aligned to their size so the range doesn't fragment
+                base_port = self._port_min + count * random.randint(0, (self._port_max - self._port_min + 1) // count - 1)
+                ports = [str(base_port + i) for i in range(count)]
+                # every candidate rejected here is a container launch that would have failed and been retried
+                if any(port in state["ports"] for port in ports) or not all(_host_port_free(int(port)) for port in ports):
+                    self.avoided_collisions += 1
+                    continue
+                for port in ports:
+                    state["ports"][port] = os.getpid()
+                return ports
+            raise RuntimeError(f"Could not find {count} free consecutive ports in range {self._port_min}-{self._port_max}")
+
+        return self._transaction(update)
+
+    def lease_ip(self, max_attempts=1000):
+        def update(state):
+            for _ in range(max_attempts):
+                ip = str(self._network.network_address + random.randint(1, self._network.num_addresses - 2))
+                if ip in self._reserved_ips or ipaddress.ip_address(ip) in self._dynamic_range:
+                    continue
+                if ip in state["ips"]:
+                    self.avoided_collisions += 1
+                    continue
+                state["ips"][ip] = os.getpid()
+                return ip
+            raise RuntimeError(f"Could not find a free IP address in {self._network}")
+
+        return self._transaction(update)
+
+    def release(self, ports=None, ip=None):
+        def update(state):
+            for port in ports or []:
+                state["ports"].pop(str(port), None)
+            if ip:
+                state["ips"].pop(ip, None)
+
+        self._transaction(update)
+
+
+_allocator = None
+_allocator_lock = threading.Lock()
+
+
+def get_allocator():
+    global _allocator
+    with _allocator_lock:
+        if _allocator is None:
+            _allocator = ResourceAllocator()
+        return _allocator
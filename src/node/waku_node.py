@@ -5,14 +5,16 @@ import random
 import re
 import shutil
 import string
+from concurrent.futures import ThreadPoolExecutor
+from time import time
 import pytest
-import requests
-from src.libs.common import delay
 from src.libs.custom_logger import get_custom_logger
 from tenacity import retry, stop_after_delay, wait_fixed
 from src.node.api_clients.rest import REST
 from src.node.docker_mananger import DockerManager
-from src.env_vars import DOCKER_LOG_DIR
+from src.node.readiness import ReadinessWaiter
+from src.node.store_response import StoreResponse
+from src.env_vars import API_REQUEST_TIMEOUT, DOCKER_LOG_DIR
 from src.data_storage import DS
 from src.test_data import DEFAULT_CLUSTER_ID, LOG_ERROR_KEYWORDS, VALID_PUBSUB_TOPICS
 
@@ -83,21 +85,35 @@ class WakuNode:
         self._docker_manager = DockerManager(self._image_name)
         self._container = None
         self.start_args = {}
+        # state that has to be undone before the node can be handed to another test by the warm pool
+        self._pool_managed = False
+        self._relay_subscriptions = set()
+        self._relay_auto_subscriptions = set()
+        self._filter_request_ids = set()
+        self._reset_blockers = set()
+        self._network_lease = None
+        self._paused = False
         logger.debug(f"WakuNode instance initialized with log path {self._log_path}")
 
     @retry(stop=stop_after_delay(60), wait=wait_fixed(0.1), reraise=True)
     def start(self, wait_for_node_sec=20, **kwargs):
+        if DS.node_pool and not self._pool_managed and DS.node_pool.lease_into(self, kwargs):
+            DS.waku_nodes.append(self)
+            return
         logger.debug("Starting Node...")
         self._docker_manager.create_network()
+        self.release_network_lease()
         self._ext_ip = self._docker_manager.generate_random_ext_ip()
         self._ports = self._docker_manager.generate_ports()
+        self._network_lease = (self._ports, self._ext_ip)
         self._rest_port = self._ports[0]
         self._tcp_port = self._ports[1]
         self._websocket_port = self._ports[2]
         self._discv5_port = self._ports[3]
         self._metrics_port = self._ports[4]
         self._api = REST(self._rest_port)
-        self._volumes = []
+        # "host path:container path" bind mounts, e.g. to start a store node on a restored database
+        self._volumes = list(kwargs.pop("volumes", []))
 
         default_args = {
             "listen-address": "0.0.0.0",
@@ -177,31 +193,45 @@ class WakuNode:
 
         logger.debug(f"Using volumes {self._volumes}")
         self.start_args = dict(default_args)
-        self._container = self._docker_manager.start_container(
-            self._docker_manager.image,
-            ports=self._ports,
-            args=default_args,
-            log_path=self._log_path,
-            container_ip=self._ext_ip,
-            volumes=self._volumes,
-            remove_container=remove_container,
-        )
+        readiness_waiter = ReadinessWaiter()
+        try:
+            self._container = self._docker_manager.start_container(
+                self._docker_manager.image,
+                ports=self._ports,
+                args=default_args,
+                log_path=self._log_path,
+                container_ip=self._ext_ip,
+                volumes=self._volumes,
+                remove_container=remove_container,
+                readiness_waiter=readiness_waiter,
+                session_scoped=self._pool_managed,
+            )
+        except Exception:
+            self.release_network_lease()
+            raise
 
         logger.debug(f"Started container from image {self._image_name}. REST: {self._rest_port}")
-        DS.waku_nodes.append(self)
-        delay(1)  # if we fire requests to soon after starting the node will sometimes fail to start correctly
+        if not self._pool_managed:
+            DS.waku_nodes.append(self)
         try:
-            self.ensure_ready(timeout_duration=wait_for_node_sec)
+            self.wait_until_ready(readiness_waiter, timeout_duration=wait_for_node_sec)
         except Exception as ex:
             logger.error(f"REST service did not become ready in time: {ex}")
             raise
+        finally:
+            readiness_waiter.close()
+        self.startup_timings = readiness_waiter.timings
+        DS.startup_timings.append({"node": os.path.basename(self._log_path), **self.startup_timings})
+        logger.debug(f"Node startup phases (seconds since launch): {self.startup_timings}")
 
     @retry(stop=stop_after_delay(250), wait=wait_fixed(0.1), reraise=True)
     def register_rln(self, **kwargs):
         logger.debug("Registering RLN credentials...")
         self._docker_manager.create_network()
+        self.release_network_lease()
         self._ext_ip = self._docker_manager.generate_random_ext_ip()
         self._ports = self._docker_manager.generate_ports()
+        self._network_lease = (self._ports, self._ext_ip)
         self._rest_port = self._ports[0]
         self._api = REST(self._rest_port)
         self._volumes = []
@@ -232,40 +262,125 @@ class WakuNode:
     def stop(self):
         if self._container:
             logger.debug(f"Stopping container with id {self._container.short_id}")
-            self._container.stop()
+            self._docker_manager.stop_container(self._container)
             try:
-                self._container.remove()
+                self._docker_manager.remove_container(self._container)
             except:
                 pass
             self._container = None
+            self.release_network_lease()
+            self.close_api()
+            self._docker_manager.close_log(self._log_path)
             logger.debug("Container stopped.")
 
     @retry(stop=stop_after_delay(5), wait=wait_fixed(0.1), reraise=True)
     def kill(self):
         if self._container:
             logger.debug(f"Killing container with id {self._container.short_id}")
-            self._container.kill()
+            self._docker_manager.kill_container(self._container)
             try:
-                self._container.remove()
+                self._docker_manager.remove_container(self._container)
             except:
                 pass
             self._container = None
+            self.release_network_lease()
+            self.close_api()
+            self._docker_manager.close_log(self._log_path)
             logger.debug("Container killed.")
 
+    def close_api(self):
+        if getattr(self, "_api", None):
+            logger.debug(f"REST connections for node on port {self._rest_port}: {self._api.connection_stats()}")
+            self._api.close()
+
+    def rest_connection_stats(self):
+        return self._api.connection_stats()
+
+    def release_network_lease(self):
+        if self._network_lease:
+            self._docker_manager.release_ports_and_ip(*self._network_lease)
+            self._network_lease = None
+
     def restart(self):
         if self._container:
             logger.debug(f"Restarting container with id {self._container.short_id}")
-            self._container.restart()
+            self._reset_blockers.add("restarted")
+            self._docker_manager.restart_container(self._container)
 
     def pause(self):
         if self._container:
             logger.debug(f"Pausing container with id {self._container.short_id}")
-            self._container.pause()
+            self._reset_blockers.add("paused")
+            self._paused = True
+            self._docker_manager.pause_container(self._container)
 
     def unpause(self):
         if self._container:
             logger.debug(f"Unpause container with id {self._container.short_id}")
-            self._container.unpause()
+            self._docker_manager.unpause_container(self._container)
+            self._paused = False
+
+    def is_running(self):
+        return bool(self._container) and self._docker_manager.is_container_running(self._container)
+
+    def set_pool_managed(self):
+        self._pool_managed = True
+
+    def adopt(self, warm_node):
+        # takes over the container and runtime state of a pooled node; every lease logs to a file of its own, the
+        # output of the earlier leases stays in theirs
+        log_path = self._log_path
+        self.__dict__.update(warm_node.__dict__)
+        self._pool_managed = False
+        self._docker_manager.switch_log(self._container, warm_node._log_path, log_path)
+        self._docker_manager.close_log(warm_node._log_path)
+        self._log_path = log_path
+        logger.debug(f"Node adopted container {self._container.short_id}, logs continue in {self._log_path}")
+
+    @property
+    def is_paused(self):
+        return self._paused
+
+    @property
+    def reset_blockers(self):
+        return self._reset_blockers
+
+    def reset_subscriptions(self):
+        if self._relay_subscriptions:
+            self.delete_relay_subscriptions(list(self._relay_subscriptions))
+        if self._relay_auto_subscriptions:
+            self.delete_relay_auto_subscriptions(list(self._relay_auto_subscriptions))
+        for request_id in list(self._filter_request_ids):
+            self.delete_all_filter_subscriptions({"requestId": request_id})
+        self._filter_request_ids.clear()
+
+    def wait_until_ready(self, readiness_waiter, timeout_duration=20):
+        # Requests sent too early can make the node fail to start, so the log stream is the primary signal.
+        # A probe per second covers log formats that don't match NODE_READY_LOG_PATTERNS.
+        deadline = time() + timeout_duration
+        confirmed = False
+        while not readiness_waiter.wait(timeout=max(0, min(1, deadline - time()))):
+            if time() >= deadline:
+                break
+            if self.probe_ready():
+                confirmed = True
+                break
+        if readiness_waiter.failure:
+            raise RuntimeError(f"Node failed to start: {readiness_waiter.failure}")
+        if not confirmed and not self.probe_ready():
+            self.ensure_ready(timeout_duration=max(1, deadline - time()))
+        readiness_waiter.mark("ready")
+
+    def probe_ready(self):
+        try:
+            health_response = json.loads(self.health())
+            if self.is_nwaku() and health_response.get("nodeHealth") != "READY":
+                return False
+            self.health_response = health_response
+            self.info_response = self.info()
+        except Exception:
+            return False
+        return True
 
     def ensure_ready(self, timeout_duration=10):
         @retry(stop=stop_after_delay(timeout_duration), wait=wait_fixed(0.1), reraise=True)
@@ -333,16 +448,24 @@ class WakuNode:
         return self._api.add_peers(peers)
 
     def set_relay_subscriptions(self, pubsub_topics):
-        return self._api.set_relay_subscriptions(pubsub_topics)
+        response = self._api.set_relay_subscriptions(pubsub_topics)
+        self._relay_subscriptions.update(pubsub_topics)
+        return response
 
     def set_relay_auto_subscriptions(self, content_topics):
-        return self._api.set_relay_auto_subscriptions(content_topics)
+        response = self._api.set_relay_auto_subscriptions(content_topics)
+        self._relay_auto_subscriptions.update(content_topics)
+        return response
 
     def delete_relay_subscriptions(self, pubsub_topics):
-        return self._api.delete_relay_subscriptions(pubsub_topics)
+        response = self._api.delete_relay_subscriptions(pubsub_topics)
+        self._relay_subscriptions.difference_update(pubsub_topics)
+        return response
 
     def delete_relay_auto_subscriptions(self, content_topics):
-        return self._api.delete_relay_auto_subscriptions(content_topics)
+        response = self._api.delete_relay_auto_subscriptions(content_topics)
+        self._relay_auto_subscriptions.difference_update(content_topics)
+        return response
 
     def send_relay_message(self, message, pubsub_topic):
         return self._api.send_relay_message(message, pubsub_topic)
@@ -360,7 +483,10 @@ class WakuNode:
         return self._api.get_relay_auto_messages(content_topic)
 
     def set_filter_subscriptions(self, subscription):
-        return self._api.set_filter_subscriptions(subscription)
+        response = self._api.set_filter_subscriptions(subscription)
+        if isinstance(subscription, dict) and "requestId" in subscription:
+            self._filter_request_ids.add(subscription["requestId"])
+        return response
 
     def update_filter_subscriptions(self, subscription):
         return self._api.update_filter_subscriptions(subscription)
@@ -407,9 +533,38 @@ class WakuNode:
             **kwargs,
         )
 
+    def iter_store_pages(self, prefetch=True, cursor=None, **query):
+        """
+        Yields raw store responses page by page following the pagination cursor (read through StoreResponse, go-waku
+        names it differently). With prefetch the request for the next page is already in flight while the caller
+        consumes the current one.
+        """
+
+        def fetch(page_cursor):
+            return self.get_store_messages(cursor=page_cursor, **query)
+
+        if not prefetch:
+            while True:
+                page = fetch(cursor)
+                yield page
+                cursor = StoreResponse(page, self).pagination_cursor
+                if cursor is None:
+                    return
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="store_prefetch") as executor:
+            future = executor.submit(fetch, cursor)
+            while future is not None:
+                page = future.result()
+                cursor = StoreResponse(page, self).pagination_cursor
+                future = executor.submit(fetch, cursor) if cursor is not None else None
+                yield page
+
+    def iter_store_messages(self, prefetch=True, **query):
+        for page in self.iter_store_pages(prefetch=prefetch, **query):
+            yield from page.get("messages") or []
+
     def get_metrics(self):
         if self.is_nwaku():
-            metrics = requests.get(f"http://localhost:{self._metrics_port}/metrics")
+            metrics = self._api.session.get(f"http://localhost:{self._metrics_port}/metrics", timeout=API_REQUEST_TIMEOUT)
             metrics.raise_for_status()
             return metrics.content.decode("utf-8")
         else:
@@ -533,10 +688,12 @@ class WakuNode:
         if whitelist:
             keywords = [keyword for keyword in keywords if keyword not in whitelist]
 
-        matches = self._docker_manager.search_log_for_keywords(self._log_path, keywords, False)
+        # at teardown the last line of a node may lack its newline, it is checked as well
+        matches = self._docker_manager.search_log_for_keywords(self._log_path, keywords, False, include_partial=True)
         assert not matches, f"Found errors {matches}"
 
     def set_log_level(self, log_level):
+        self._reset_blockers.add("log level changed")
         return self._api.set_log_level(log_level)
 
     def get_service_peers(self):
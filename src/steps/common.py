@@ -1,5 +1,3 @@
-import base64
-import hashlib
 import inspect
 from time import time
 from time import time_ns
@@ -9,6 +7,8 @@ from datetime import timedelta, datetime
 from tenacity import retry, stop_after_delay, wait_fixed
 from src.libs.common import delay, to_base64
 from src.libs.custom_logger import get_custom_logger
+from src.libs.message_hasher import get_message_hasher
+from src.data_storage import DS
 
 logger = get_custom_logger(__name__)
 
@@ -40,6 +40,10 @@ class StepsCommon:
 
     @allure.step
     def create_message(self, **kwargs):
+        return self.build_message(**kwargs)
+
+    def build_message(self, **kwargs):
+        # same as create_message but without the allure step, for messages built in bulk or from worker threads
         ts_ns = time_ns()
         ts_ns = int(f"{ts_ns:019d}")
         message = {"payload": to_base64(self.test_payload), "contentTopic": self.test_content_topic, "timestamp": ts_ns}
@@ -48,18 +52,28 @@ class StepsCommon:
 
     @allure.step
     def compute_message_hash(self, pubsub_topic, msg, hash_type="hex"):
-        ctx = hashlib.sha256()
-        ctx.update(pubsub_topic.encode("utf-8"))
-        ctx.update(base64.b64decode(msg["payload"]))
-        ctx.update(msg["contentTopic"].encode("utf-8"))
-        if "meta" in msg:
-            ctx.update(base64.b64decode(msg["meta"]))
-        ctx.update(int(msg["timestamp"]).to_bytes(8, byteorder="big"))
-        hash_bytes = ctx.digest()
-        if hash_type == "hex":
-            return "0x" + hash_bytes.hex()
-        else:
-            return base64.b64encode(hash_bytes).decode("utf-8")
+        return get_message_hasher().hash(pubsub_topic, msg, hash_type=hash_type)
+
+    @allure.step
+    def compute_message_hashes(self, pubsub_topic, messages, hash_type="hex"):
+        return get_message_hasher().hash_batch(pubsub_topic, messages, hash_type=hash_type)
+
+    @allure.step
+    def get_message_propagation(self, message, pubsub_topic=None, event="received"):
+        # {node: seconds after the first node logged the event}, from the node logs instead of REST polling
+        assert DS.message_timeline, "Message timeline is disabled (MESSAGE_TIMELINE_ENABLED)"
+        message_hash = self.compute_message_hash(pubsub_topic or self.test_pubsub_topic, message)
+        propagation = DS.message_timeline.propagation(message_hash, event=event)
+        logger.debug(f"Propagation of message {message_hash} ({event}): {propagation}")
+        return propagation
+
+    @allure.step
+    def check_message_propagation_latency(self, message, max_latency, expected_nodes=None, pubsub_topic=None, event="received"):
+        propagation = self.get_message_propagation(message, pubsub_topic=pubsub_topic, event=event)
+        if expected_nodes is not None:
+            assert len(propagation) >= expected_nodes, f"Expected {event} on {expected_nodes} nodes, but it was logged on {list(propagation)}"
+        slow_nodes = {node: latency for node, latency in propagation.items() if latency > max_latency}
+        assert not slow_nodes, f"Message took longer than {max_latency}s to reach {slow_nodes}"
 
     def get_time_list_pass(self):
         ts_pass = [
@@ -7,6 +7,7 @@ import allure
 from src.libs.common import to_base64, delay
 from src.node.waku_message import WakuMessage
 from src.env_vars import NODE_1, NODE_2, ADDITIONAL_NODES
+from src.node.cluster_builder import ClusterBuilder, NodeSpec
 from src.node.waku_node import WakuNode
 from tenacity import retry, stop_after_delay, wait_fixed
 from src.steps.common import StepsCommon
@@ -71,11 +72,19 @@ class StepsFilter(StepsCommon):
             nodes = [node.strip() for node in node_list.split(",") if node]
         else:
             pytest.skip("ADDITIONAL_NODES/node_list is empty, cannot run test")
-        for index, node in enumerate(nodes):
-            node = WakuNode(node, f"node{index + 3}_{self.test_id}")
-            node.start(relay="false", discv5_bootstrap_node=self.enr_uri, filternode=self.multiaddr_with_id)
-            self.add_node_peer(node, [self.multiaddr_with_id])
-            self.optional_nodes.append(node)
+        specs = [
+            NodeSpec(
+                name=f"node{index + 3}",
+                image=image,
+                start_args={"relay": "false"},
+                bootstrap="node1",
+                multiaddr_args={"filternode": "node1"},
+                peers=["node1"],
+            )
+            for index, image in enumerate(nodes)
+        ]
+        cluster = ClusterBuilder(specs, log_suffix=self.test_id, existing_nodes={"node1": self.node1}).build()
+        self.optional_nodes.extend(cluster[spec.name] for spec in specs)
 
     @allure.step
     def check_published_message_reaches_filter_peer(
@@ -1,8 +1,10 @@
-import re
+import math
 from src.libs.custom_logger import get_custom_logger
 import allure
 from tenacity import retry, stop_after_delay, wait_fixed
 
+from src.data_storage import DS
+from src.libs.metrics_snapshot import MetricsSnapshot, format_series, histogram_quantile, parse_series
 from src.test_data import METRICS_WITH_INITIAL_VALUE_ZERO
 
 
@@ -10,18 +12,15 @@ logger = get_custom_logger(__name__)
 
 
 class StepsMetrics:
+    def get_metrics_snapshot(self, node):
+        return MetricsSnapshot.from_node(node)
+
     @allure.step
-    def check_metric(self, node, metric_name, expected_value, exact=False):
+    def check_metric(self, node, metric_name, expected_value, exact=False, snapshot=None):
         logger.debug(f"Checking metric: {metric_name} has {expected_value}")
-        response = node.get_metrics()
-        lines = response.split("\n")
-        actual_value = None
-        for line in lines:
-            if line.startswith(metric_name):
-                parts = line.split(" ")
-                if len(parts) >= 2:
-                    actual_value = float(parts[1])
-                    break
+        if snapshot is None:
+            snapshot = self.get_metrics_snapshot(node)
+        actual_value = snapshot.get(metric_name)
         if actual_value is None:
             raise AttributeError(f"Metric '{metric_name}' not found")
         logger.debug(f"Found metric: {metric_name} with value {actual_value}")
@@ -38,31 +37,56 @@ class StepsMetrics:
 
         check_metric_with_retry()
 
-    def validate_initial_metrics(self, node):
-        metrics_data = node.get_metrics()
+    @allure.step
+    def get_histogram_quantiles(self, node, histogram, previous_snapshot=None, quantiles=(0.5, 0.9, 0.99)):
+        # with a previous snapshot the quantiles only cover the observations made since it was taken
+        snapshot = self.get_metrics_snapshot(node)
+        buckets = snapshot.histogram_buckets(histogram, previous=previous_snapshot)
+        result = {quantile: histogram_quantile(quantile, buckets) for quantile in quantiles}
+        logger.debug(f"Quantiles of {histogram} over {buckets[-1][1] if buckets else 0} observations: {result}")
+        return result
 
-        # Regular expression to match metric lines, accounting for optional labels
-        metric_pattern = re.compile(r"^(?P<metric_name>[a-zA-Z0-9_:]+(?:{[^}]+})?)\s+(?P<value>[0-9]+\.?[0-9]*)$", re.MULTILINE)
+    @allure.step
+    def check_histogram_quantile(self, node, histogram, quantile, max_value, previous_snapshot=None):
+        actual_value = self.get_histogram_quantiles(node, histogram, previous_snapshot=previous_snapshot, quantiles=(quantile,))[quantile]
+        assert not math.isnan(actual_value), f"Histogram '{histogram}' has no observations"
+        assert actual_value <= max_value, f"Expected p{quantile * 100:g} of '{histogram}' to be <= {max_value}, but got {actual_value}"
 
-        # Dictionary to store the metrics and their values
-        metrics_dict = {}
-        for match in metric_pattern.finditer(metrics_data):
-            metric_name = match.group("metric_name")
-            value = float(match.group("value"))
-            metrics_dict[metric_name] = value
+    @allure.step
+    def check_metric_trend(self, node, metric_name, min_rate=None, max_rate=None, max_slope=None):
+        # needs the background sampler, enabled with METRICS_SAMPLING_INTERVAL or the sample_metrics marker
+        assert DS.metrics_sampler, "Metrics sampler is not running for this test"
+        if min_rate is not None or max_rate is not None:
+            rate = DS.metrics_sampler.rate(node, metric_name)
+            logger.debug(f"Metric {metric_name} increased by {rate}/s over the test")
+            if min_rate is not None:
+                assert rate >= min_rate, f"Expected '{metric_name}' to increase by at least {min_rate}/s, but got {rate}/s"
+            if max_rate is not None:
+                assert rate <= max_rate, f"Expected '{metric_name}' to increase by at most {max_rate}/s, but got {rate}/s"
+        if max_slope is not None:
+            slope = DS.metrics_sampler.slope(node, metric_name)
+            logger.debug(f"Metric {metric_name} trend is {slope}/s over the test")
+            assert slope <= max_slope, f"Expected '{metric_name}' to grow by at most {max_slope}/s, but it grew by {slope}/s"
+
+    def validate_initial_metrics(self, node):
+        snapshot = self.get_metrics_snapshot(node)
+        # same parser for the expected series, so label order or spacing differences don't matter
+        zero_series = {parse_series(metric): metric for metric in METRICS_WITH_INITIAL_VALUE_ZERO}
 
         errors = []
         # Assert that specific metrics have a value of 0.0
-        for metric in METRICS_WITH_INITIAL_VALUE_ZERO:
-            if metric not in metrics_dict:
+        for key, metric in zero_series.items():
+            value = snapshot.get(key)
+            if value is None:
                 errors.append(f"Metric {metric} is missing from the metrics data")
-            elif metrics_dict[metric] != 0.0:
-                errors.append(f"Expected {metric} to be 0.0, but got {metrics_dict[metric]}")
+            elif value != 0.0:
+                errors.append(f"Expected {metric} to be 0.0, but got {value}")
 
-        # Assert that all other metrics have a value greater than 0.0
-        for metric, value in metrics_dict.items():
-            if metric not in METRICS_WITH_INITIAL_VALUE_ZERO and value <= 0.0:
-                errors.append(f"Expected {metric} to have a positive value, but got {value}")
+        # Assert that all other metrics have a value greater than 0.0. Only the series the old line regex picked up
+        # are checked: negative, NaN and infinite values never matched it, so they stay out of the check
+        for key, value in snapshot.finite_items():
+            if key not in zero_series and value == 0.0:
+                errors.append(f"Expected {format_series(*key)} to have a positive value, but got {value}")
 
         assert not errors, f"Metrics validation failed:\n" + "\n".join(errors)
         logger.debug(f"All metrics are present and have valid values.")
@@ -1,32 +1,121 @@
+import ipaddress
+import re
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from dataclasses import dataclass, field
+from typing import Optional
 from src.libs.custom_logger import get_custom_logger
 
 logger = get_custom_logger(__name__)
 
+# errors of `tc qdisc del` when there is nothing to delete
+NOTHING_TO_CLEAR_ERRORS = ["Cannot delete qdisc with handle of zero", "No such file or directory"]
+
 
 class TrafficController:
-    def _pid(self, node) -> int:
+    def __init__(self):
+        # container id -> pid; a restarted container gets a new pid, so a failing nsenter drops the cached one
+        self._pids = {}
+        # container id -> interface of the node's waku network IP
+        self._peer_ifaces = {}
+        self._pids_lock = threading.Lock()
+
+    def _pid(self, node, refresh=False) -> int:
         if not node.container:
             raise RuntimeError("Node container not started yet")
 
+        with self._pids_lock:
+            if not refresh and node.container.id in self._pids:
+                return self._pids[node.container.id]
+
         node.container.reload()
         pid = node.container.attrs.get("State", {}).get("Pid")
         if not pid or pid == 0:
             raise RuntimeError("Container PID not available (container not running?)")
+        with self._pids_lock:
+            self._pids[node.container.id] = int(pid)
         return int(pid)
 
-    def _exec(self, node, tc_args: list[str], iface: str = "eth0"):
-        pid = self._pid(node)
+    def _run_tc(self, node, tc_args: list[str], stdin=None):
+        return self.run_in_netns(node, ["tc"] + tc_args, stdin=stdin)
+
+    def run_in_netns(self, node, args: list[str], stdin=None):
+        """Runs a host command inside the node's network namespace, returns the completed process and the command."""
+        for attempt in range(2):
+            pid = self._pid(node, refresh=attempt > 0)
+            cmd = ["sudo", "-n", "nsenter", "-t", str(pid), "-n"] + args
+            logger.info(f"{'TC' if args[0] == 'tc' else 'Netns'} exec: {cmd}" + (f" with batch:\n{stdin}" if stdin else ""))
+            res = subprocess.run(cmd, capture_output=True, text=True, input=stdin)
+            if res.returncode != 0 and "nsenter" in res.stderr and attempt == 0:
+                logger.debug(f"nsenter into pid {pid} failed, refreshing the container pid")
+                continue
+            return res, cmd
 
-        cmd = ["sudo", "-n", "nsenter", "-t", str(pid), "-n", "tc"] + tc_args
-        logger.info(f"TC exec: {cmd}")
+    def peer_iface(self, node) -> str:
+        """
+        The interface holding the node's `_ext_ip`, i.e. the one its traffic to the other nodes goes through. The
+        waku network is connected after the container starts, so it is not eth0: that one is docker's default
+        bridge, carrying the published REST ports.
+        """
+        with self._pids_lock:
+            if node.container.id in self._peer_ifaces:
+                return self._peer_ifaces[node.container.id]
+        res, cmd = self.run_in_netns(node, ["ip", "-o", "-4", "addr", "show"])
+        if res.returncode != 0:
+            raise RuntimeError(f"Listing addresses failed: {' '.join(cmd)}\n" f"stderr: {res.stderr}")
+        for line in res.stdout.splitlines():
+            match = re.match(r"\d+:\s+([^\s@]+)\S*\s+inet\s+([\d.]+)/", line)
+            if match and match.group(2) == node._ext_ip:
+                with self._pids_lock:
+                    self._peer_ifaces[node.container.id] = match.group(1)
+                return match.group(1)
+        raise RuntimeError(f"No interface of {node.container.short_id} holds {node._ext_ip}:\n{res.stdout}")
 
-        res = subprocess.run(cmd, capture_output=True, text=True)
+    def _exec(self, node, tc_args: list[str], iface: str = "eth0"):
+        res, cmd = self._run_tc(node, tc_args)
         if res.returncode != 0:
             raise RuntimeError(f"TC failed: {' '.join(cmd)}\n" f"stdout: {res.stdout}\n" f"stderr: {res.stderr}")
 
         return res.stdout
 
+    def apply(self, node, commands: list[list[str]], iface: str = "eth0", show_stats: bool = True):
+        """
+        Runs several tc commands (e.g. ["qdisc", "replace", ...]) in the node's network namespace with a single
+        `tc -batch` process and returns the `tc -s qdisc show` output that ends the batch. With iface None the
+        stats are read from the node's peer interface.
+        """
+        iface = iface or self.peer_iface(node)
+        lines = [" ".join(command) for command in commands]
+        if show_stats:
+            lines.append(f"qdisc show dev {iface}")
+        res, cmd = self._run_tc(node, ["-s", "-force", "-batch", "-"], stdin="\n".join(lines) + "\n")
+        # tc reports every failed batch line with an extra "Command failed -:<line>"
+        errors = [
+            line
+            for line in res.stderr.splitlines()
+            if line.strip() and not line.startswith("Command failed") and not any(error in line for error in NOTHING_TO_CLEAR_ERRORS)
+        ]
+        if res.returncode != 0 and errors:
+            raise RuntimeError(f"TC failed: {' '.join(cmd)}\n" f"batch: {lines}\n" f"stdout: {res.stdout}\n" f"stderr: {res.stderr}")
+        if show_stats:
+            logger.debug(f"tc -s qdisc show dev {iface}:\n{res.stdout.strip()}")
+        return res.stdout
+
+    def apply_bulk(self, node_commands: dict, iface: str = "eth0", max_workers: int = 8):
+        """Applies {node: [tc commands]} to all nodes concurrently, one tc process per node. Returns {node: stats}."""
+        if not node_commands:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(node_commands))) as executor:
+            futures = {node: executor.submit(self.apply, node, commands, iface) for node, commands in node_commands.items()}
+            return {node: future.result() for node, future in futures.items()}
+
+    @staticmethod
+    def root_qdisc(iface: str, *qdisc: str) -> list[str]:
+        # replace swaps the root qdisc in one step, no separate clear needed
+        return ["qdisc", "replace", "dev", iface, "root", *qdisc]
+
     def log_tc_stats(self, node, iface: str = "eth0"):
         """
         Log tc statistics for an interface (best-effort).
@@ -47,40 +136,30 @@ class TrafficController:
             self._exec(node, ["qdisc", "del", "dev", iface, "root"], iface=iface)
         except RuntimeError as e:
             msg = str(e)
-            if "Cannot delete qdisc with handle of zero" in msg or "No such file or directory" in msg:
+            if any(error in msg for error in NOTHING_TO_CLEAR_ERRORS):
                 return
             raise
 
+    def clear_bulk(self, nodes, iface: str = "eth0", max_workers: int = 8):
+        """With iface None every node's peer interface is cleared."""
+        self.apply_bulk(
+            {node: [["qdisc", "del", "dev", iface or self.peer_iface(node), "root"]] for node in nodes}, iface=iface, max_workers=max_workers
+        )
+
     def add_latency(self, node, ms: int, iface: str = "eth0"):
-        self.clear(node, iface=iface)
-        self._exec(node, ["qdisc", "add", "dev", iface, "root", "netem", "delay", f"{ms}ms"], iface=iface)
+        self.apply(node, [self.root_qdisc(iface, "netem", "delay", f"{ms}ms")], iface=iface)
+
+    def add_latency_bulk(self, nodes, ms: int, iface: str = "eth0"):
+        self.apply_bulk({node: [self.root_qdisc(iface, "netem", "delay", f"{ms}ms")] for node in nodes}, iface=iface)
 
     def add_packet_loss(self, node, percent: float, iface: str = "eth0"):
-        self.clear(node, iface=iface)
+        self.apply(node, [self.root_qdisc(iface, "netem", "loss", f"{percent}%")], iface=iface)
 
-        self._exec(
-            node,
-            ["qdisc", "add", "dev", iface, "root", "netem", "loss", f"{percent}%"],
-            iface=iface,
-        )
-        try:
-            stats = self._exec(node, ["-s", "qdisc", "show", "dev", iface], iface=iface)
-            if stats is not None:
-                if isinstance(stats, (bytes, bytearray)):
-                    stats = stats.decode(errors="replace")
-                logger.debug(f"tc -s qdisc show dev {iface}:\n{stats}")
-            else:
-                logger.debug(f"Executed: tc -s qdisc show dev {iface} (no output returned by _exec)")
-        except Exception as e:
-            logger.debug(f"Failed to read tc stats for {iface}: {e}")
+    def add_packet_loss_bulk(self, nodes, percent: float, iface: str = "eth0"):
+        self.apply_bulk({node: [self.root_qdisc(iface, "netem", "loss", f"{percent}%")] for node in nodes}, iface=iface)
 
     def add_bandwidth(self, node, rate: str, iface: str = "eth0"):
-        self.clear(node, iface=iface)
-        self._exec(
-            node,
-            ["qdisc", "add", "dev", iface, "root", "tbf", "rate", rate, "burst", "32kbit", "limit", "12500"],
-            iface=iface,
-        )
+        self.apply(node, [self.root_qdisc(iface, "tbf", "rate", rate, "burst", "32kbit", "limit", "12500")], iface=iface)
 
     def add_packet_loss_correlated(
         self,
@@ -89,22 +168,7 @@ class TrafficController:
         correlation: float,
         iface: str = "eth0",
     ):
-        self.clear(node, iface=iface)
-        self._exec(
-            node,
-            [
-                "qdisc",
-                "add",
-                "dev",
-                iface,
-                "root",
-                "netem",
-                "loss",
-                f"{percent}%",
-                f"{correlation}%",
-            ],
-            iface=iface,
-        )
+        self.apply(node, [self.root_qdisc(iface, "netem", "loss", f"{percent}%", f"{correlation}%")], iface=iface)
 
     def add_packet_reordering(
         self,
@@ -114,22 +178,415 @@ class TrafficController:
         delay_ms: int = 10,
         iface: str = "eth0",
     ):
-        self.clear(node, iface=iface)
-
-        self._exec(
+        self.apply(
             node,
-            [
-                "qdisc",
-                "add",
-                "dev",
-                iface,
-                "root",
-                "netem",
-                "delay",
-                f"{delay_ms}ms",
-                "reorder",
-                f"{percent}%",
-                f"{correlation}%",
-            ],
+            [self.root_qdisc(iface, "netem", "delay", f"{delay_ms}ms", "reorder", f"{percent}%", f"{correlation}%")],
             iface=iface,
         )
+
+
+@dataclass
+class LinkConditions:
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    loss: float = 0
+    rate: Optional[str] = None
+
+    @classmethod
+    def of(cls, conditions):
+        if conditions is None or isinstance(conditions, cls):
+            return conditions
+        return cls(**conditions)
+
+    def netem_args(self) -> list[str]:
+        args = []
+        if self.latency_ms or self.jitter_ms:
+            args += ["delay", f"{self.latency_ms}ms"] + ([f"{self.jitter_ms}ms"] if self.jitter_ms else [])
+        if self.loss:
+            args += ["loss", f"{self.loss}%"]
+        return args
+
+    def is_noop(self):
+        return not self.netem_args() and not self.rate
+
+
+def _to_ms(value, unit):
+    return float(value) * {"us": 0.001, "ms": 1, "s": 1000}[unit]
+
+
+class LinkMatrixEmulator:
+    """
+    Emulates different network conditions between every pair of nodes on one docker host. On each node the egress
+    of the interface holding its waku network IP (or `iface` when given) gets an HTB root with one class per
+    impaired peer, a netem child qdisc with that link's latency, jitter and loss, and a u32 filter sending the
+    packets to the peer's IP (`_ext_ip`) into that class. Traffic to anything else stays in the unshaped default
+    class, and the REST API calls from the tests go through another interface anyway.
+    """
+
+    DEFAULT_CLASS = "ffff"
+
+    def __init__(self, traffic_controller=None, iface: Optional[str] = None, default_rate: str = "10gbit"):
+        self._tc = traffic_controller or TrafficController()
+        self._iface = iface
+        self._default_rate = default_rate
+        # node -> {peer ip: (class minor, LinkConditions)} of the last applied matrix
+        self._applied = {}
+
+    @staticmethod
+    def _minor(peer_index):
+        return f"{peer_index + 0x10:x}"
+
+    def _node_commands(self, index, nodes, row):
+        iface = self._iface or self._tc.peer_iface(nodes[index])
+        commands = [
+            ["qdisc", "del", "dev", iface, "root"],
+            ["qdisc", "add", "dev", iface, "root", "handle", "1:", "htb", "default", self.DEFAULT_CLASS],
+            ["class", "add", "dev", iface, "parent", "1:", "classid", f"1:{self.DEFAULT_CLASS}", "htb", "rate", self._default_rate],
+        ]
+        links = {}
+        for peer_index, peer in enumerate(nodes):
+            conditions = LinkConditions.of(row[peer_index])
+            if peer_index == index or conditions is None or conditions.is_noop():
+                continue
+            minor = self._minor(peer_index)
+            rate = conditions.rate or self._default_rate
+            commands.append(["class", "add", "dev", iface, "parent", "1:", "classid", f"1:{minor}", "htb", "rate", rate, "ceil", rate])
+            if conditions.netem_args():
+                commands.append(["qdisc", "add", "dev", iface, "parent", f"1:{minor}", "handle", f"{minor}:", "netem"] + conditions.netem_args())
+            commands.append(
+                [
+                    "filter",
+                    "add",
+                    "dev",
+                    iface,
+                    "protocol",
+                    "ip",
+                    "parent",
+                    "1:",
+                    "prio",
+                    "1",
+                    "u32",
+                    "match",
+                    "ip",
+                    "dst",
+                    f"{peer._ext_ip}/32",
+                    "flowid",
+                    f"1:{minor}",
+                ]
+            )
+            links[peer._ext_ip] = (minor, conditions)
+        return commands, links
+
+    def apply(self, nodes, matrix, verify: bool = True):
+        """
+        matrix[i][j] holds the conditions of the traffic sent by nodes[i] to nodes[j], as LinkConditions, a dict of
+        its fields or None for an unimpaired link. The diagonal is ignored. All nodes are programmed concurrently.
+        """
+        assert len(matrix) == len(nodes) and all(len(row) == len(nodes) for row in matrix), "Link matrix must be N x N for N nodes"
+        node_commands = {}
+        for index, node in enumerate(nodes):
+            node_commands[node], self._applied[node] = self._node_commands(index, nodes, matrix[index])
+        self._tc.apply_bulk(node_commands, iface=self._iface)
+        if verify:
+            return self.verify(nodes)
+
+    def link_stats(self, node):
+        """{peer ip: {"delay_ms", "loss", "sent_packets", "dropped"}} read back from `tc -s` on the node."""
+        iface = self._iface or self._tc.peer_iface(node)
+        output = self._tc.apply(node, [["filter", "show", "dev", iface]], iface=iface)
+        flow_by_ip = {}
+        flowid = None
+        for line in output.splitlines():
+            flow_match = re.search(r"flowid 1:([0-9a-f]+)", line)
+            if flow_match:
+                flowid = flow_match.group(1)
+            ip_match = re.search(r"match ([0-9a-f]{8})/ffffffff at 16", line)
+            if ip_match and flowid:
+                flow_by_ip[str(ipaddress.IPv4Address(int(ip_match.group(1), 16)))] = flowid
+        netem = {}
+        lines = output.splitlines()
+        for position, line in enumerate(lines):
+            qdisc_match = re.search(r"qdisc netem ([0-9a-f]+): parent 1:([0-9a-f]+)", line)
+            if not qdisc_match:
+                continue
+            delay = re.search(r"delay (\d+(?:\.\d+)?)(us|ms|s)", line)
+            loss = re.search(r"loss (\d+(?:\.\d+)?)%", line)
+            sent = re.search(r"Sent \d+ bytes (\d+) pkt \(dropped (\d+)", lines[position + 1]) if position + 1 < len(lines) else None
+            netem[qdisc_match.group(2)] = {
+                "delay_ms": _to_ms(*delay.groups()) if delay else 0.0,
+                "loss": float(loss.group(1)) if loss else 0.0,
+                "sent_packets": int(sent.group(1)) if sent else None,
+                "dropped": int(sent.group(2)) if sent else None,
+            }
+        return {ip: netem.get(minor, {"delay_ms": 0.0, "loss": 0.0, "sent_packets": None, "dropped": None}) for ip, minor in flow_by_ip.items()}
+
+    def verify(self, nodes):
+        """Checks through `tc -s` that every node has the filters and netem settings of the applied matrix."""
+        stats = {}
+        errors = []
+        with ThreadPoolExecutor(max_workers=min(8, len(nodes))) as executor:
+            for node, node_stats in zip(nodes, executor.map(self.link_stats, nodes)):
+                stats[node] = node_stats
+                for peer_ip, (minor, conditions) in self._applied.get(node, {}).items():
+                    actual = node_stats.get(peer_ip)
+                    if actual is None:
+                        errors.append(f"{node._ext_ip} has no filter for {peer_ip}")
+                        continue
+                    if abs(actual["delay_ms"] - conditions.latency_ms) > 0.5 or abs(actual["loss"] - conditions.loss) > 0.01:
+                        errors.append(f"{node._ext_ip} -> {peer_ip} expected {conditions} but tc reports {actual}")
+        assert not errors, "Link matrix was not applied as expected:\n" + "\n".join(errors)
+        return stats
+
+    def clear(self, nodes):
+        self._tc.clear_bulk(nodes, iface=self._iface)
+        for node in nodes:
+            self._applied.pop(node, None)
+
+
+@dataclass
+class ImpairmentChange:
+    """One entry of a scenario timeline: at `at` seconds after the start, `action` is applied to the nodes (indexes)."""
+
+    at: float
+    action: str
+    nodes: Optional[list] = None
+    params: dict = field(default_factory=dict)
+
+    @classmethod
+    def of(cls, change):
+        if isinstance(change, cls):
+            return change
+        change = dict(change)
+        return cls(at=change.pop("at"), action=change.pop("action"), nodes=change.pop("nodes", None), params=change)
+
+
+@dataclass
+class AppliedChange:
+    change: ImpairmentChange
+    scheduled_at: float
+    applied_at: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def lag(self):
+        return None if self.applied_at is None else round(self.applied_at - self.scheduled_at, 6)
+
+
+def ramp(action, nodes, start, end, duration, steps, at=0.0, param="ms"):
+    """Timeline entries moving `param` of `action` from start to end in equal steps over duration seconds."""
+    return [
+        {
+            "at": round(at + duration * step / max(steps - 1, 1), 6),
+            "action": action,
+            "nodes": nodes,
+            param: round(start + (end - start) * step / max(steps - 1, 1), 3),
+        }
+        for step in range(steps)
+    ]
+
+
+class ImpairmentScheduler:
+    """
+    Runs a timeline of network impairment changes in a background thread while the test keeps publishing and
+    measuring. The timeline is plain data, e.g.:
+
+        [
+            {"at": 0, "action": "latency", "nodes": [1], "ms": 100},
+            {"at": 10, "action": "loss", "nodes": [1, 2], "percent": 30},
+            {"at": 20, "action": "partition", "groups": [[0, 1], [2, 3]]},
+            {"at": 40, "action": "heal"},
+        ]
+
+    where nodes are indexes in the scheduler's node list (all nodes when omitted). Every change replaces the
+    impairment the nodes had before. tc changes shape the interface carrying the traffic between the nodes (or
+    `iface` when given), partitions are iptables rules set by a NetworkPartitioner. The moment each change was
+    actually in place is recorded, so delivery and latency measurements can be matched with the network state at
+    that time (see `state_at`).
+    """
+
+    def __init__(self, nodes, timeline, traffic_controller=None, iface: Optional[str] = None, clear_on_finish: bool = True):
+        self._nodes = list(nodes)
+        self._tc = traffic_controller or TrafficController()
+        self._matrix = LinkMatrixEmulator(self._tc, iface=iface)
+        self._partitioner = NetworkPartitioner(self._tc)
+        self._iface = iface
+        self._clear_on_finish = clear_on_finish
+        self.timeline = sorted((ImpairmentChange.of(change) for change in timeline), key=lambda change: change.at)
+        for change in self.timeline:
+            if not hasattr(self, f"_do_{change.action}"):
+                raise ValueError(f"Unknown impairment action '{change.action}'")
+        self.applied = []
+        self.started_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _targets(self, change):
+        return self._nodes if change.nodes is None else [self._nodes[index] for index in change.nodes]
+
+    def _apply_root_qdisc(self, nodes, *qdisc):
+        self._tc.apply_bulk({node: [self._tc.root_qdisc(self._iface or self._tc.peer_iface(node), *qdisc)] for node in nodes}, iface=self._iface)
+
+    def _do_latency(self, nodes, ms, jitter_ms=0):
+        self._apply_root_qdisc(nodes, "netem", "delay", f"{ms}ms", *([f"{jitter_ms}ms"] if jitter_ms else []))
+
+    def _do_loss(self, nodes, percent, correlation=None):
+        self._apply_root_qdisc(nodes, "netem", "loss", f"{percent}%", *([f"{correlation}%"] if correlation is not None else []))
+
+    def _do_bandwidth(self, nodes, rate):
+        self._apply_root_qdisc(nodes, "tbf", "rate", rate, "burst", "32kbit", "limit", "12500")
+
+    def _do_matrix(self, nodes, matrix):
+        self._matrix.apply(nodes, matrix, verify=False)
+
+    def _do_partition(self, nodes, groups):
+        """Drops all traffic between nodes of different groups (indexes), nodes in no group keep talking to everyone."""
+        self._partitioner.partition([[self._nodes[index] for index in group] for group in groups])
+
+    def _do_heal(self, nodes):
+        self._partitioner.heal()
+
+    def _do_clear(self, nodes):
+        """Removes the tc impairments of the nodes and heals a partition."""
+        self._tc.clear_bulk(nodes, iface=self._iface)
+        if self._partitioner.partitioned_at and self._partitioner.healed_at is None:
+            self._partitioner.heal()
+
+    def _run(self):
+        for change in self.timeline:
+            scheduled_at = self.started_at + change.at
+            if self._stop.wait(max(0.0, scheduled_at - time())):
+                break
+            record = AppliedChange(change=change, scheduled_at=scheduled_at)
+            try:
+                getattr(self, f"_do_{change.action}")(self._targets(change), **change.params)
+                record.applied_at = time()
+                logger.info(
+                    f"Impairment '{change.action}' {change.params} applied on nodes {change.nodes} at +{record.applied_at - self.started_at:.3f}s"
+                )
+            except Exception as ex:
+                record.error = str(ex)
+                logger.error(f"Impairment '{change.action}' {change.params} failed: {ex}")
+            self.applied.append(record)
+        ended_clear = bool(self.applied) and self.applied[-1].change.action == "clear" and self.applied[-1].change.nodes is None
+        if self._clear_on_finish and not ended_clear:
+            try:
+                self._do_clear(self._nodes)
+            except Exception as ex:
+                logger.error(f"Clearing the impairments at the end of the scenario failed: {ex}")
+
+    def start(self):
+        self.started_at = time()
+        self._thread = threading.Thread(target=self._run, name="impairment-scheduler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.wait()
+
+    def wait(self, timeout=None):
+        """Blocks until the timeline is done, then raises if any change could not be applied."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        errors = [f"{record.change.action} at +{record.change.at}s: {record.error}" for record in self.applied if record.error]
+        assert not errors, "Some impairment changes failed:\n" + "\n".join(errors)
+        return self.applied
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def state_at(self, timestamp):
+        """The last change in place at a given time() per node index, to label measurements taken meanwhile."""
+        state = {}
+        for record in self.applied:
+            if record.applied_at is None or record.applied_at > timestamp:
+                continue
+            for index in range(len(self._nodes)) if record.change.nodes is None else record.change.nodes:
+                state[index] = record.change
+        return state
+
+    def intervals(self):
+        """[(start, end, change)] of the applied changes, end being when the next change took effect."""
+        records = [record for record in self.applied if record.applied_at is not None]
+        ends = [record.applied_at for record in records[1:]] + [None]
+        return [(record.applied_at, end, record.change) for record, end in zip(records, ends)]
+
+
+class NetworkPartitioner:
+    """
+    Splits a cluster into groups that can't reach each other and heals it again, with iptables rules in the
+    nodes' network namespaces (entered like TrafficController does). Every node drops the packets from and to the
+    IPs of the nodes outside its group in a dedicated chain, so the REST API and the traffic inside a group are not
+    affected and healing only has to flush that chain. The times the split and the heal took effect are kept to
+    measure the recovery against.
+    """
+
+    CHAIN = "WAKU_PARTITION"
+
+    def __init__(self, traffic_controller=None, reject: bool = False):
+        self._tc = traffic_controller or TrafficController()
+        # DROP models a silent split (connections time out), REJECT makes the peers notice it right away
+        self._target = "REJECT" if reject else "DROP"
+        self._nodes = []
+        self.partitioned_at = None
+        self.healed_at = None
+
+    def _rules_script(self, blocked_ips):
+        chain = self.CHAIN
+        lines = [
+            f"iptables -w -N {chain} 2>/dev/null || true",
+            f"iptables -w -F {chain}",
+            f"iptables -w -C INPUT -j {chain} 2>/dev/null || iptables -w -I INPUT -j {chain}",
+            f"iptables -w -C OUTPUT -j {chain} 2>/dev/null || iptables -w -I OUTPUT -j {chain}",
+        ]
+        for ip in blocked_ips:
+            lines.append(f"iptables -w -A {chain} -s {ip} -j {self._target}")
+            lines.append(f"iptables -w -A {chain} -d {ip} -j {self._target}")
+        return "set -e\n" + "\n".join(lines) + "\n"
+
+    def _run_script(self, node, script):
+        res, cmd = self._tc.run_in_netns(node, ["sh", "-s"], stdin=script)
+        if res.returncode != 0:
+            raise RuntimeError(f"iptables failed: {' '.join(cmd)}\n" f"script: {script}\n" f"stdout: {res.stdout}\n" f"stderr: {res.stderr}")
+
+    def _on_all(self, node_scripts, max_workers: int = 8):
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(node_scripts))) as executor:
+            for future in [executor.submit(self._run_script, node, script) for node, script in node_scripts.items()]:
+                future.result()
+
+    def partition(self, groups):
+        """groups is a list of node lists; nodes of different groups can't reach each other afterwards."""
+        node_scripts = {}
+        for group_index, group in enumerate(groups):
+            blocked_ips = [node._ext_ip for other_index, other in enumerate(groups) if other_index != group_index for node in other]
+            for node in group:
+                node_scripts[node] = self._rules_script(blocked_ips)
+        self._on_all(node_scripts)
+        self._nodes = list(node_scripts)
+        self.partitioned_at = time()
+        self.healed_at = None
+        logger.info(f"Network split into groups {[[node._ext_ip for node in group] for group in groups]}")
+        return self.partitioned_at
+
+    def heal(self):
+        if self._nodes:
+            self._on_all({node: f"iptables -w -F {self.CHAIN} 2>/dev/null || true\n" for node in self._nodes})
+        self.healed_at = time()
+        logger.info(f"Network partition healed after {self.healed_at - (self.partitioned_at or self.healed_at):.3f}s")
+        return self.healed_at
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self._nodes and self.healed_at is None:
+            self.heal()
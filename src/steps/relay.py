@@ -10,6 +10,8 @@ from src.env_vars import (
     NODE_2,
     ADDITIONAL_NODES,
 )
+from src.node.async_waku_node import gather_on_nodes
+from src.node.cluster_builder import ClusterBuilder, NodeSpec
 from src.node.waku_node import WakuNode
 from tenacity import retry, stop_after_delay, wait_fixed
 from src.steps.common import StepsCommon
@@ -48,11 +50,7 @@ class StepsRelay(StepsCommon):
             nodes = [node.strip() for node in ADDITIONAL_NODES.split(",")]
         else:
             pytest.skip("ADDITIONAL_NODES is empty, cannot run test")
-        for index, node in enumerate(nodes):
-            node = WakuNode(node, f"node{index + 3}_{request.cls.test_id}")
-            node.start(relay="true", discv5_bootstrap_node=self.enr_uri)
-            self.add_node_peer(node, [self.multiaddr_with_id])
-            self.optional_nodes.append(node)
+        self.optional_nodes.extend(self.start_nodes_bootstrapped_from_node1(nodes))
 
     @pytest.fixture(scope="function")
     def subscribe_main_relay_nodes(self):
@@ -119,9 +117,12 @@ class StepsRelay(StepsCommon):
 
         sender.send_relay_message(message, pubsub_topic)
         delay(message_propagation_delay)
-        for index, peer in enumerate(peer_list):
+        # all peers are queried at once, the responses are then checked in peer order
+        responses = gather_on_nodes(peer_list, lambda peer: peer.get_relay_messages(pubsub_topic), return_exceptions=True)
+        for index, (peer, get_messages_response) in enumerate(zip(peer_list, responses)):
             logger.debug(f"Checking that peer NODE_{index + 1}:{peer.image} can find the published message")
-            get_messages_response = peer.get_relay_messages(pubsub_topic)
+            if isinstance(get_messages_response, Exception):
+                raise get_messages_response
             assert get_messages_response, f"Peer NODE_{index + 1}:{peer.image} couldn't find any messages"
             assert len(get_messages_response) == 1, f"Expected 1 message but got {len(get_messages_response)}"
             waku_message = WakuMessage(get_messages_response)
@@ -149,13 +150,11 @@ class StepsRelay(StepsCommon):
 
     @allure.step
     def ensure_relay_subscriptions_on_nodes(self, node_list, pubsub_topic_list):
-        for node in node_list:
-            node.set_relay_subscriptions(pubsub_topic_list)
+        gather_on_nodes(node_list, lambda node: node.set_relay_subscriptions(pubsub_topic_list))
 
     @allure.step
     def delete_relay_subscriptions_on_nodes(self, node_list, pubsub_topic_list):
-        for node in node_list:
-            node.delete_relay_subscriptions(pubsub_topic_list)
+        gather_on_nodes(node_list, lambda node: node.delete_relay_subscriptions(pubsub_topic_list))
 
     @allure.step
     @retry(stop=stop_after_delay(120), wait=wait_fixed(1), reraise=True)
@@ -163,6 +162,31 @@ class StepsRelay(StepsCommon):
         self.ensure_relay_subscriptions_on_nodes(node_list, pubsub_topic_list)
         self.check_published_message_reaches_relay_peer()
 
+    @allure.step
+    def wait_for_mesh_recovery(self, groups, shard, since=None, timeout=120, poll_interval=0.5):
+        """
+        Waits until the gossipsub mesh of every node on the shard has a peer from another group again (e.g. after a
+        partition healed) and returns the seconds it took since `since`.
+        """
+        start = time() if since is None else since
+        nodes = [node for group in groups for node in group]
+        group_of = {node.get_id(): group_index for group_index, group in enumerate(groups) for node in group}
+        while True:
+            responses = gather_on_nodes(nodes, lambda node: node.get_mesh_peers_on_shard(shard), return_exceptions=True)
+            isolated = []
+            for node, mesh in zip(nodes, responses):
+                mesh_groups = (
+                    set() if isinstance(mesh, Exception) else {group_of.get(peer["multiaddr"].split("/")[-1]) for peer in mesh.get("peers", [])}
+                )
+                if not mesh_groups - {group_of[node.get_id()], None}:
+                    isolated.append(node)
+            if not isolated:
+                recovery = round(time() - start, 3)
+                logger.info(f"Mesh on shard {shard} recovered across all groups after {recovery}s")
+                return recovery
+            assert time() - start < timeout, f"Mesh of {[node.image for node in isolated]} still has no peer from another group after {timeout}s"
+            delay(poll_interval)
+
     @allure.step
     def setup_main_nodes(self, **kwargs):
         self.node1 = WakuNode(NODE_1, f"node1_{self.test_id}")
@@ -180,8 +204,14 @@ class StepsRelay(StepsCommon):
             nodes = [node.strip() for node in ADDITIONAL_NODES.split(",")]
         else:
             pytest.skip("ADDITIONAL_NODES is empty, cannot run test")
-        for index, node in enumerate(nodes):
-            node = WakuNode(node, f"node{index + 3}_{self.test_id}")
-            node.start(relay="true", discv5_bootstrap_node=self.enr_uri, **kwargs)
-            self.add_node_peer(node, [self.multiaddr_with_id])
-            self.optional_nodes.append(node)
+        self.optional_nodes.extend(self.start_nodes_bootstrapped_from_node1(nodes, **kwargs))
+
+    # starts the nodes in parallel, each one bootstraps from node1 and is connected to it
+    @allure.step
+    def start_nodes_bootstrapped_from_node1(self, images, first_index=3, **kwargs):
+        specs = [
+            NodeSpec(name=f"node{index + first_index}", image=image, start_args={"relay": "true", **kwargs}, bootstrap="node1", peers=["node1"])
+            for index, image in enumerate(images)
+        ]
+        cluster = ClusterBuilder(specs, log_suffix=self.test_id, existing_nodes={"node1": self.node1}).build()
+        return [cluster[spec.name] for spec in specs]
@@ -1,11 +1,14 @@
 import inspect
+from time import time
 
 import requests
 
 from src.libs.custom_logger import get_custom_logger
+from src.libs.message_hasher import get_message_hasher
+from src.libs.message_ledger import MessageLedger
 import pytest
 import allure
-from src.libs.common import delay
+from src.libs.common import delay, to_base64
 from src.node.store_response import StoreResponse
 from src.node.waku_message import WakuMessage
 from src.env_vars import (
@@ -13,6 +16,11 @@ from src.env_vars import (
     NODE_1,
     NODE_2,
 )
+from src.node.async_waku_node import gather_on_nodes
+from src.node.bulk_publisher import BulkPublisher
+from src.node.cluster_builder import ClusterBuilder, NodeSpec
+from src.node.image_cache import get_image_cache
+from src.node.store_snapshot import get_store_snapshots
 from src.node.waku_node import WakuNode
 from src.steps.common import StepsCommon
 from src.test_data import VALID_PUBSUB_TOPICS
@@ -95,10 +103,20 @@ class StepsStore(StepsCommon):
             nodes = [node.strip() for node in node_list.split(",") if node]
         else:
             pytest.skip("ADDITIONAL_NODES/node_list is empty, cannot run test")
-        self.additional_store_nodes = []
-        for index, node in enumerate(nodes):
-            node = self.setup_store_node(node, node_index=index + 2, store="true", relay="false", **kwargs)
-            self.additional_store_nodes.append(node)
+        # all additional store nodes only depend on already running nodes, so they are started in parallel
+        specs = [
+            NodeSpec(
+                name=f"store_node{index + 2}",
+                image=image,
+                start_args={"discv5_bootstrap_node": self.enr_uri, "storenode": self.multiaddr_list[0], "store": "true", "relay": "false", **kwargs},
+            )
+            for index, image in enumerate(nodes)
+        ]
+        cluster = ClusterBuilder(specs, log_suffix=self.test_id).build()
+        self.additional_store_nodes = [cluster[spec.name] for spec in specs]
+        for node in self.additional_store_nodes:
+            self.store_nodes.append(node)
+            self.add_node_peer(node, self.multiaddr_list)
 
     @allure.step
     def subscribe_to_pubsub_topics_via_relay(self, node=None, pubsub_topics=None):
@@ -137,6 +155,67 @@ class StepsStore(StepsCommon):
         delay(message_propagation_delay)
         return self.message
 
+    @allure.step
+    def publish_messages_bulk(self, count, via="relay", pubsub_topic=None, sender=None, rate=None, workers=8, mode="closed", message_factory=None):
+        if pubsub_topic is None:
+            pubsub_topic = self.test_pubsub_topic
+        if not sender:
+            sender = self.publishing_node1
+        last_timestamp = {"value": 0}
+
+        def build(index):
+            if message_factory is None:
+                message = self.build_message(payload=to_base64(f"Message_{index}"))
+            else:
+                message = message_factory(index)
+            # store returns messages ordered by timestamp, strictly increasing timestamps keep that order equal to the index order
+            message["timestamp"] = max(int(message["timestamp"]), last_timestamp["value"] + 1)
+            last_timestamp["value"] = message["timestamp"]
+            return message
+
+        publisher = BulkPublisher(sender, pubsub_topic, via=via, rate=rate, workers=workers, mode=mode)
+        ledger = publisher.publish(count, build)
+        ledger.compute_hashes(lambda messages: self.compute_message_hashes(pubsub_topic, messages, hash_type="hex"))
+        return ledger
+
+    def seed_store_database(self, seed_spec, image, db_kwargs):
+        """Fills the database given by db_kwargs through a relay publisher and a store node, returns the stored ledger."""
+        publisher = WakuNode(NODE_1, f"seed_publisher_{self.test_id}")
+        publisher.start(relay="true")
+        seeder = WakuNode(image, f"seed_store_{self.test_id}")
+        seeder.start(relay="true", store="true", discv5_bootstrap_node=publisher.get_enr_uri(), **db_kwargs)
+        self.add_node_peer(seeder, [publisher.get_multiaddr_with_id()])
+        for node in (publisher, seeder):
+            node.set_relay_subscriptions([seed_spec.pubsub_topic])
+        ledger = self.publish_messages_bulk(seed_spec.count, pubsub_topic=seed_spec.pubsub_topic, sender=publisher, message_factory=seed_spec.message)
+        assert not ledger.failures(), f"Failed to seed {len(ledger.failures())} messages, first error: {ledger.failures()[0].error}"
+        expected_ledger = ledger.message_ledger()
+        self.wait_for_store_backfill(seeder, expected_ledger, pubsub_topic=seed_spec.pubsub_topic, page_size=100)
+        # a clean shutdown leaves a consistent database behind
+        seeder.stop()
+        publisher.stop()
+        return expected_ledger
+
+    @allure.step
+    def setup_seeded_store_node(self, seed_spec, image=NODE_2, pg_container=None, **kwargs):
+        """
+        Starts a store node on a copy of the database described by seed_spec, built on first use and then reused
+        by every test and run asking for the same spec and image. Returns the node and the ledger of its messages.
+        """
+        snapshots = get_store_snapshots()
+        snapshot = snapshots.get_or_build(
+            seed_spec,
+            lambda db_kwargs: self.seed_store_database(seed_spec, image, db_kwargs),
+            image_digest=get_image_cache().digest(image),
+            pg_container=pg_container,
+        )
+        db_kwargs = snapshots.restore(snapshot, pg_container=pg_container)
+        node = WakuNode(image, f"seeded_store_node{len(self.store_nodes) + 1}_{self.test_id}")
+        node.start(relay="true", store="true", **db_kwargs, **kwargs)
+        node.set_relay_subscriptions([seed_spec.pubsub_topic])
+        self.store_nodes.append(node)
+        return node, snapshot.ledger
+
     @retry(stop=stop_after_delay(30), wait=wait_fixed(1), reraise=True)
     @allure.step
     def get_messages_from_store_with_retry(self, node):
@@ -175,6 +254,55 @@ class StepsStore(StepsCommon):
             store_v=store_v,
             **kwargs,
         )
+        return self.wrap_store_response(store_response, node)
+
+    def iter_store_pages(self, node, pubsub_topic=None, page_size=100, ascending="true", prefetch=True, **kwargs):
+        if pubsub_topic is None:
+            pubsub_topic = self.test_pubsub_topic
+        for page in node.iter_store_pages(prefetch=prefetch, pubsub_topic=pubsub_topic, page_size=page_size, ascending=ascending, **kwargs):
+            yield self.wrap_store_response(page, node)
+
+    def iter_store_messages(self, node, **kwargs):
+        for store_response in self.iter_store_pages(node, **kwargs):
+            yield from store_response.messages or []
+
+    @allure.step
+    def get_store_message_hashes(self, node, **kwargs):
+        hashes = []
+        for store_response in self.iter_store_pages(node, **kwargs):
+            hashes.extend(store_response.message_hash(index) for index in range(len(store_response.messages or [])))
+        return hashes
+
+    @allure.step
+    def get_store_ledger(self, node, **kwargs):
+        ledger = MessageLedger()
+        for store_response in self.iter_store_pages(node, **kwargs):
+            ledger.extend(store_response.message_hash(index) for index in range(len(store_response.messages or [])))
+        return ledger
+
+    @allure.step
+    def check_store_matches_ledger(self, node, expected_ledger, check_order=True, **kwargs):
+        report = expected_ledger.compare(self.get_store_ledger(node, **kwargs), check_order=check_order)
+        assert report.ok, f"Store of {node.image} doesn't match the published messages: {report}"
+        return report
+
+    @allure.step
+    def wait_for_store_backfill(self, node, expected_ledger, since=None, timeout=120, poll_interval=1, **kwargs):
+        """
+        Waits until the store of a node has every message of the expected ledger (e.g. the ones published on the
+        other side of a partition, backfilled by store sync) and returns the seconds it took since `since`.
+        """
+        start = time() if since is None else since
+        while True:
+            report = expected_ledger.compare(self.get_store_ledger(node, **kwargs), check_order=False)
+            if not report.missing:
+                backfill = round(time() - start, 3)
+                logger.info(f"Store of {node.image} has all {report.expected_count} messages after {backfill}s")
+                return backfill
+            assert time() - start < timeout, f"Store of {node.image} still misses {len(report.missing)} messages after {timeout}s"
+            delay(poll_interval)
+
+    def wrap_store_response(self, store_response, node):
         store_response = StoreResponse(store_response, node)
         assert store_response.request_id is not None, "Request id is missing"
         assert store_response.status_code, "Status code is missing"
@@ -207,23 +335,27 @@ class StepsStore(StepsCommon):
             store_node = self.store_nodes
         elif not isinstance(store_node, list):
             store_node = [store_node]
-        for node in store_node:
+        query = dict(
+            peer_addr=peer_addr,
+            include_data=include_data,
+            pubsub_topic=pubsub_topic,
+            content_topics=content_topics,
+            start_time=start_time,
+            end_time=end_time,
+            hashes=hashes,
+            cursor=cursor,
+            page_size=page_size,
+            ascending=ascending,
+            store_v=store_v,
+            **kwargs,
+        )
+        # all store nodes are queried at once, the responses are then checked node by node
+        responses = gather_on_nodes(store_node, lambda node: node.get_store_messages(**query), return_exceptions=True)
+        for node, raw_response in zip(store_node, responses):
             logger.debug(f"Checking that peer {node.image} can find the stored messages")
-            self.store_response = self.get_messages_from_store(
-                node=node,
-                peer_addr=peer_addr,
-                include_data=include_data,
-                pubsub_topic=pubsub_topic,
-                content_topics=content_topics,
-                start_time=start_time,
-                end_time=end_time,
-                hashes=hashes,
-                cursor=cursor,
-                page_size=page_size,
-                ascending=ascending,
-                store_v=store_v,
-                **kwargs,
-            )
+            if isinstance(raw_response, Exception):
+                raise raw_response
+            self.store_response = self.wrap_store_response(raw_response, node)
 
             logger.debug(f"messages length is {len(self.store_response.messages)}")
             assert self.store_response.messages, f"Peer {node.image} couldn't find any messages. Actual response: {self.store_response.resp_json}"
@@ -237,14 +369,16 @@ class StepsStore(StepsCommon):
             else:
                 indices = range(len(messages_to_check))  # Use corresponding indices for multiple messages
 
+            if store_v != "v1":
+                expected_hashes = get_message_hasher().hash_batch(pubsub_topic, messages_to_check, hash_type="hex" if node.is_nwaku() else "base64")
+
             # Iterate through messages_to_check and their respective indices
-            for idx, message_to_check in zip(indices, messages_to_check):
+            for position, (idx, message_to_check) in enumerate(zip(indices, messages_to_check)):
                 if store_v == "v1":
                     waku_message = WakuMessage([self.store_response.messages[idx]])
                     waku_message.assert_received_message(message_to_check)
                 else:
-                    hash_type = "hex" if node.is_nwaku() else "base64"
-                    expected_hash = self.compute_message_hash(pubsub_topic, message_to_check, hash_type=hash_type)
+                    expected_hash = expected_hashes[position]
                     actual_hash = self.store_response.message_hash(idx)
                     assert (
                         expected_hash == actual_hash
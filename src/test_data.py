@@ -194,6 +194,27 @@ LOG_ERROR_KEYWORDS = [
     "double free",
 ]
 
+# every pattern has to show up in the node log before the readiness waiter confirms the node through /health
+NODE_READY_LOG_PATTERNS = [
+    r"Starting REST HTTP server|REST service started",
+    r"Node started successfully|Node setup complete",
+]
+
+# message lifecycle events, as the log statements of nwaku: WakuNode.publish, WakuRelay.logMessageInfo (one line per
+# peer a message is received from or sent to), WakuArchive.handleMessage, the filter v2 push and the lightpush handler.
+# Successful validation isn't logged with the hash, so there is no validated event
+MESSAGE_LIFECYCLE_EVENTS = {
+    "published": r"start publish Waku message|waku\.relay published",
+    "received": r"received relay message",
+    "relayed": r"sent relay message",
+    "archived": r"message archived",
+    "filter_pushed": r"pushing message to subscribed peers",
+    "lightpushed": r"handling lightpush request",
+}
+MESSAGE_HASH_LOG_PATTERN = r"msg_hash=\"?(0x[0-9a-fA-F]{64})"
+# chronicles textlines timestamp, e.g. "TRC 2024-05-14 10:22:31.123+00:00 ..."
+LOG_TIMESTAMP_PATTERN = r"^[A-Z]{3} (\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d+[+-]\d{2}:\d{2})"
+
 METRICS_WITH_INITIAL_VALUE_ZERO = [
     "libp2p_peers",
     "libp2p_failed_upgrades_incoming_total",
@@ -3,6 +3,7 @@ import inspect
 import glob
 from src.libs.custom_logger import get_custom_logger
 import os
+import allure
 import pytest
 from datetime import datetime
 from time import time
@@ -10,6 +11,12 @@ from uuid import uuid4
 from src.libs.common import attach_allure_file
 import src.env_vars as env_vars
 from src.data_storage import DS
+from src.node.message_timeline import MessageTimeline
+from src.node.metrics_sampler import MetricsSampler
+from src.node.container_registry import get_container_registry
+from src.node.image_cache import get_image_cache
+from src.node.node_pool import NodePool
+from src.node.resource_allocator import get_allocator
 from src.postgres_setup import start_postgres, stop_postgres
 
 logger = get_custom_logger(__name__)
@@ -26,6 +33,22 @@ def pytest_runtest_makereport(item):
     return None
 
 
+def pytest_configure(config):
+    # xdist workers are spawned after this and inherit the environment, so all processes of the run share the id
+    if not hasattr(config, "workerinput"):
+        os.environ["TEST_SESSION_ID"] = env_vars.TEST_SESSION_ID
+
+
+def pytest_sessionstart(session):
+    # before the first test, so no test (and its timeout) pays for pulling an image
+    if session.config.option.collectonly:
+        return
+    try:
+        DS.image_digests = get_image_cache().prepare()
+    except Exception as ex:
+        logger.error(f"Image pre-pull failed, images will be pulled by the first node using them: {ex}")
+
+
 @pytest.fixture(scope="session", autouse=True)
 def set_allure_env_variables():
     yield
@@ -36,12 +59,61 @@ def set_allure_env_variables():
                 if attribute_name.isupper():
                     attribute_value = getattr(env_vars, attribute_name)
                     outfile.write(f"{attribute_name}={attribute_value}\n")
+            for image, digest in DS.image_digests.items():
+                outfile.write(f"DIGEST_{image.replace('/', '_').replace(':', '_')}={digest}\n")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def report_allocator_stats():
+    yield
+    logger.debug(f"Running fixture teardown: {inspect.currentframe().f_code.co_name}")
+    logger.info(f"Port/IP allocator avoided {get_allocator().avoided_collisions} colliding container launches")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def report_startup_timings():
+    yield
+    if not DS.startup_timings:
+        return
+    logger.debug(f"Running fixture teardown: {inspect.currentframe().f_code.co_name}")
+    phases = ["create", "network_connect", "first_log", "ready_log", "ready"]
+    averages = {}
+    for phase in phases:
+        values = [timings[phase] for timings in DS.startup_timings if phase in timings]
+        if values:
+            averages[phase] = round(sum(values) / len(values), 3)
+    logger.info(f"Average node startup phases over {len(DS.startup_timings)} starts (seconds since launch): {averages}")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def container_reaper():
+    # set up before the warm pool, so its teardown runs after the pool was closed
+    logger.debug(f"Running fixture setup: {inspect.currentframe().f_code.co_name}")
+    registry = get_container_registry()
+    registry.prune_orphans()
+    yield registry
+    logger.debug(f"Running fixture teardown: {inspect.currentframe().f_code.co_name}")
+    registry.reap(include_session_scoped=True)
+    logger.info(f"Concurrent container teardown saved {round(registry.saved_time, 1)} seconds over stopping nodes one by one")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def warm_node_pool():
+    if not env_vars.WARM_POOL_SIZE:
+        yield
+        return
+    logger.debug(f"Running fixture setup: {inspect.currentframe().f_code.co_name}")
+    DS.node_pool = NodePool(max_idle_per_key=env_vars.WARM_POOL_SIZE)
+    yield
+    logger.debug(f"Running fixture teardown: {inspect.currentframe().f_code.co_name}")
+    DS.node_pool.close()
+    DS.node_pool = None
 
 
 @pytest.fixture(scope="function", autouse=False)
 def start_postgres_container():
     pg_container = start_postgres()
-    yield
+    yield pg_container
     stop_postgres(pg_container)
 
 
@@ -81,17 +153,51 @@ def close_open_nodes(attach_logs_on_fail):
     DS.waku_nodes = []
     yield
     logger.debug(f"Running fixture teardown: {inspect.currentframe().f_code.co_name}")
+    registry = get_container_registry()
+    report = registry.stop_nodes(DS.waku_nodes, DS.node_pool.release if DS.node_pool else lambda node: node.stop())
     crashed_containers = []
-    for node in DS.waku_nodes:
-        try:
-            node.stop()
-        except Exception as ex:
-            if "No such container" in str(ex):
-                crashed_containers.append(node.image)
-            logger.error(f"Failed to stop container because of error {ex}")
+    for node, ex in report.errors.items():
+        if "No such container" in str(ex):
+            crashed_containers.append(node.image)
+        logger.error(f"Failed to stop container because of error {ex}")
+    # containers of nodes that never made it into DS.waku_nodes, e.g. because they failed to become ready
+    registry.reap()
     assert not crashed_containers, f"Containers {crashed_containers} crashed during the test!!!"
 
 
+@pytest.fixture(scope="function", autouse=True)
+def message_timeline():
+    if not env_vars.MESSAGE_TIMELINE_ENABLED:
+        yield None
+        return
+    DS.message_timeline = MessageTimeline().start()
+    yield DS.message_timeline
+    logger.debug(f"Running fixture teardown: {inspect.currentframe().f_code.co_name}")
+    DS.message_timeline.stop()
+    logger.debug(f"Message timeline recorded lifecycle events of {len(DS.message_timeline)} messages")
+    DS.message_timeline = None
+
+
+@pytest.fixture(scope="function", autouse=True)
+def metrics_sampler(request, close_open_nodes):
+    # depends on close_open_nodes so sampling stops before the nodes do
+    marker = request.node.get_closest_marker("sample_metrics")
+    interval = env_vars.METRICS_SAMPLING_INTERVAL
+    if marker:
+        interval = marker.kwargs.get("interval", interval or 5)
+    if not interval:
+        yield None
+        return
+    logger.debug(f"Running fixture setup: {inspect.currentframe().f_code.co_name}")
+    DS.metrics_sampler = MetricsSampler(interval, series_filter=env_vars.METRICS_SAMPLING_FILTER).start()
+    yield DS.metrics_sampler
+    logger.debug(f"Running fixture teardown: {inspect.currentframe().f_code.co_name}")
+    DS.metrics_sampler.stop()
+    csv_path = DS.metrics_sampler.write_csv(os.path.join(env_vars.DOCKER_LOG_DIR, f"metrics__{request.cls.test_id}.csv"))
+    allure.attach.file(csv_path, name=os.path.basename(csv_path), attachment_type=allure.attachment_type.CSV)
+    DS.metrics_sampler = None
+
+
 @pytest.fixture(scope="function", autouse=True)
 def check_waku_log_errors():
     yield
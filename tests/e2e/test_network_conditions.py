@@ -7,7 +7,7 @@ from src.node.waku_node import WakuNode
 from src.steps.relay import StepsRelay
 from src.libs.common import delay
 from src.steps.common import StepsCommon
-from src.steps.network_conditions import TrafficController
+from src.steps.network_conditions import ImpairmentScheduler, LinkMatrixEmulator, TrafficController, ramp
 from src.libs.common import to_base64
 
 logger = get_custom_logger(__name__)
@@ -740,15 +740,11 @@ class TestNetworkConditions(StepsRelay):
         logger.info("Waiting for autoconnection")
         self.wait_for_autoconnection([self.node1, self.node2], hard_wait=15)
         logger.info(f"Applying 100%% packet loss on both nodes ")
-        self.tc.clear(self.node1)
-        self.tc.clear(self.node2)
-        self.tc.add_packet_loss(self.node1, percent=100.0)
-        self.tc.add_packet_loss(self.node2, percent=100.0)
+        self.tc.add_packet_loss_bulk([self.node1, self.node2], percent=100.0)
 
         delay(5)
         logger.info("Clearing tc rules (restore connectivity)")
-        self.tc.clear(self.node1)
-        self.tc.clear(self.node2)
+        self.tc.clear_bulk([self.node1, self.node2])
 
         logger.info("Waiting for peer list recovery on both nodes")
         peers1 = 0
@@ -768,5 +764,75 @@ class TestNetworkConditions(StepsRelay):
         msgs = self.node2.get_relay_messages(self.test_pubsub_topic) or []
         assert len(msgs) >= msgs_count - 10, "Post-recovery message was not delivered"
         logger.info(f"{len(msgs)} messages were delivered")
-        self.tc.clear(self.node1)
-        self.tc.clear(self.node2)
+        self.tc.clear_bulk([self.node1, self.node2])
+
+    @pytest.mark.timeout(60 * 6)
+    def test_relay_3_nodes_per_link_latency_matrix(self):
+        self.node3 = WakuNode(NODE_2, f"node3_{self.test_id}")
+        nodes = [self.node1, self.node2, self.node3]
+
+        self.node1.start(relay="true")
+        self.node2.start(relay="true", discv5_bootstrap_node=self.node1.get_enr_uri())
+        self.node3.start(relay="true", discv5_bootstrap_node=self.node1.get_enr_uri())
+        for node in nodes:
+            node.set_relay_subscriptions([self.test_pubsub_topic])
+        self.wait_for_autoconnection(nodes, hard_wait=15)
+
+        logger.info("Slowing down only the links between node1 and node3")
+        emulator = LinkMatrixEmulator(self.tc)
+        slow_link = {"latency_ms": 2000}
+        matrix = [
+            [None, None, slow_link],
+            [None, None, None],
+            [slow_link, None, None],
+        ]
+        emulator.apply(nodes, matrix)
+
+        # the REST calls from the test don't go through the shaped classes, only the traffic between the nodes does
+        t0 = time()
+        self.node1.get_relay_messages(self.test_pubsub_topic)
+        assert time() - t0 < 1.5, "Traffic outside the matrix links should not be delayed"
+
+        self.node2.send_relay_message(self.create_message(), self.test_pubsub_topic)
+        delay(1)
+        assert self.node1.get_relay_messages(self.test_pubsub_topic), "node1 should receive over the unimpaired link"
+        assert self.node3.get_relay_messages(self.test_pubsub_topic), "node3 should receive over the unimpaired link"
+
+        stats = emulator.verify(nodes)
+        logger.info(f"Per link tc stats of node1: {stats[self.node1]}")
+        assert stats[self.node1][self.node3._ext_ip]["sent_packets"] > 0, "Traffic from node1 to node3 did not go through its link class"
+        emulator.clear(nodes)
+
+    @pytest.mark.timeout(60 * 6)
+    def test_relay_3_nodes_scheduled_impairments(self):
+        self.node3 = WakuNode(NODE_2, f"node3_{self.test_id}")
+        nodes = [self.node1, self.node2, self.node3]
+
+        self.node1.start(relay="true")
+        self.node2.start(relay="true", discv5_bootstrap_node=self.node1.get_enr_uri())
+        self.node3.start(relay="true", discv5_bootstrap_node=self.node1.get_enr_uri())
+        for node in nodes:
+            node.set_relay_subscriptions([self.test_pubsub_topic])
+        self.wait_for_autoconnection(nodes, hard_wait=15)
+
+        timeline = ramp("latency", [2], start=0, end=500, duration=10, steps=5) + [
+            {"at": 15, "action": "partition", "groups": [[0, 1], [2]]},
+            {"at": 30, "action": "heal"},
+            # keeps the scenario running for a while after the heal
+            {"at": 45, "action": "clear"},
+        ]
+        received_at = []
+        with ImpairmentScheduler(nodes, timeline, self.tc) as scheduler:
+            while scheduler.running:
+                self.node1.send_relay_message(self.create_message(), self.test_pubsub_topic)
+                delay(1)
+                if self.node3.get_relay_messages(self.test_pubsub_topic):
+                    received_at.append(time())
+        scheduler.wait()
+
+        assert [record.change.action for record in scheduler.applied] == ["latency"] * 5 + ["partition", "heal", "clear"]
+        partition_start, partition_end, _ = scheduler.intervals()[5]
+        during_partition = [timestamp for timestamp in received_at if partition_start + 2 < timestamp < partition_end]
+        logger.info(f"node3 received messages in {len(received_at)} polls, {len(during_partition)} of them while partitioned")
+        assert not during_partition, "node3 should not receive messages while partitioned from node1"
+        assert received_at and received_at[-1] > partition_end, "node3 should receive messages again after the heal"
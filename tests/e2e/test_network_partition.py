@@ -0,0 +1,66 @@
+import pytest
+from src.env_vars import NODE_1, NODE_2
+from src.libs.common import delay
+from src.libs.custom_logger import get_custom_logger
+from src.node.waku_node import WakuNode
+from src.steps.network_conditions import NetworkPartitioner
+from src.steps.relay import StepsRelay
+from src.steps.store import StepsStore
+
+logger = get_custom_logger(__name__)
+
+
+class TestNetworkPartition(StepsRelay, StepsStore):
+    @pytest.fixture(scope="function", autouse=True)
+    def setup_nodes(self):
+        self.node1 = WakuNode(NODE_1, f"node1_{self.test_id}")
+        self.node2 = WakuNode(NODE_2, f"node2_{self.test_id}")
+        self.node3 = WakuNode(NODE_1, f"node3_{self.test_id}")
+        self.node4 = WakuNode(NODE_2, f"node4_{self.test_id}")
+        self.nodes = [self.node1, self.node2, self.node3, self.node4]
+        self.partitioner = NetworkPartitioner()
+        yield
+        self.partitioner.heal()
+
+    def start_nodes(self, **kwargs):
+        self.node1.start(relay="true", **kwargs)
+        for node in self.nodes[1:]:
+            node.start(relay="true", discv5_bootstrap_node=self.node1.get_enr_uri(), **kwargs)
+        for node in self.nodes[1:]:
+            self.add_node_peer(node, [self.node1.get_multiaddr_with_id()])
+        self.add_node_peer(self.node4, [self.node3.get_multiaddr_with_id()])
+        self.ensure_relay_subscriptions_on_nodes(self.nodes, [self.test_pubsub_topic])
+        self.wait_for_autoconnection(self.nodes, hard_wait=10)
+
+    @pytest.mark.timeout(60 * 6)
+    def test_mesh_recovers_after_partition_heals(self):
+        self.start_nodes()
+        shard = self.test_pubsub_topic.split("/")[-1]
+        groups = [[self.node1, self.node2], [self.node3, self.node4]]
+
+        self.partitioner.partition(groups)
+        delay(20)
+        self.node1.send_relay_message(self.create_message(), self.test_pubsub_topic)
+        delay(2)
+        assert not self.node3.get_relay_messages(self.test_pubsub_topic), "Message crossed the partition"
+
+        healed_at = self.partitioner.heal()
+        recovery = self.wait_for_mesh_recovery(groups, shard, since=healed_at, timeout=120)
+        logger.info(f"Mesh recovered {recovery}s after the heal")
+        self.wait_for_published_message_to_reach_relay_peer(sender=self.node1, peer_list=[self.node3, self.node4])
+
+    @pytest.mark.timeout(60 * 6)
+    def test_store_sync_backfills_messages_missed_during_partition(self):
+        # a short sync interval keeps the backfill time about the partition, the range covers the whole split
+        self.start_nodes(store="true", store_sync="true", store_sync_interval=1, store_sync_range=120)
+        groups = [[self.node1, self.node2], [self.node3, self.node4]]
+
+        self.partitioner.partition(groups)
+        ledger = self.publish_messages_bulk(50, sender=self.node1, pubsub_topic=self.test_pubsub_topic, rate=10)
+        delay(2)
+        healed_at = self.partitioner.heal()
+
+        backfill = self.wait_for_store_backfill(
+            self.node3, ledger.message_ledger(), since=healed_at, timeout=180, pubsub_topic=self.test_pubsub_topic, page_size=100
+        )
+        logger.info(f"Store sync backfilled the {len(ledger.records)} messages missed by node3 in {backfill}s")
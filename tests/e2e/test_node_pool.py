@@ -0,0 +1,89 @@
+import pytest
+from src.env_vars import NODE_1, NODE_2
+from src.libs.common import delay
+from src.libs.custom_logger import get_custom_logger
+from src.data_storage import DS
+from src.node.container_backend import get_container_backend
+from src.node.container_registry import get_container_registry
+from src.node.node_pool import NodePool
+from src.node.waku_node import WakuNode
+from src.steps.common import StepsCommon
+
+logger = get_custom_logger(__name__)
+
+
+class TestNodePool(StepsCommon):
+    @pytest.fixture(scope="function", autouse=True)
+    def node_pool(self):
+        # a pool of this test only, the outcome must not depend on WARM_POOL_SIZE
+        session_pool = DS.node_pool
+        DS.node_pool = NodePool(max_idle_per_key=2, workers=1)
+        yield DS.node_pool
+        pool, DS.node_pool = DS.node_pool, session_pool
+        pool.close()
+
+    def wait_for_idle_nodes(self, pool, count, timeout=60):
+        for _ in range(timeout * 2):
+            if len(pool.idle_nodes()) >= count:
+                return
+            delay(0.5)
+        raise AssertionError(f"Pool has {len(pool.idle_nodes())} idle nodes instead of {count} after {timeout}s")
+
+    def test_released_node_survives_the_reaper_and_is_leased_again(self, node_pool):
+        self.node1 = WakuNode(NODE_1, f"node1_{self.test_id}")
+        self.node1.start(relay="true")
+        assert node_pool.stats["misses"] == 1, "The first node should not come from the pool"
+        # the miss warms up a node in the background, waiting for it makes the released node the next one leased
+        self.wait_for_idle_nodes(node_pool, 1)
+        container_id = self.node1.container.id
+
+        node_pool.release(self.node1)
+        DS.waku_nodes.remove(self.node1)
+        assert len(node_pool.idle_nodes()) == 2, "The released node did not go back to the pool"
+        # what close_open_nodes does at the end of every test
+        get_container_registry().reap()
+
+        self.node2 = WakuNode(NODE_1, f"node2_{self.test_id}")
+        self.node2.start(relay="true")
+        assert node_pool.stats["hits"] == 1, "The second node should come from the pool"
+        assert self.node2.container.id == container_id, "The second node should reuse the released container"
+        assert self.node2.is_running(), "The leased container was reaped"
+        self.node2.info()
+
+    def test_dead_pooled_node_is_not_leased(self, node_pool):
+        self.node1 = WakuNode(NODE_1, f"node1_{self.test_id}")
+        self.node1.start(relay="true")
+        self.wait_for_idle_nodes(node_pool, 1)
+        node_pool.release(self.node1)
+        DS.waku_nodes.remove(self.node1)
+        # both idle containers die behind the pool's back
+        for container in [node.container for node in node_pool.idle_nodes()]:
+            get_container_backend().kill(container)
+
+        self.node2 = WakuNode(NODE_1, f"node2_{self.test_id}")
+        self.node2.start(relay="true")
+        assert node_pool.stats["dead"] == 2, f"Dead idle nodes were not dropped: {node_pool.stats}"
+        assert node_pool.stats["misses"] == 2, "A lease with only dead idle nodes should be a miss"
+        assert self.node2.is_running(), "The second node should have been started normally"
+        self.node2.info()
+
+    def test_configuration_with_peers_is_not_warmed_up_again(self, node_pool):
+        self.node1 = WakuNode(NODE_1, f"node1_{self.test_id}")
+        self.node1.start(relay="true")
+        self.wait_for_idle_nodes(node_pool, 1)
+        # a node outside the pool keeps node1 connected when it is released
+        self.node2 = WakuNode(NODE_2, f"node2_{self.test_id}")
+        self.node2.start(relay="true", staticnode=self.node1.get_multiaddr_with_id())
+        self.node2.add_peers([self.node1.get_multiaddr_with_id()])
+        node_pool.release(self.node1)
+        DS.waku_nodes.remove(self.node1)
+        assert node_pool.stats["recycled"] == 1, f"A node with peers should not go back to the pool: {node_pool.stats}"
+
+        # the node warmed up before the release is still handed out, but no replacement is started anymore
+        self.node3 = WakuNode(NODE_1, f"node3_{self.test_id}")
+        self.node3.start(relay="true")
+        self.node4 = WakuNode(NODE_1, f"node4_{self.test_id}")
+        self.node4.start(relay="true")
+        assert (node_pool.stats["hits"], node_pool.stats["misses"]) == (1, 2), f"Unexpected leases: {node_pool.stats}"
+        delay(5)
+        assert not node_pool.idle_nodes(), "Nodes were warmed up for a configuration that gets peers"
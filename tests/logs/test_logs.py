@@ -1,11 +1,63 @@
+import pytest
 from src.libs.custom_logger import get_custom_logger
+from src.node.message_timeline import MessageTimeline
 from src.steps.relay import StepsRelay
 
 logger = get_custom_logger(__name__)
 
+SAMPLE_MSG_HASH = "0x5f3c8a9e1b2d4c6f8e0a1b3c5d7e9f1a2b4c6d8e0f1a3b5c7d9e1f2a4b6c8d0e"
+# chronicles textlines output of three nwaku nodes relaying one message node1 -> node2 -> node3, written after the log
+# statements of nwaku (waku_node.nim, waku_relay/protocol.nim, waku_archive/archive.nim, waku_filter_v2/protocol.nim)
+NWAKU_LOG_SAMPLE = {
+    "node1": [
+        f'NTC 2025-03-04 10:15:02.101+00:00 start publish Waku message                  topics="waku node" tid=1 file=waku_node.nim:1131 msg_hash={SAMPLE_MSG_HASH} pubsubTopic=/waku/2/rs/3/0',
+        f'NTC 2025-03-04 10:15:02.104+00:00 sent relay message                          topics="waku relay" tid=1 file=protocol.nim:298 my_peer_id=16U*Jt1mYN msg_hash={SAMPLE_MSG_HASH} msg_id=2b1c9e to_peer_id=16U*Vb4PqZ topic=/waku/2/rs/3/0 sentTime=1741083302104000000 payloadSizeBytes=11.0',
+        f'TRC 2025-03-04 10:15:02.105+00:00 waku.relay published                        topics="waku node" tid=1 file=waku_node.nim:1148 peerId=16U*Jt1mYN pubsubTopic=/waku/2/rs/3/0 msg_hash={SAMPLE_MSG_HASH} publishTime=1741083302105000000',
+    ],
+    "node2": [
+        'DBG 2025-03-04 10:15:02.110+00:00 Dialing peer                                topics="libp2p dialer" tid=1 file=dialer.nim:67 peerId=16U*Wq2JkD addr=/ip4/172.18.0.4/tcp/60000 nonce=0x1f',
+        f'NTC 2025-03-04 10:15:02.142+00:00 received relay message                      topics="waku relay" tid=1 file=protocol.nim:287 my_peer_id=16U*Vb4PqZ msg_hash={SAMPLE_MSG_HASH} msg_id=2b1c9e from_peer_id=16U*Jt1mYN topic=/waku/2/rs/3/0 receivedTime=1741083302142000000 payloadSizeBytes=11.0',
+        f'NTC 2025-03-04 10:15:02.145+00:00 sent relay message                          topics="waku relay" tid=1 file=protocol.nim:298 my_peer_id=16U*Vb4PqZ msg_hash={SAMPLE_MSG_HASH} msg_id=2b1c9e to_peer_id=16U*Wq2JkD topic=/waku/2/rs/3/0 sentTime=1741083302145000000 payloadSizeBytes=11.0',
+    ],
+    "node3": [
+        f'NTC 2025-03-04 10:15:02.201+00:00 received relay message                      topics="waku relay" tid=1 file=protocol.nim:287 my_peer_id=16U*Wq2JkD msg_hash={SAMPLE_MSG_HASH} msg_id=2b1c9e from_peer_id=16U*Vb4PqZ topic=/waku/2/rs/3/0 receivedTime=1741083302201000000 payloadSizeBytes=11.0',
+        f'TRC 2025-03-04 10:15:02.203+00:00 message archived                            topics="waku archive" tid=1 file=archive.nim:120 msg_hash={SAMPLE_MSG_HASH} pubsubTopic=/waku/2/rs/3/0 contentTopic=/test/1/waku-relay/proto timestamp=1741083302100000000',
+        f'TRC 2025-03-04 10:15:02.204+00:00 pushing message to subscribed peers         topics="waku filter" tid=1 file=protocol.nim:211 pubsubTopic=/waku/2/rs/3/0 contentTopic=/test/1/waku-relay/proto msg_hash={SAMPLE_MSG_HASH}',
+    ],
+}
+
 
 class TestLogs(StepsRelay):
     def test_metadata_protocol_mounted_also_on_non_1_clusters(self, setup_main_relay_nodes):
         for node in self.main_nodes:
             metadata_protocol = "Created WakuMetadata protocol" if node.is_nwaku() else "metadata protocol started"
             assert node.search_waku_log_for_string(metadata_protocol), "Metadata protocol not mounted"
+
+    def test_message_timeline_from_nwaku_log_sample(self):
+        timeline = MessageTimeline()
+        for node, lines in NWAKU_LOG_SAMPLE.items():
+            output = ("\n".join(lines) + "\n").encode()
+            # the collector hands over chunks that can end in the middle of a line
+            middle = len(output) // 2
+            timeline.feed(f"/tmp/{node}.log", output[:middle])
+            timeline.feed(f"/tmp/{node}.log", output[middle:])
+        assert timeline.message_hashes() == [SAMPLE_MSG_HASH]
+        assert [(event.node, event.event) for event in timeline.events(SAMPLE_MSG_HASH)] == [
+            ("node1", "published"),
+            ("node1", "relayed"),
+            ("node1", "published"),
+            ("node2", "received"),
+            ("node2", "relayed"),
+            ("node3", "received"),
+            ("node3", "archived"),
+            ("node3", "filter_pushed"),
+        ]
+        assert timeline.propagation(SAMPLE_MSG_HASH, event="received") == {"node2": 0.0, "node3": 0.059}
+        assert timeline.hop_latencies(SAMPLE_MSG_HASH) == [("node1", "node2", 0.041), ("node2", "node3", 0.059)]
+
+    @pytest.mark.usefixtures("setup_main_relay_nodes", "subscribe_main_relay_nodes", "relay_warm_up")
+    def test_message_propagation_is_logged_on_the_relay_peer(self):
+        message = self.create_message()
+        self.node1.send_relay_message(message, self.test_pubsub_topic)
+        self.node2.get_relay_messages(self.test_pubsub_topic)
+        self.check_message_propagation_latency(message, max_latency=5, expected_nodes=1)
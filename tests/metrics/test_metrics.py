@@ -111,3 +111,10 @@ class TestMetrics(StepsRelay, StepsMetrics, StepsFilter, StepsLightPush, StepsSt
             self.check_metric(self.store_node1, "waku_peer_store_size", 1)
             self.check_metric(self.store_node1, "waku_histogram_message_size_count", 1)
             self.check_metric(self.store_node1, 'waku_node_messages_total{type="relay"}', 1)
+
+    def test_store_insert_latency_under_load(self, node_setup):
+        before = self.get_metrics_snapshot(self.store_node1)
+        ledger = self.publish_messages_bulk(200, rate=50)
+        self.wait_for_store_backfill(self.store_node1, ledger.message_ledger(), timeout=60)
+        if self.store_node1.is_nwaku():
+            self.check_histogram_quantile(self.store_node1, "waku_archive_insert_duration_seconds", 0.99, 0.5, previous_snapshot=before)
@@ -1,7 +1,6 @@
 import pytest
-from src.env_vars import NODE_1, NODE_2
-from src.libs.common import to_base64
-from src.node.store_response import StoreResponse
+from src.libs.common import delay
+from src.node.store_snapshot import SeedSpec
 from src.steps.store import StepsStore
 
 
@@ -12,17 +11,17 @@ class TestCursorManyMessages(StepsStore):
     @pytest.mark.timeout(540)
     @pytest.mark.store2000
     def test_get_multiple_2000_store_messages(self):
-        expected_message_hash_list = {"nwaku": []}
-        for i in range(2000):
-            message = self.create_message(payload=to_base64(f"Message_{i}"))
-            self.publish_message(message=message)
-            expected_message_hash_list["nwaku"].append(self.compute_message_hash(self.test_pubsub_topic, message, hash_type="hex"))
-        store_response = StoreResponse({"paginationCursor": "", "pagination_cursor": ""}, self.store_node1)
-        response_message_hash_list = []
-        while store_response.pagination_cursor is not None:
-            cursor = store_response.pagination_cursor
-            store_response = self.get_messages_from_store(self.store_node1, page_size=100, cursor=cursor)
-            for index in range(len(store_response.messages)):
-                response_message_hash_list.append(store_response.message_hash(index))
-        assert len(expected_message_hash_list[self.store_node1.type()]) == len(response_message_hash_list), "Message count mismatch"
-        assert expected_message_hash_list[self.store_node1.type()] == response_message_hash_list, "Message hash mismatch"
+        ledger = self.publish_messages_bulk(2000, rate=100)
+        assert not ledger.failures(), f"Failed to publish {len(ledger.failures())} messages, first error: {ledger.failures()[0].error}"
+        delay(1)
+        self.check_store_matches_ledger(self.store_node1, ledger.message_ledger(), page_size=100)
+
+
+class TestCursorManyMessagesFromSnapshot(StepsStore):
+    # the 2000 messages are published once, later runs start the store node on a restored copy of its database
+
+    @pytest.mark.timeout(540)
+    @pytest.mark.store2000
+    def test_get_multiple_2000_store_messages_from_snapshot(self):
+        store_node, ledger = self.setup_seeded_store_node(SeedSpec(count=2000))
+        self.check_store_matches_ledger(store_node, ledger, page_size=100)
@@ -2,7 +2,6 @@ import pytest
 from src.env_vars import NODE_1, NODE_2
 from src.libs.common import delay, to_base64
 from src.libs.custom_logger import get_custom_logger
-from src.node.store_response import StoreResponse
 from src.node.waku_node import WakuNode
 from src.steps.store import StepsStore
 import time
@@ -379,13 +378,7 @@ class TestStoreSync(StepsStore):
         delay(5)  # wait for the sync to finish
 
         for node in [self.node1, self.node2, self.node3]:
-            store_response = StoreResponse({"paginationCursor": "", "pagination_cursor": ""}, node)
-            response_message_hash_list = []
-            while store_response.pagination_cursor is not None:
-                cursor = store_response.pagination_cursor
-                store_response = self.get_messages_from_store(node, page_size=100, cursor=cursor)
-                for index in range(len(store_response.messages)):
-                    response_message_hash_list.append(store_response.message_hash(index))
+            response_message_hash_list = self.get_store_message_hashes(node, page_size=100)
             assert len(expected_message_hash_list[node.type()]) == len(response_message_hash_list), "Message count mismatch"
             assert expected_message_hash_list[node.type()] == response_message_hash_list, "Message hash mismatch"
 
@@ -706,13 +699,7 @@ class TestStoreSync(StepsStore):
         logger.debug(f"Waiting {sync_interval * 2} s to let Node B finish its first sync")
         delay(sync_interval * 4)
 
-        store_response = StoreResponse({"paginationCursor": "", "pagination_cursor": ""}, self.node2)
-        store_hashes = []
-        while store_response.pagination_cursor is not None:
-            cursor = store_response.pagination_cursor
-            store_response = self.get_messages_from_store(self.node2, page_size=100, cursor=cursor, ascending="true")
-            for idx in range(len(store_response.messages)):
-                store_hashes.append(store_response.message_hash(idx))
+        store_hashes = self.get_store_message_hashes(self.node2, page_size=100, ascending="true")
 
         logger.debug(f"Store returned {len(store_hashes)} messages; expected range {len(expected_hashes) - 20} : {len(expected_hashes)}")
         assert len(expected_hashes) >= len(store_hashes) > len(expected_hashes) - 20, "Incorrect number of messages synced"
@@ -1123,17 +1110,6 @@ class TestStoreSync(StepsStore):
         delay(sync_interval * 4 + 20)
 
         for node in nodes:
-            store_resp = StoreResponse({"paginationCursor": "", "pagination_cursor": ""}, node)
-            retrieved_hashes = []
-            while store_resp.pagination_cursor is not None:
-                cursor = store_resp.pagination_cursor
-                store_resp = self.get_messages_from_store(
-                    node,
-                    page_size=page_size,
-                    cursor=cursor,
-                    ascending="true",
-                )
-                for i in range(len(store_resp.messages)):
-                    retrieved_hashes.append(store_resp.message_hash(i))
+            retrieved_hashes = self.get_store_message_hashes(node, page_size=page_size, ascending="true")
             assert len(retrieved_hashes) == len(expected_hashes), f"{node.name}: message count mismatch"
             assert retrieved_hashes == expected_hashes, f"{node.name}: message hash mismatch"